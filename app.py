@@ -1,118 +1,198 @@
+import atexit
 import os
 import threading
-from flask import Flask, request, jsonify
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, jsonify
 from slack_bolt import App
 from slack_bolt.adapter.flask import SlackRequestHandler
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_sdk import WebClient
 from dotenv import load_dotenv
-import openai
 from datetime import datetime, timedelta
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
 from collections import defaultdict
 
 # Import firebase utilities
 from src.firebase_utils import (
-    get_user, create_or_update_user, mute_user, unmute_user, update_user_digest_config,
+    get_user, create_or_update_user, delete_user, mute_user, unmute_user, update_user_digest_config,
     add_kudos, get_recent_kudos, get_open_blockers, get_latest_team_digest, get_latest_trends,
-    get_user_messages
+    get_user_messages, get_prewarmed_digest, store_prewarmed_digest
+)
+from src.thread_grouping import fetch_missing_replies
+from src import pulse_content, prewarm, token_budget, model_cascade, preprocess
+from src.pulse_content import PULSE_SUBCOMMANDS, get_channels_for_role
+from src.telemetry import configure_logging, get_logger, span
+from src import metrics
+from src.health import BacklogExecutor, DependencyProber
+from src.scheduler import JobScheduler
+from src.leader import LeaderElector
+from src.slack_client import SlackWebClient
+# Firebase, Firestore and OpenAI are set up on first use and shared with src/ modules
+from src.dependencies import db, openai_client
+from src.relevance import embedding_queue
+from src.auto_tag import tag_queue
+from src.rollups import rollups, update_trends
+from src.local_store import local_store
+from src.delivery import delivery, is_schedulable
+from src.counters import message_counter, last_active_debouncer, with_message_count
+from src.singleflight import SingleFlight, fingerprint
+from src.breakers import CircuitOpenError, slack_breaker, openai_breaker, firestore_breaker, openai_key, last_good
+from src.vector_index import search_index, collapse_near_duplicates
+from src.progressive import ProgressiveMessage, paginate_blocks, collect_stream
+from config import (
+    HEALTH_PROBE_TIMEOUT_SECONDS, READINESS_MAX_BACKLOG, READINESS_DEPENDENCIES, SLACK_LISTENER_THREADS,
+    PULSE_STREAM_SUMMARIES, PULSE_UPDATE_WORKERS, DELIVERY_TICK_SECONDS, DELIVERY_TZ_LOOKUPS_PER_PLAN,
+    DELIVERY_WORKERS, SEARCH_WORKERS,
+    PREWARM_INTERVAL_SECONDS, PREWARM_MAX_USERS_PER_RUN, SLACK_API_URL, SEARCH_WINDOW_HOURS, BUDGET_DEFER_SECONDS,
+    BUDGET_MAX_DEFERRALS, ROLLUP_TRENDS_INTERVAL_SECONDS, DIGEST_MAX_AGE_HOURS, OPENAI_MAX_RETRIES
 )
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Firebase
-if not firebase_admin._apps:
-    cred_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    if cred_path and os.path.exists(cred_path):
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
-    else:
-        firebase_admin.initialize_app()
-
-db = firestore.client()
+# Structured logs are written by a background thread so handlers never block on stdout
+configure_logging()
+log = get_logger("pulse.app")
 
 # Initialize Flask app
 flask_app = Flask(__name__)
 
-# Initialize Slack app
+# Initialize Slack app; we own the listener executor so its queue depth can be watched
+listener_executor = BacklogExecutor(max_workers=SLACK_LISTENER_THREADS)
+# Scheduled digests are sent on their own pool, off the scheduler thread
+digest_executor = ThreadPoolExecutor(max_workers=DELIVERY_WORKERS, thread_name_prefix="digest")
+# /pulse search lookups run here, so a slow query embedding never holds a listener thread
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+# Bolt's own client honors SLACK_API_URL too, so a fake Slack API sees its auth.test
 slack_app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+    client=WebClient(token=os.environ.get("SLACK_BOT_TOKEN"), base_url=SLACK_API_URL),
+    signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+    listener_executor=listener_executor
 )
 
-# Initialize OpenAI
-from openai import OpenAI
-openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Rate-limited, connection-pooled Web API client for our own Slack calls
+slack_api = SlackWebClient(token=os.environ.get("SLACK_BOT_TOKEN"), breaker=slack_breaker)
+# The readiness probe gets its own client, so it neither waits out a long timeout nor retries
+slack_probe_api = SlackWebClient(
+    token=os.environ.get("SLACK_BOT_TOKEN"), timeout=HEALTH_PROBE_TIMEOUT_SECONDS, max_retries=0,
+    max_queue_seconds=HEALTH_PROBE_TIMEOUT_SECONDS, breaker=slack_breaker
+)
 
-# Channel mapping based on role
-ROLE_CHANNEL_MAPPING = {
-    "software": ["software", "team"],
-    "mechanical": ["mechanical", "team"],
-    "electrical": ["electrical", "team"]
-}
+# Background dependency probes backing /ready and /live
+def _probe_firestore():
+    db.collection('test').limit(1).get(timeout=HEALTH_PROBE_TIMEOUT_SECONDS)
+    metrics.record_reads("test")
+
+def _probe_slack():
+    result = slack_probe_api.auth_test()
+    if not result["ok"]:
+        raise RuntimeError(result.get("error"))
+
+def _probe_openai():
+    openai_client.with_options(timeout=HEALTH_PROBE_TIMEOUT_SECONDS, max_retries=0).models.list()
+
+prober = DependencyProber({
+    "firestore": _probe_firestore,
+    "slack": _probe_slack,
+    "openai": _probe_openai
+}, required=READINESS_DEPENDENCIES)
+for breaker in (slack_breaker, openai_breaker, firestore_breaker):
+    prober.add_breaker(breaker)
+prober.add_backlog_source("slack_listener_queue", lambda: listener_executor.backlog, READINESS_MAX_BACKLOG)
+
+# Concurrent updates share identical Slack reads and summaries in flight
+history_flights = SingleFlight("channel_history")
+user_flights = SingleFlight("users_info")
+channel_lookup_flights = SingleFlight("channel_lookup")
+summary_flights = SingleFlight("channel_summary")
 
 def get_channel_messages(channel_id, hours_back=24):
     """Get recent messages from a specific channel"""
+    return history_flights.do((channel_id, hours_back), _fetch_channel_messages, channel_id, hours_back)
+
+def _fetch_channel_messages(channel_id, hours_back):
     try:
         # Calculate timestamp for X hours ago
         since_time = datetime.now() - timedelta(hours=hours_back)
         since_ts = since_time.timestamp()
         
-        print(f"🔍 DEBUG: Fetching messages from channel {channel_id} since {since_time}")
+        log.debug("channel.fetch_messages", channel=channel_id, since=since_time)
         
         # Use Slack API to get messages
-        result = slack_app.client.conversations_history(
-            channel=channel_id,
-            oldest=str(since_ts),
-            limit=100
-        )
+        with span("slack.conversations_history", channel=channel_id):
+            result = slack_api.conversations_history(
+                channel=channel_id,
+                oldest=str(since_ts),
+                limit=100
+            )
         
         if not result["ok"]:
-            print(f"❌ DEBUG: Failed to fetch messages: {result.get('error')}")
+            log.warning("channel.fetch_messages_failed", channel=channel_id, error=result.get("error"))
             return []
         
         messages = result["messages"]
-        print(f"✅ DEBUG: Retrieved {len(messages)} messages from channel {channel_id}")
+        log.debug("channel.messages_retrieved", channel=channel_id, count=len(messages))
+        
+        # History only returns thread parents, so pull in the missing replies
+        with span("slack.conversations_replies", channel=channel_id):
+            replies = fetch_missing_replies(slack_api, channel_id, messages, oldest=str(since_ts))
+        if replies:
+            log.debug("channel.replies_retrieved", channel=channel_id, count=len(replies))
+            messages = messages + replies
         
         # Filter out bot messages and format for GPT
         formatted_messages = []
         for msg in messages:
             if not msg.get("bot_id") and msg.get("text"):
-                # Get user info
-                user_id = msg.get("user")
-                user_name = "Unknown"
-                if user_id:
-                    try:
-                        user_info = slack_app.client.users_info(user=user_id)
-                        if user_info["ok"]:
-                            user_name = user_info["user"]["real_name"] or user_info["user"]["name"]
-                    except:
-                        pass
-                
-                timestamp = datetime.fromtimestamp(float(msg["ts"]))
-                formatted_messages.append({
-                    "user": user_name,
-                    "text": msg["text"],
-                    "timestamp": timestamp.strftime("%m/%d %H:%M")
-                })
+                user_name = get_user_name(msg.get("user")) or "Unknown"
+                formatted_messages.append(pulse_content.format_channel_message(msg, user_name))
         
         return formatted_messages
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"❌ DEBUG: Error fetching messages: {e}")
+        log.exception("channel.fetch_messages_error", channel=channel_id, error=str(e))
         return []
 
+def get_user_name(user_id):
+    """Display name for a user from the shared directory, else users.info (None if unknown)"""
+    if not user_id:
+        return None
+    name = preprocess.user_directory.get(user_id)
+    missed = name is None and preprocess.user_directory.missed(user_id)
+    metrics.record_cache("users_info", name is not None or missed)
+    if name is None and not missed:
+        name = user_flights.do(user_id, _lookup_user_name, user_id)
+    return name
+
+def _lookup_user_name(user_id):
+    try:
+        with span("slack.users_info"):
+            user_info = slack_api.users_info(user=user_id)
+    except Exception as e:
+        log.warning("slack.users_info_error", user=user_id, error=str(e))
+        preprocess.user_directory.put_miss(user_id)
+        return None
+    if not user_info["ok"]:
+        preprocess.user_directory.put_miss(user_id)
+        return None
+    name = user_info["user"]["real_name"] or user_info["user"]["name"]
+    preprocess.user_directory.put(user_id, name)
+    return name
+
 def get_dm_conversations(user_id, hours_back=24):
     """Get recent DM conversations for a user"""
     try:
-        print(f"🔍 DEBUG: Fetching DM conversations for user {user_id}")
+        log.debug("dm.fetch_conversations", user=user_id)
         
         # Get list of DM channels
-        result = slack_app.client.conversations_list(
-            types="im",
-            limit=50
-        )
+        with span("slack.conversations_list", types="im"):
+            result = slack_api.conversations_list(
+                types="im",
+                limit=50
+            )
         
         if not result["ok"]:
             return []
@@ -124,174 +204,213 @@ def get_dm_conversations(user_id, hours_back=24):
         for channel in result["channels"]:
             try:
                 # Get messages from this DM
-                history = slack_app.client.conversations_history(
-                    channel=channel["id"],
-                    oldest=str(since_ts),
-                    limit=20
-                )
+                with span("slack.conversations_history", channel=channel["id"]):
+                    history = slack_api.conversations_history(
+                        channel=channel["id"],
+                        oldest=str(since_ts),
+                        limit=20
+                    )
                 
                 if history["ok"] and history["messages"]:
                     # Get the other user's name
-                    other_user = channel["user"]
-                    user_info = slack_app.client.users_info(user=other_user)
-                    other_name = "Unknown"
-                    if user_info["ok"]:
-                        other_name = user_info["user"]["real_name"] or user_info["user"]["name"]
+                    other_name = get_user_name(channel["user"]) or "Unknown"
                     
                     # Format messages
                     formatted_msgs = []
                     for msg in history["messages"]:
                         if msg.get("text"):
-                            sender = "You" if msg.get("user") == user_id else other_name
-                            timestamp = datetime.fromtimestamp(float(msg["ts"]))
-                            formatted_msgs.append(f"{sender} ({timestamp.strftime('%m/%d %H:%M')}): {msg['text']}")
+                            formatted_msgs.append(pulse_content.format_dm_message(msg, user_id, other_name))
                     
                     if formatted_msgs:
                         dm_summaries.append({
                             "partner": other_name,
-                            "messages": formatted_msgs[-10:]  # Last 10 messages
+                            "messages": formatted_msgs[-10:],  # Last 10 messages
+                            "latest_ts": max(float(msg["ts"]) for msg in history["messages"])
                         })
             except Exception as e:
-                print(f"⚠️ DEBUG: Error processing DM channel: {e}")
+                log.warning("dm.channel_error", channel=channel.get("id"), error=str(e))
                 continue
         
         return dm_summaries
     except Exception as e:
-        print(f"❌ DEBUG: Error fetching DMs: {e}")
+        log.exception("dm.fetch_conversations_error", user=user_id, error=str(e))
         return []
 
-def generate_channel_summary(channel_name, messages):
+def complete_summary(request, on_text=None, admission=None, **fields):
+    """Run a summary completion, streaming partial text to ``on_text`` when enabled.
+
+    Tokens are charged to the user and team of ``admission``, whose
+    decision may also switch the request to the fallback model.
+    """
+    request = admission.apply(request) if admission else request
+    charge = {"user": admission.user, "team": admission.team} if admission else {}
+    streamed = bool(on_text and PULSE_STREAM_SUMMARIES)
+    key = openai_key(request, streamed)
+    client = openai_client.with_options(max_retries=OPENAI_MAX_RETRIES)
+    # Fails fast while OpenAI's breaker is open; otherwise times out at the observed p99 of
+    # calls like this one (same model and cap; streams are timed to their first token)
+    with openai_breaker.guard(key, timed=not streamed), span("openai.chat_completions", **fields):
+        if streamed:
+            started = time.perf_counter()
+            text = collect_stream(
+                client.chat.completions.create(**request, stream=True, timeout=openai_breaker.timeout(key)), on_text,
+                on_first=lambda: openai_breaker.observe(time.perf_counter() - started, key)
+            )
+            # Streamed responses carry no usage field, so the ledger gets an estimate
+            token_budget.ledger.record(
+                request["model"], None, channel=fields.get("channel"), purpose=fields.get("purpose"),
+                prompt_tokens=token_budget.request_prompt_tokens(request),
+                completion_tokens=token_budget.estimate_tokens(text), **charge
+            )
+            return text
+        response = client.chat.completions.create(**request, timeout=openai_breaker.timeout(key))
+    metrics.record_openai_usage(request["model"], response)
+    token_budget.ledger.record(
+        request["model"], response.usage, channel=fields.get("channel"), purpose=fields.get("purpose"), **charge
+    )
+    return response.choices[0].message.content.strip()
+
+def generate_channel_summary(channel_name, messages, on_text=None, admission=None):
     """Generate AI summary of channel activity"""
     if not messages:
         return f"No recent activity in #{channel_name}"
+    # Routed on what the prompt will carry: plain text with mentions resolved,
+    # long pastes cut down and repeated posts collapsed
+    messages = collapse_near_duplicates(preprocess.prepare_messages(messages, get_user_name))
+    if not messages:
+        return f"No recent activity in #{channel_name}"
+    route = model_cascade.route([msg["text"] for msg in messages], "channel_summary", channel=channel_name)
+    if route.tier == "extractive":
+        return pulse_content.extractive_channel_summary(messages)
     
+    request = pulse_content.channel_summary_request(channel_name, messages, route.model)
+    # Keyed on the prompt and the model that will actually run, so only
+    # identical requests are shared; only the first caller's text is streamed
+    # and charged
+    effective = admission.apply(request) if admission else request
+    key = (channel_name, fingerprint(effective["messages"]), effective["model"], effective.get("max_tokens"))
     try:
-        # Prepare messages for GPT
-        message_text = "\n".join([
-            f"[{msg['timestamp']}] {msg['user']}: {msg['text']}"
-            for msg in messages[-30:]  # Last 30 messages
-        ])
-        
-        prompt = f"""Analyze the following Slack channel activity from #{channel_name} and provide a concise summary:
-
-{message_text}
-
-Please provide:
-1. Key topics/themes discussed
-2. Important decisions or action items
-3. Notable updates or blockers
-4. Overall sentiment/energy
-
-Keep it concise but informative, using clean formatting with bullet points or short paragraphs. Focus on actionable insights."""
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes Slack channel activity for team members."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.3
+        summary = summary_flights.do(
+            key, complete_summary, request, on_text, admission, purpose="channel_summary", channel=channel_name
         )
-        
-        return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"❌ DEBUG: Error generating summary: {e}")
-        return f"Summary unavailable for #{channel_name} (Error: {str(e)})"
-
-def generate_dm_summary(dm_data):
+        log.warning("summary.channel_error", channel=channel_name, error=str(e))
+        return fallback_channel_summary(channel_name, messages, e)
+    last_good.put(channel_name, summary)
+    return summary
+
+def fallback_channel_summary(channel_name, messages, error):
+    """The last summary of the channel if recent, else its key messages, when no new summary can be made"""
+    entry = last_good.get(channel_name, DIGEST_MAX_AGE_HOURS * 3600)
+    if entry:
+        return pulse_content.stale_summary(entry[1], entry[0])
+    if messages:
+        return pulse_content.degraded_channel_summary(messages)
+    return pulse_content.channel_summary_unavailable(channel_name, str(error))
+
+def generate_dm_summary(dm_data, on_text=None, admission=None):
     """Generate AI summary of DM conversations"""
     if not dm_data:
         return "No recent DM activity"
+    dm_data = preprocess.prepare_conversations(dm_data, get_user_name)
+    if not dm_data:
+        return "No recent DM activity"
+    route = model_cascade.route(
+        [message for _, messages in pulse_content.summarized_dms(dm_data) for message in messages], "dm_summary"
+    )
+    if route.tier == "extractive":
+        return pulse_content.extractive_dm_summary(dm_data)
     
     try:
-        dm_text = ""
-        for dm in dm_data[:5]:  # Top 5 most active DMs
-            dm_text += f"\n--- Conversation with {dm['partner']} ---\n"
-            dm_text += "\n".join(dm['messages'][-5:])  # Last 5 messages
-            dm_text += "\n"
-        
-        prompt = f"""Analyze the following direct message conversations and provide a brief summary:
-
-{dm_text}
-
-Summarize:
-1. Key conversations and their topics
-2. Any action items or follow-ups needed
-3. Important updates from colleagues
-
-Keep it professional and concise."""
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes private conversations professionally."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.3
+        return complete_summary(
+            pulse_content.dm_summary_request(dm_data, route.model), on_text, admission, purpose="dm_summary"
         )
-        
-        return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"❌ DEBUG: Error generating DM summary: {e}")
-        return "DM summary unavailable"
-
-def get_channels_for_role(role):
-    """Get the appropriate channels for a given role"""
-    return ROLE_CHANNEL_MAPPING.get(role, ["team"])
+        log.warning("summary.dm_error", error=str(e))
+        return pulse_content.degraded_dm_summary(dm_data)
 
 def get_channel_id_by_name(channel_name):
     """Get channel ID from channel name"""
+    return channel_lookup_flights.do(channel_name, _lookup_channel_id, channel_name)
+
+def _lookup_channel_id(channel_name):
     try:
-        print(f"🔍 DEBUG: Looking for channel: {channel_name}")
-        result = slack_app.client.conversations_list(
-            types="public_channel,private_channel",
-            limit=200
-        )
+        log.debug("channel.lookup", channel_name=channel_name)
+        with span("slack.conversations_list", types="public_channel,private_channel"):
+            result = slack_api.conversations_list(
+                types="public_channel,private_channel",
+                limit=200
+            )
         
         if result["ok"]:
             for channel in result["channels"]:
                 if channel["name"] == channel_name:
-                    print(f"✅ DEBUG: Found channel {channel_name} with ID: {channel['id']}")
+                    log.debug("channel.found", channel_name=channel_name, channel=channel["id"])
                     return channel["id"]
-            print(f"❌ DEBUG: Channel {channel_name} not found in conversations list")
+            log.warning("channel.not_found", channel_name=channel_name)
         else:
-            print(f"❌ DEBUG: Failed to list conversations: {result.get('error')}")
+            log.warning("channel.list_failed", error=result.get("error"))
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"❌ DEBUG: Error finding channel {channel_name}: {e}")
+        log.exception("channel.lookup_error", channel_name=channel_name, error=str(e))
         return None
 
+# One request handler shared by every HTTP request (and every thread in a worker)
+slack_handler = SlackRequestHandler(slack_app)
+
 @flask_app.route("/slack/events", methods=["POST"])
 def slack_events():
-    print("🔍 DEBUG: Received HTTP request to /slack/events")
-    return SlackRequestHandler(slack_app).handle(request)
+    log.debug("http.slack_events")
+    return slack_handler.handle(request)
+
+@flask_app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@flask_app.route("/ready", methods=["GET"])
+def readiness_check():
+    ready, report = prober.readiness()
+    return jsonify(report), 200 if ready else 503
+
+@flask_app.route("/live", methods=["GET"])
+def liveness_check():
+    alive, report = prober.liveness()
+    return jsonify(report), 200 if alive else 503
 
 @flask_app.route("/health", methods=["GET"])
 def health_check():
-    print("🔍 DEBUG: Health check requested")
+    log.debug("http.health_check")
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
-# Debug: Log all incoming events
+# Log a compact, sampled line for every incoming request (never the full payload)
 @slack_app.middleware
 def log_request(body, logger, next):
-    print(f"🔍 DEBUG: Incoming request type: {body.get('type', 'unknown')}")
-    if 'event' in body:
-        print(f"🔍 DEBUG: Event type: {body['event'].get('type', 'unknown')}")
-        print(f"🔍 DEBUG: Event data: {body['event']}")
+    event_type = body.get("event", {}).get("type") if "event" in body else None
+    if event_type:
+        metrics.EVENTS_TOTAL.labels(event_type).inc()
+    elif body.get("command"):
+        metrics.EVENTS_TOTAL.labels("command").inc()
+    else:
+        metrics.EVENTS_TOTAL.labels(body.get("type", "unknown")).inc()
+    log.debug("request.received", type=body.get("type", "unknown"), event_type=event_type)
     return next()
 
 # Slack event handlers
 @slack_app.event("message")
 def handle_message_events(body, logger):
-    print(f"🔍 DEBUG: Message event received: {body}")
     event = body.get("event", {})
     
-    print(f"🔍 DEBUG: Event details - User: {event.get('user')}, Channel: {event.get('channel')}, Text: {event.get('text', '')[:50]}...")
+    log.debug(
+        "message.received",
+        user=event.get("user"),
+        channel=event.get("channel"),
+        channel_type=event.get("channel_type"),
+        subtype=event.get("subtype")
+    )
     
     if event.get("bot_id") or event.get("subtype") == "bot_message":
-        print("🔍 DEBUG: Skipping bot message")
         return
     
     # Store message in Firebase
@@ -304,64 +423,87 @@ def handle_message_events(body, logger):
         "channel_type": event.get("channel_type", "unknown")
     }
     
-    print(f"🔍 DEBUG: Storing message data: {message_data}")
-    
     try:
         message_data['created_at'] = firestore.SERVER_TIMESTAMP
-        doc_ref = db.collection('messages').add(message_data)
-        print(f"✅ DEBUG: Message stored successfully with ID: {doc_ref[1].id}")
+        message_data['updated_at'] = firestore.SERVER_TIMESTAMP
+        with span("firestore.messages.add"):
+            doc_ref = db.collection('messages').add(message_data)
+        metrics.record_writes("messages")
+        log.debug("message.stored", doc_id=doc_ref[1].id)
+        local_store.put_message(doc_ref[1].id, message_data)
+        # Embedded and tagged in the background
+        embedding_queue.submit(doc_ref[1], message_data["text"])
+        tag_queue.submit(doc_ref[1], message_data["text"])
+        rollups.record(event)
     except Exception as e:
-        print(f"❌ DEBUG: Error storing message: {e}")
+        log.exception("message.store_error", channel=event.get("channel"), error=str(e))
     
-    # Update user activity
+    # Update user activity: the count goes to a random shard, and last_active
+    # is written at most once per LAST_ACTIVE_DEBOUNCE_SECONDS
     user_id = event.get("user")
     if user_id:
-        print(f"🔍 DEBUG: Updating activity for user: {user_id}")
         try:
-            create_or_update_user(user_id, {
-                "last_active": firestore.SERVER_TIMESTAMP,
-                "message_count": firestore.Increment(1)
-            })
-            print(f"✅ DEBUG: User activity updated for: {user_id}")
+            message_counter.increment(user_id)
         except Exception as e:
-            print(f"❌ DEBUG: Error updating user activity: {e}")
+            log.exception("user.message_count_error", user=user_id, error=str(e))
+        if last_active_debouncer.due(user_id):
+            try:
+                create_or_update_user(user_id, {"last_active": firestore.SERVER_TIMESTAMP})
+                log.debug("user.activity_updated", user=user_id)
+            except Exception as e:
+                last_active_debouncer.forget(user_id)
+                log.exception("user.activity_update_error", user=user_id, error=str(e))
     else:
-        print("⚠️ DEBUG: No user ID found in message event")
+        log.warning("message.missing_user", channel=event.get("channel"), subtype=event.get("subtype"))
 
 # Handle app mentions
 @slack_app.event("app_mention")
 def handle_app_mention_events(body, logger):
-    print(f"🔍 DEBUG: App mention received: {body}")
     event = body.get("event", {})
+    log.info("app_mention.received", user=event.get("user"), channel=event.get("channel"))
     
     try:
         # Respond to the mention
-        slack_app.client.chat_postMessage(
-            channel=event["channel"],
-            text=f"👋 Hi <@{event['user']}>! Try `/pulse` to see your profile or `/pulse help` for commands."
-        )
-        print("✅ DEBUG: Responded to app mention")
+        with span("slack.chat_postMessage"):
+            slack_api.chat_postMessage(
+                channel=event["channel"],
+                text=pulse_content.mention_reply_text(event["user"])
+            )
     except Exception as e:
-        print(f"❌ DEBUG: Error responding to app mention: {e}")
+        log.exception("app_mention.respond_error", channel=event.get("channel"), error=str(e))
 
 # Handle member joined channel events
 @slack_app.event("member_joined_channel")
 def handle_member_joined(body, logger):
-    print(f"🔍 DEBUG: Member joined channel: {body}")
+    event = body.get("event", {})
+    log.info("member.joined_channel", user=event.get("user"), channel=event.get("channel"))
 
 # Handle member left channel events  
 @slack_app.event("member_left_channel")
 def handle_member_left(body, logger):
-    print(f"🔍 DEBUG: Member left channel: {body}")
+    event = body.get("event", {})
+    log.info("member.left_channel", user=event.get("user"), channel=event.get("channel"))
 
 # Handle channel created events
 @slack_app.event("channel_created")
 def handle_channel_created(body, logger):
-    print(f"🔍 DEBUG: Channel created: {body}")
+    channel = body.get("event", {}).get("channel", {})
+    log.info("channel.created", channel=channel.get("id"), channel_name=channel.get("name"))
+
+def run_search(user_id, query, respond):
+    """Answer ``/pulse search`` from the in-memory index, which is built and refreshed in the background"""
+    try:
+        results = search_index.search(query)
+        if results is None:
+            respond(pulse_content.SEARCH_INDEXING_TEXT)
+        else:
+            respond(pulse_content.format_search_results(query, results, SEARCH_WINDOW_HOURS))
+    except Exception as e:
+        log.exception("pulse.search_error", user=user_id, error=str(e))
+        respond(f"❌ Error: {str(e)}")
 
 @slack_app.command("/pulse")
 def pulse_command(ack, body, respond):
-    print(f"🔍 DEBUG: /pulse command received: {body}")
     ack()
     
     user_id = body["user_id"]
@@ -369,81 +511,58 @@ def pulse_command(ack, body, respond):
     args = text.split() if text else []
     subcommand = args[0].lower() if args else ""
     
-    print(f"🔍 DEBUG: User {user_id} executed /pulse with subcommand: '{subcommand}'")
+    log.info("pulse.command", user=user_id, subcommand=subcommand)
     
+    start = time.perf_counter()
+    try:
+        handle_pulse_subcommand(user_id, subcommand, respond, args[1:])
+    finally:
+        label = (subcommand or "profile") if subcommand in PULSE_SUBCOMMANDS else "unknown"
+        metrics.COMMAND_SECONDS.labels(label).observe(time.perf_counter() - start)
+
+def get_profile(user_id):
+    """The user's document, with their sharded message count"""
+    profile = get_user(user_id)
+    return with_message_count(profile, message_counter.total(user_id)) if profile else None
+
+def handle_pulse_subcommand(user_id, subcommand, respond, args=()):
+    """Run a single /pulse subcommand"""
     # Default behavior: show user profile when no subcommand is provided
     if subcommand == "":
         try:
-            print(f"🔍 DEBUG: Getting profile for user: {user_id}")
-            profile = get_user(user_id)
-            print(f"🔍 DEBUG: Profile data: {profile}")
+            profile = get_profile(user_id)
             
             if not profile:
-                print("🔍 DEBUG: No profile found, showing welcome message")
                 respond("👋 Welcome! Please run `/pulse setup` to get started.")
                 return
             
-            tracked_channels = profile.get('tracked_channels', [])
-            channel_list = ', '.join([f"#{channel}" for channel in tracked_channels]) if tracked_channels else 'None'
-            
-            summary = f"""📊 *Your Pulse Profile*
-
-👤 **Personal Info**
-• Name: {profile.get('real_name', 'Not set')}
-• Role: {profile.get('role', 'Not set')}
-• Setup: {'✅ Complete' if profile.get('onboarding_completed') else '❌ Incomplete'}
-
-📺 **Tracking**
-• Channels: {channel_list}
-• Messages Sent: {profile.get('message_count', 0)}
-• Last Active: {profile.get('last_active', 'Never')}
-
-⚙️ **Quick Actions**
-• `/pulse setup` - Update your profile
-• `/pulse config` - Change settings
-• `/pulse help` - View all commands"""
-            
-            print(f"✅ DEBUG: Sending profile summary to user")
-            respond(summary)
+            respond(pulse_content.pulse_profile_text(profile))
         except Exception as e:
-            print(f"❌ DEBUG: Error in pulse command: {e}")
+            log.exception("pulse.profile_error", user=user_id, error=str(e))
     elif subcommand == "setup":
-        print("🔍 DEBUG: Starting profile setup")
         start_profile_setup(user_id, respond)
     elif subcommand == "help":
-        print("🔍 DEBUG: Showing help text")
-        respond(get_help_text())
+        respond(pulse_content.get_help_text())
     elif subcommand == "reset":
-        print(f"🔍 DEBUG: Resetting profile for user: {user_id}")
         try:
-        # Delete user from Firebase
-            user_ref = db.collection('users').document(user_id)
-            user_ref.delete()
+            delete_user(user_id)
+            log.info("pulse.profile_reset", user=user_id)
             respond("✅ Profile deleted! Run `/pulse setup` to start fresh.")
         except Exception as e:
             respond(f"❌ Error: {str(e)}")
     elif subcommand == "me":
         # Keep "me" as alias for the default behavior
         try:
-            print(f"🔍 DEBUG: Getting profile for 'me' command: {user_id}")
-            profile = get_user(user_id)
+            profile = get_profile(user_id)
             if not profile:
                 respond("👋 Welcome! Please run `/pulse setup` to get started.")
                 return
             
-            tracked_channels = profile.get('tracked_channels', [])
-            summary = f"""📊 *Your Profile*
-• Name: {profile.get('real_name', 'Not set')}
-• Role: {profile.get('role', 'Not set')}
-• Tracked Channels: {', '.join(tracked_channels) if tracked_channels else 'None'}
-• Messages: {profile.get('message_count', 0)}"""
-            
-            respond(summary)
+            respond(pulse_content.me_text(profile))
         except Exception as e:
-            print(f"❌ DEBUG: Error in 'me' command: {e}")
+            log.exception("pulse.me_error", user=user_id, error=str(e))
             respond(f"❌ Error: {str(e)}")
     elif subcommand == "update" or subcommand == "summary":
-        print(f"🔍 DEBUG: Generating pulse update for user: {user_id}")
         try:
             profile = get_user(user_id)
             if not profile:
@@ -455,82 +574,19 @@ def pulse_command(ack, body, respond):
                 respond("❌ No channels configured. Run `/pulse setup` to select your role.")
                 return
             
-            # Show loading message first
-            respond("🔄 Generating your pulse update... This may take a moment.")
-            
-            # Get summaries for tracked channels
-            channel_summaries = []
-            for channel_name in tracked_channels:
-                print(f"🔍 DEBUG: Processing channel: {channel_name}")
-                channel_id = get_channel_id_by_name(channel_name)
-                if channel_id:
-                    messages = get_channel_messages(channel_id, hours_back=24)
-                    summary = generate_channel_summary(channel_name, messages)
-                    channel_summaries.append(f"📍 **#{channel_name}**\n{summary}\n")
-                else:
-                    channel_summaries.append(f"📍 **#{channel_name}**\n⚠️ *Channel not found or bot not added to channel*\n")
-            
-            # Get DM summary
-            print(f"🔍 DEBUG: Processing DMs for user: {user_id}")
-            dm_data = get_dm_conversations(user_id, hours_back=24)
-            dm_summary = generate_dm_summary(dm_data)
-            
-            # Format the complete update
-            pulse_update = f"""📊 **Your Pulse Update**
-*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🏢 **CHANNEL ACTIVITY**
-
-{chr(10).join(channel_summaries)}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-💬 **DIRECT MESSAGES**
-
-{dm_summary}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-*💡 Use `/pulse channels` or `/pulse dms` for focused updates*"""
+            try:
+                create_or_update_user(user_id, {"update_history": prewarm.record_request(profile.get("update_history"))})
+            except Exception as e:
+                log.warning("pulse.history_error", user=user_id, error=str(e))
             
-            # Send the summary (split if too long)
-            if len(pulse_update) > 3000:
-                # Split into channel and DM parts
-                channel_part = f"""📊 **Your Pulse Update - Channel Activity**
-*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-🏢 **CHANNEL ACTIVITY**
-
-{chr(10).join(channel_summaries)}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"""
-                
-                dm_part = f"""📊 **Your Pulse Update - Direct Messages**
-*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-💬 **DIRECT MESSAGES**
-
-{dm_summary}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-*💡 Use `/pulse channels` or `/pulse dms` for focused updates*"""
-                
-                respond(channel_part)
-                respond(dm_part)
-            else:
-                respond(pulse_update)
+            respond("🔄 Generating your pulse update... Summaries will appear in your DM with Pulse as each one finishes.")
+            deliver_pulse_update(user_id, tracked_channels, respond, profile.get("role"))
                 
         except Exception as e:
-            print(f"❌ DEBUG: Error generating pulse update: {e}")
+            log.exception("pulse.update_error", user=user_id, error=str(e))
             respond(f"❌ Error generating update: {str(e)}")
     
     elif subcommand == "channels":
-        print(f"🔍 DEBUG: Showing channel activity for user: {user_id}")
         try:
             profile = get_user(user_id)
             if not profile:
@@ -544,180 +600,356 @@ def pulse_command(ack, body, respond):
             
             respond("🔄 Getting channel updates...")
             
+            decision = token_budget.admission.admit(user_id, profile.get("role"))
             channel_summaries = []
             for channel_name in tracked_channels:
                 channel_id = get_channel_id_by_name(channel_name)
                 if channel_id:
                     messages = get_channel_messages(channel_id, hours_back=24)
-                    summary = generate_channel_summary(channel_name, messages)
-                    channel_summaries.append(f"📍 **#{channel_name}**\n{summary}\n")
+                    summary = generate_channel_summary(channel_name, messages, admission=decision)
+                    channel_summaries.append(pulse_content.channel_section(channel_name, summary))
             
-            channels_update = f"""🏢 **Channel Activity Summary**
-*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-{chr(10).join(channel_summaries)}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-*💡 Use `/pulse update` for full report including DMs*"""
-            
-            respond(channels_update)
+            respond(pulse_content.format_channels_update(channel_summaries))
             
         except Exception as e:
-            print(f"❌ DEBUG: Error in channels command: {e}")
+            log.exception("pulse.channels_error", user=user_id, error=str(e))
             respond(f"❌ Error: {str(e)}")
     
     elif subcommand == "dms":
-        print(f"🔍 DEBUG: Showing DM summary for user: {user_id}")
         try:
             respond("🔄 Analyzing your direct messages...")
             
+            # The role decides the user's team budget; /pulse dms works before setup, with no team
+            team = (get_user(user_id) or {}).get("role")
             dm_data = get_dm_conversations(user_id, hours_back=24)
-            dm_summary = generate_dm_summary(dm_data)
+            dm_summary = generate_dm_summary(dm_data, admission=token_budget.admission.admit(user_id, team))
             
-            dm_update = f"""💬 **Direct Messages Summary**
-*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-{dm_summary}
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-*💡 Use `/pulse update` for full report including channels*"""
-            
-            respond(dm_update)
+            respond(pulse_content.format_dms_update(dm_summary))
             
         except Exception as e:
-            print(f"❌ DEBUG: Error in DMs command: {e}")
+            log.exception("pulse.dms_error", user=user_id, error=str(e))
+            respond(f"❌ Error: {str(e)}")
+    elif subcommand == "search":
+        query = " ".join(args)
+        if not query:
+            respond(pulse_content.SEARCH_USAGE_TEXT)
+            return
+        search_executor.submit(run_search, user_id, query, respond)
+    elif subcommand == "trends":
+        try:
+            respond(pulse_content.format_trends(get_latest_trends()))
+        except Exception as e:
+            log.exception("pulse.trends_error", user=user_id, error=str(e))
             respond(f"❌ Error: {str(e)}")
     elif subcommand == "config":
-        print("🔍 DEBUG: Showing config menu")
         show_config_menu(user_id, respond)
     elif subcommand == "profile":
-        print("🔍 DEBUG: Showing user profile")
         show_user_profile(user_id, respond)
     else:
-        print(f"🔍 DEBUG: Unknown subcommand: {subcommand}")
         respond(f"Unknown command: `{subcommand}`. Use `/pulse help` for available commands.")
 
-def get_help_text():
-    return """🚀 *Pulse Bot Commands*
+def channel_has_activity_since(channel_id, since):
+    """Whether a channel has any top-level message newer than ``since`` (epoch seconds)"""
+    with span("slack.conversations_history", channel=channel_id):
+        result = slack_api.conversations_history(channel=channel_id, oldest=str(since), limit=1)
+    return not result["ok"] or bool(result["messages"])
 
-• `/pulse` - Your complete profile
-• `/pulse update` - AI-powered channel & DM summaries
-• `/pulse channels` - Channel activity only
-• `/pulse dms` - Direct message summaries only
-• `/pulse setup` - First-time setup
-• `/pulse config` - Manage settings
-• `/pulse help` - This help"""
+def summarize_channel(channel_name, on_text=None, since=None, admission=None):
+    """Summary text for one tracked channel, by name.
 
-def start_profile_setup(user_id, respond):
-    print(f"🔍 DEBUG: Starting profile setup for user: {user_id}")
-    setup_blocks = [
-        {
-            "type": "header",
-            "text": {"type": "plain_text", "text": "🚀 Welcome to Pulse Bot!"}
-        },
-        {
-            "type": "section",
-            "text": {"type": "mrkdwn", "text": "*What's your engineering role?*"},
-            "accessory": {
-                "type": "static_select",
-                "placeholder": {"type": "plain_text", "text": "Select your role"},
-                "action_id": "setup_role",
-                "options": [
-                    {"text": {"type": "plain_text", "text": "Software Engineering"}, "value": "software"},
-                    {"text": {"type": "plain_text", "text": "Mechanical Engineering"}, "value": "mechanical"},
-                    {"text": {"type": "plain_text", "text": "Electrical Engineering"}, "value": "electrical"}
-                ]
-            }
-        },
-        {
-            "type": "section",
-            "text": {"type": "mrkdwn", "text": "📺 *Channels you'll be tracking:*\n\n• Your role-specific channel\n• Team channel (for all engineering)"}
-        },
-        {
-            "type": "actions",
-            "elements": [
-                {
-                    "type": "button",
-                    "text": {"type": "plain_text", "text": "Complete Setup"},
-                    "style": "primary",
-                    "action_id": "complete_setup"
-                }
-            ]
+    With ``since``, returns None instead when nothing was posted after it,
+    so a cached summary can be kept.
+    """
+    try:
+        channel_id = get_channel_id_by_name(channel_name)
+        if not channel_id:
+            return pulse_content.CHANNEL_NOT_FOUND_TEXT
+        if since and not channel_has_activity_since(channel_id, since):
+            return None
+        messages = get_channel_messages(channel_id, hours_back=24)
+    except CircuitOpenError as e:
+        return fallback_channel_summary(channel_name, [], e)
+    return generate_channel_summary(channel_name, messages, on_text, admission)
+
+def summarize_dms(user_id, on_text=None, since=None, admission=None):
+    """DM summary text, or None when ``since`` is given and no DM is newer"""
+    dm_data = get_dm_conversations(user_id, hours_back=24)
+    if since and not any(dm["latest_ts"] > since for dm in dm_data):
+        return None
+    return generate_dm_summary(dm_data, on_text, admission)
+
+def refresh_pulse_update(user_id, tracked_channels, cached=None, on_done=None, on_text=None, admission=None):
+    """Summarize a user's tracked channels and DMs concurrently.
+
+    Parts present in ``cached`` (a pre-warmed digest) are only regenerated
+    when there are messages newer than its watermark. ``on_done(key, summary)``
+    is called as each part finishes and ``on_text(key)`` may return a callback
+    for streamed partial text; keys are "#<channel>" and "dms". When the
+    token budget ``admission`` says "cache", ``cached`` is returned as it is.
+    Returns (channel_summaries, dm_summary).
+    """
+    cached = cached or {}
+    if admission and admission.action == "cache" and cached:
+        return {name: cached.get("channels", {}).get(name) for name in tracked_channels}, cached.get("dm_summary")
+    since = cached.get("watermark")
+    cached_channels = cached.get("channels", {})
+    stream = on_text or (lambda key: None)
+    results = {f"#{name}": cached_channels.get(name) for name in tracked_channels}
+    results["dms"] = cached.get("dm_summary")
+    
+    with ThreadPoolExecutor(max_workers=PULSE_UPDATE_WORKERS) as pool:
+        futures = {
+            pool.submit(summarize_channel, name, stream(f"#{name}"), since if name in cached_channels else None, admission): f"#{name}"
+            for name in tracked_channels
         }
-    ]
+        futures[pool.submit(summarize_dms, user_id, stream("dms"), since if results["dms"] else None, admission)] = "dms"
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                log.exception("pulse.update_part_error", user=user_id, part=key, error=str(e))
+                summary = pulse_content.DM_SUMMARY_UNAVAILABLE if key == "dms" else \
+                    pulse_content.channel_summary_unavailable(key[1:], str(e))
+            if summary is None:
+                log.debug("pulse.update_part_cached", user=user_id, part=key)
+                continue
+            if pulse_content.is_summary_error(summary) and results[key] and since:
+                # The digest's summary beats a fallback
+                summary = pulse_content.stale_summary(results[key], since)
+            results[key] = summary
+            if on_done:
+                on_done(key, summary)
+    
+    return {name: results[f"#{name}"] for name in tracked_channels}, results["dms"]
+
+def cached_pulse_update(user_id, tracked_channels):
+    """The user's pre-warmed digest if it is fresh enough to serve, else None"""
+    try:
+        cached = get_prewarmed_digest(user_id)
+    except Exception as e:
+        log.warning("pulse.digest_cache_error", user=user_id, error=str(e))
+        cached = None
+    fresh = prewarm.is_fresh(cached, tracked_channels)
+    metrics.record_cache("pulse_digest", fresh)
+    return cached if fresh else None
+
+def pulse_update_renderer(tracked_channels):
+    """Render ProgressiveMessage parts ("#channel" and "dms" keys) as pulse update blocks"""
+    return lambda parts: pulse_content.pulse_update_blocks(
+        {name: parts.get(f"#{name}") for name in tracked_channels}, parts.get("dms")
+    )
+
+def deliver_pulse_update(user_id, tracked_channels, respond, team=None):
+    """Post the update in the user's DM and fill in each summary as it finishes.
+
+    A pre-warmed digest is shown immediately, then only the parts with
+    newer messages are regenerated. The result is cached for next time.
+    Users over their token budget get the cached digest as it is, or a
+    downgraded update when there is none.
+    """
+    started = time.perf_counter()
+    watermark = time.time()
+    cached = cached_pulse_update(user_id, tracked_channels)
+    decision = token_budget.admission.admit(user_id, team, has_cache=bool(cached))
+    if decision.action == "cache":
+        respond(pulse_content.BUDGET_CACHED_TEXT)
+    message = ProgressiveMessage(slack_api, user_id, pulse_update_renderer(tracked_channels), "📊 Your Pulse Update")
+    parts = {f"#{name}": (cached or {}).get("channels", {}).get(name) for name in tracked_channels}
+    parts["dms"] = (cached or {}).get("dm_summary")
+    try:
+        posted = message.start(parts)
+    except Exception as e:
+        log.warning("pulse.placeholder_error", user=user_id, error=str(e))
+        posted = False
+    
+    if not posted:
+        # Can't DM the user, so send the finished update as the command response instead
+        channel_summaries, dm_summary = refresh_pulse_update(user_id, tracked_channels, cached, admission=decision)
+        for page in paginate_blocks(pulse_content.pulse_update_blocks(channel_summaries, dm_summary)):
+            respond(blocks=page, text="📊 Your Pulse Update")
+    else:
+        first_content = [] if not cached else [True]
+        if cached:
+            metrics.UPDATE_FIRST_CONTENT_SECONDS.observe(time.perf_counter() - started)
+        
+        def done(key, summary):
+            if not first_content:
+                first_content.append(True)
+                metrics.UPDATE_FIRST_CONTENT_SECONDS.observe(time.perf_counter() - started)
+            message.update(key, summary)
+        
+        def partial(key):
+            return lambda text: message.update(key, f"{text} ▌", final=False)
+        
+        channel_summaries, dm_summary = refresh_pulse_update(user_id, tracked_channels, cached, done, partial, decision)
     
-    respond(blocks=setup_blocks)
+    if decision.action == "cache":
+        # Nothing was regenerated, so the cached digest's watermark still stands
+        return
+    try:
+        store_prewarmed_digest(user_id, prewarm.digest_document(channel_summaries, dm_summary, watermark))
+    except Exception as e:
+        log.warning("pulse.digest_store_error", user=user_id, error=str(e))
+
+def get_onboarded_users(user_ids=None):
+    """Onboarded users' documents with their IDs; all of them, or just ``user_ids``"""
+    if user_ids is None:
+        with span("firestore.users.stream_onboarded"):
+            users = [doc.to_dict() | {"id": doc.id} for doc in db.collection('users').where('onboarding_completed', '==', True).stream()]
+    else:
+        with span("firestore.users.get_all", users=len(user_ids)):
+            docs = db.get_all([db.collection('users').document(user_id) for user_id in user_ids])
+            users = [doc.to_dict() | {"id": doc.id} for doc in docs if doc.exists]
+        users = [user for user in users if user.get("onboarding_completed")]
+    metrics.record_reads("users", max(len(users), 1))
+    return users
+
+def send_digest(user, attempt=0):
+    """Build and DM one user's scheduled digest; returns "sent", "deferred", or None if it failed"""
+    try:
+        watermark = time.time()
+        cached = cached_pulse_update(user["id"], user["tracked_channels"])
+        decision = token_budget.admission.admit(
+            user["id"], user.get("role"), scheduled=True, has_cache=bool(cached),
+            can_defer=attempt < BUDGET_MAX_DEFERRALS
+        )
+        if decision.action == "defer":
+            return "deferred"
+        channel_summaries, dm_summary = refresh_pulse_update(user["id"], user["tracked_channels"], cached, admission=decision)
+        if decision.action != "cache":
+            store_prewarmed_digest(user["id"], prewarm.digest_document(channel_summaries, dm_summary, watermark))
+        for page in paginate_blocks(pulse_content.pulse_update_blocks(channel_summaries, dm_summary)):
+            with span("slack.chat_postMessage"):
+                slack_api.chat_postMessage(channel=user["id"], blocks=page, text="📊 Your Pulse Update")
+        create_or_update_user(user["id"], {"last_digest_sent": firestore.SERVER_TIMESTAMP})
+        return "sent"
+    except Exception as e:
+        log.exception("digest.daily_user_error", user=user["id"], error=str(e))
+        return None
+
+def send_daily_digests(user_ids=None, attempt=0):
+    """DM every onboarded, unmuted user (or just ``user_ids``) their pulse update.
+
+    Digests are built and sent on ``digest_executor``; this returns once
+    they are queued, so a slow user never holds up the scheduler tick or
+    the other users. Users deferred by the token budget are retried
+    ``BUDGET_DEFER_SECONDS`` after the batch finishes; after
+    ``BUDGET_MAX_DEFERRALS`` retries they get their cached or a downgraded
+    digest instead. Each user's ``last_digest_sent`` is recorded so a
+    rebuilt delivery plan doesn't send it twice.
+    """
+    users = [user for user in get_onboarded_users(user_ids) if not user.get("muted") and user.get("tracked_channels")]
+    log.info("digest.daily_started", users=len(users), attempt=attempt)
+    futures = [digest_executor.submit(send_digest, user, attempt) for user in users]
+    pending = [len(futures)]
+    pending_lock = threading.Lock()
+
+    def batch_done(_):
+        with pending_lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        outcomes = [future.result() for future in futures]
+        retry_ids = {user["id"] for user, outcome in zip(users, outcomes) if outcome == "deferred"}
+        log.info("digest.daily_finished", sent=outcomes.count("sent"), deferred=len(retry_ids))
+        if retry_ids:
+            def send_deferred_daily_digests():
+                send_daily_digests(retry_ids, attempt + 1)
+            scheduler.once_after(BUDGET_DEFER_SECONDS, send_deferred_daily_digests)
+
+    for future in futures:
+        future.add_done_callback(batch_done)
+    return futures
+
+def _lookup_user_timezone(user_id):
+    """The timezone on the user's Slack profile (e.g. "Europe/Berlin"), or None"""
+    try:
+        with span("slack.users_info"):
+            user_info = slack_api.users_info(user=user_id)
+    except Exception as e:
+        log.warning("slack.users_info_error", user=user_id, error=str(e))
+        return None
+    return user_info["user"].get("tz") if user_info["ok"] else None
+
+def plan_deliveries():
+    """Rebuild the delivery plan from user profiles, storing Slack timezones users don't have yet"""
+    users = get_onboarded_users()
+    missing = [user for user in users if not user.get("tz") and is_schedulable(user)]
+    for user in missing[:DELIVERY_TZ_LOOKUPS_PER_PLAN]:
+        tz = _lookup_user_timezone(user["id"])
+        if tz:
+            user["tz"] = tz
+            create_or_update_user(user["id"], {"tz": tz})
+    delivery.plan(users)
+
+def deliver_due_digests():
+    """Send the digests whose delivery minute has come, in each user's own timezone"""
+    if delivery.needs_plan():
+        plan_deliveries()
+    due = delivery.due()
+    if due:
+        send_daily_digests(set(due))
+
+def prewarm_digests():
+    """Build digests for users whose typical /pulse update time is coming up"""
+    with span("firestore.users.stream_onboarded"):
+        users = [doc.to_dict() | {"id": doc.id} for doc in db.collection('users').where('onboarding_completed', '==', True).stream()]
+    metrics.record_reads("users", max(len(users), 1))
+    
+    now = time.time()
+    due = [user for user in users if prewarm.due_for_prewarm(user, now)]
+    built = 0
+    for user in due[:PREWARM_MAX_USERS_PER_RUN]:
+        try:
+            cached = get_prewarmed_digest(user["id"])
+            if prewarm.recently_built(cached, now):
+                continue
+            # Pre-warming is optional work: skip users until tokens are to spare
+            decision = token_budget.admission.admit(user["id"], user.get("role"), scheduled=True)
+            if decision.action == "defer":
+                continue
+            watermark = time.time()
+            # Refresh incrementally from a still-fresh digest rather than starting over
+            fresh = cached if prewarm.is_fresh(cached, user["tracked_channels"]) else None
+            channel_summaries, dm_summary = refresh_pulse_update(user["id"], user["tracked_channels"], fresh, admission=decision)
+            store_prewarmed_digest(user["id"], prewarm.digest_document(channel_summaries, dm_summary, watermark))
+            built += 1
+        except Exception as e:
+            log.exception("digest.prewarm_user_error", user=user["id"], error=str(e))
+    log.info("digest.prewarm_finished", due=len(due), built=built)
+
+def start_profile_setup(user_id, respond):
+    respond(blocks=pulse_content.setup_blocks())
 
 def show_config_menu(user_id, respond):
-    print(f"🔍 DEBUG: Showing config menu for user: {user_id}")
     profile = get_user(user_id)
     if not profile:
         respond("Please run `/pulse setup` first.")
         return
     
-    tracked_channels = profile.get('tracked_channels', [])
-    config_blocks = [
-        {
-            "type": "header",
-            "text": {"type": "plain_text", "text": "⚙️ Your Configuration"}
-        },
-        {
-            "type": "section",
-            "fields": [
-                {"type": "mrkdwn", "text": f"*Role:* {profile.get('role', 'Not set')}"},
-                {"type": "mrkdwn", "text": f"*Tracked Channels:* {', '.join(tracked_channels) if tracked_channels else 'None'}"}
-            ]
-        },
-        {
-            "type": "actions",
-            "elements": [
-                {
-                    "type": "button",
-                    "text": {"type": "plain_text", "text": "Update Role"},
-                    "action_id": "config_role"
-                }
-            ]
-        }
-    ]
-    
-    respond(blocks=config_blocks)
+    respond(blocks=pulse_content.config_blocks(profile))
 
 def show_user_profile(user_id, respond):
-    print(f"🔍 DEBUG: Showing user profile for: {user_id}")
-    profile = get_user(user_id)
+    profile = get_profile(user_id)
     if not profile:
         respond("Please run `/pulse setup` first.")
         return
     
-    tracked_channels = profile.get('tracked_channels', [])
-    
-    profile_text = f"""*👤 Profile Information*
-• Name: {profile.get('real_name', 'Not set')}
-• Role: {profile.get('role', 'Not set')}
-• Tracked Channels: {', '.join(tracked_channels) if tracked_channels else 'None'}
-• Total Messages: {profile.get('message_count', 0)}
-• Setup Complete: {'✅' if profile.get('onboarding_completed') else '❌'}"""
-    
-    respond(profile_text)
+    respond(pulse_content.profile_info_text(profile))
 
 # Action handlers
 @slack_app.action("setup_role")
 def handle_setup_role(ack, body, respond):
-    print(f"🔍 DEBUG: Setup role action received: {body}")
     ack()
     user_id = body["user"]["id"]
     selected_role = body["actions"][0]["selected_option"]["value"]
     
-    print(f"🔍 DEBUG: User {user_id} selected role: {selected_role}")
+    log.info("setup.role_selected", user=user_id, role=selected_role)
     
     try:
         # Get channels for the selected role
         tracked_channels = get_channels_for_role(selected_role)
-        print(f"🔍 DEBUG: Channels for role {selected_role}: {tracked_channels}")
         
         # Update user with role and automatically assigned channels
         create_or_update_user(user_id, {
@@ -725,92 +957,47 @@ def handle_setup_role(ack, body, respond):
             "tracked_channels": tracked_channels
         })
         
-        print(f"✅ Updated role for {user_id}: {selected_role}")
-        print(f"✅ Auto-assigned channels for {user_id}: {tracked_channels}")
+        log.info("user.role_updated", user=user_id, role=selected_role, channels=tracked_channels)
         
         # Show feedback about the channels that will be tracked
-        channel_list = ', '.join([f"#{channel}" for channel in tracked_channels])
-        respond(f"✅ Role set to **{selected_role}**\n📺 You'll now track: {channel_list}")
+        respond(pulse_content.role_set_text(selected_role, tracked_channels))
         
     except Exception as e:
-        print(f"❌ Error updating role: {e}")
+        log.exception("setup.role_error", user=user_id, error=str(e))
         respond(f"❌ Error setting up role: {str(e)}")
 
 @slack_app.action("complete_setup")
 def handle_complete_setup(ack, body, respond):
-    print(f"🔍 DEBUG: Complete setup action received: {body}")
     ack()
     user_id = body["user"]["id"]
     
     try:
         profile = get_user(user_id)
-        print(f"🔍 DEBUG: Profile for completion: {profile}")
-        
         if not profile or not profile.get('role'):
             respond("❌ Please select your role first before completing setup.")
             return
         
         create_or_update_user(user_id, {"onboarding_completed": True})
-        print(f"✅ DEBUG: Onboarding completed for user: {user_id}")
+        log.info("setup.completed", user=user_id)
         
-        tracked_channels = profile.get('tracked_channels', [])
-        channel_list = ', '.join([f"#{channel}" for channel in tracked_channels])
-        
-        success_message = f"""🎉 *Setup Complete!*
-
-Your profile is configured:
-• Role: {profile.get('role', 'Not set')}
-• Tracking: {channel_list}
-
-Try `/pulse` to see your profile!"""
-        
-        respond(success_message)
+        respond(pulse_content.setup_complete_text(profile))
     except Exception as e:
-        print(f"❌ DEBUG: Setup completion error: {e}")
+        log.exception("setup.complete_error", user=user_id, error=str(e))
         respond(f"❌ Setup error: {str(e)}")
 
 @slack_app.action("config_role")
 def handle_config_role(ack, body, respond):
-    print(f"🔍 DEBUG: Config role action received: {body}")
     ack()
     user_id = body["user"]["id"]
     
-    role_blocks = [
-        {
-            "type": "header",
-            "text": {"type": "plain_text", "text": "🔧 Update Your Role"}
-        },
-        {
-            "type": "section",
-            "text": {"type": "mrkdwn", "text": "*Select your engineering role:*"},
-            "accessory": {
-                "type": "static_select",
-                "placeholder": {"type": "plain_text", "text": "Choose your role"},
-                "action_id": "update_role",
-                "options": [
-                    {"text": {"type": "plain_text", "text": "Software Engineering"}, "value": "software"},
-                    {"text": {"type": "plain_text", "text": "Mechanical Engineering"}, "value": "mechanical"},
-                    {"text": {"type": "plain_text", "text": "Electrical Engineering"}, "value": "electrical"}
-                ]
-            }
-        },
-        {
-            "type": "section",
-            "text": {"type": "mrkdwn", "text": "💡 *Note:* Changing your role will automatically update your tracked channels."}
-        }
-    ]
-    
-    respond(blocks=role_blocks)
+    respond(blocks=pulse_content.role_blocks())
 
 @slack_app.action("update_role")
 def handle_update_role(ack, body, respond):
-    print(f"🔍 DEBUG: Update role action received: {body}")
     ack()
     user_id = body["user"]["id"]
     selected_role = body["actions"][0]["selected_option"]["value"]
     
-    print(f"🔍 DEBUG: User {user_id} updating to role: {selected_role}")
-    
     try:
         # Get channels for the new role
         tracked_channels = get_channels_for_role(selected_role)
@@ -821,55 +1008,78 @@ def handle_update_role(ack, body, respond):
             "tracked_channels": tracked_channels
         })
         
-        print(f"✅ Updated role for {user_id}: {selected_role}")
-        print(f"✅ Updated channels for {user_id}: {tracked_channels}")
+        log.info("user.role_updated", user=user_id, role=selected_role, channels=tracked_channels)
         
-        channel_list = ', '.join([f"#{channel}" for channel in tracked_channels])
-        respond(f"✅ Role updated to **{selected_role}**\n📺 Now tracking: {channel_list}")
+        respond(pulse_content.role_set_text(selected_role, tracked_channels, updated=True))
         
     except Exception as e:
-        print(f"❌ Error updating role: {e}")
+        log.exception("config.role_error", user=user_id, error=str(e))
         respond(f"❌ Error updating role: {str(e)}")
 
+# Background services. Each process runs its own prober; scheduled jobs run in
+# only one process per host and only on the replica holding the leader lease
+scheduler = JobScheduler(leader=LeaderElector(db, "scheduler"))
+scheduler.every(DELIVERY_TICK_SECONDS, deliver_due_digests)
+scheduler.on_activate(delivery.reset)
+scheduler.every(PREWARM_INTERVAL_SECONDS, prewarm_digests)
+scheduler.every(ROLLUP_TRENDS_INTERVAL_SECONDS, update_trends)
+
+def start_background_services():
+    """Start the dependency prober, job scheduler, local store sync and search index for this process"""
+    prober.start()
+    scheduler.start()
+    local_store.start()
+    search_index.start()
+    # Hand the leader lease over immediately on a clean shutdown
+    atexit.register(scheduler.stop)
+
 # Error handling
 @slack_app.error
 def global_error_handler(error, body, logger):
-    print(f"🔍 DEBUG: Global error occurred: {error}")
-    print(f"🔍 DEBUG: Error body: {body}")
+    log.error(
+        "slack.unhandled_error",
+        error=str(error),
+        type=body.get("type") if body else None,
+        event_type=body.get("event", {}).get("type") if body else None
+    )
     logger.exception(f"Error: {error}")
     return f"Sorry, something went wrong: {error}"
 
 if __name__ == "__main__":
-    print("🚀 Starting Pulse Bot with Firebase...")
-    
-    # Debug environment variables (without revealing secrets)
-    print(f"🔍 DEBUG: SLACK_BOT_TOKEN present: {bool(os.environ.get('SLACK_BOT_TOKEN'))}")
-    print(f"🔍 DEBUG: SLACK_SIGNING_SECRET present: {bool(os.environ.get('SLACK_SIGNING_SECRET'))}")
-    print(f"🔍 DEBUG: SLACK_APP_TOKEN present: {bool(os.environ.get('SLACK_APP_TOKEN'))}")
-    print(f"🔍 DEBUG: OPENAI_API_KEY present: {bool(os.environ.get('OPENAI_API_KEY'))}")
+    # Report which environment variables are set (without revealing secrets)
+    log.info(
+        "startup",
+        slack_bot_token=bool(os.environ.get('SLACK_BOT_TOKEN')),
+        slack_signing_secret=bool(os.environ.get('SLACK_SIGNING_SECRET')),
+        slack_app_token=bool(os.environ.get('SLACK_APP_TOKEN')),
+        openai_api_key=bool(os.environ.get('OPENAI_API_KEY'))
+    )
     
     required_vars = ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "OPENAI_API_KEY"]
     missing_vars = [var for var in required_vars if not os.environ.get(var)]
     
     if missing_vars:
-        print(f"❌ Missing environment variables: {', '.join(missing_vars)}")
+        log.error("startup.missing_env", missing=missing_vars)
         exit(1)
     
-    try:
-        test_query = db.collection('test').limit(1).get()
-        print("✅ Firebase connected successfully")
-        print(f"🔍 DEBUG: Firebase test query returned {len(list(test_query))} documents")
-    except Exception as e:
-        print(f"⚠️ Firebase connection warning: {e}")
+    # Probe once up front so the first /ready answer reflects real connectivity
+    prober.probe_all()
+    log.info("startup.dependencies", **{name: result["ok"] for name, result in prober.results.items()})
+    start_background_services()
     
     if os.environ.get("SLACK_APP_TOKEN"):
-        print("📡 Starting in Socket Mode...")
-        print(f"🔍 DEBUG: Socket Mode Handler initializing...")
+        log.info("startup.socket_mode")
+        # Flask only serves /metrics and /health in Socket Mode, so run it in the background
+        metrics_port = int(os.environ.get("METRICS_PORT", os.environ.get("PORT", 3000)))
+        threading.Thread(
+            target=flask_app.run,
+            kwargs={"host": "0.0.0.0", "port": metrics_port},
+            daemon=True
+        ).start()
+        log.info("startup.metrics_server", port=metrics_port)
         handler = SocketModeHandler(slack_app, os.environ["SLACK_APP_TOKEN"])
-        print("🔍 DEBUG: Socket Mode Handler created, starting...")
         handler.start()
-        print("🔍 DEBUG: Socket Mode Handler started successfully")
     else:
-        print("🌐 Starting in HTTP Mode...")
-        print(f"🔍 DEBUG: Starting Flask app on port {int(os.environ.get('PORT', 3000))}")
-        flask_app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 3000)))
\ No newline at end of file
+        # Development server only; production HTTP mode runs under gunicorn via wsgi.py
+        log.info("startup.http_mode", port=int(os.environ.get('PORT', 3000)))
+        flask_app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 3000)), threaded=True)
\ No newline at end of file
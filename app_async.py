@@ -0,0 +1,800 @@
+"""asyncio entry point for Pulse Bot.
+
+Serves the same events, /pulse subcommands and actions as app.py, but on
+Bolt's AsyncApp with the Firestore AsyncClient, AsyncOpenAI and the async
+Slack client. A /pulse update is a coroutine rather than a thread, so one
+process can hold hundreds of them in flight. Each summary fans out across
+channels and DMs with asyncio.gather. Process-wide semaphores keep the
+total number of Slack, OpenAI and Firestore calls bounded.
+
+    python app_async.py
+
+Scheduled digests, pre-warming and trend updates (``update_trends``),
+leader election and the dependency prober stay with the threaded deployment
+(app.py / wsgi.py); run this entry point alongside it for interactive
+traffic. Both read and write the same pre-warmed digest cache. Messages
+ingested here are counted in the shared rollups, but without the threaded
+deployment no trends are computed and ``/pulse trends`` shows none.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from aiohttp import web
+from dotenv import load_dotenv
+from firebase_admin import firestore
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+
+from src.thread_grouping import fetch_missing_replies_async
+from src.telemetry import configure_logging, get_logger, span, timed
+from src import metrics
+from src import pulse_content, prewarm, token_budget, model_cascade, preprocess
+from src.pulse_content import PULSE_SUBCOMMANDS, get_channels_for_role
+from src.slack_client import AsyncSlackWebClient
+from src.dependencies import LazyClient, get_firestore_async, get_async_openai
+from src.progressive import AsyncProgressiveMessage, paginate_blocks, collect_stream_async
+from src.vector_index import search_index, collapse_near_duplicates
+from src.auto_tag import tag_queue
+from src.relevance import embedding_queue
+from src.rollups import rollups
+from src.local_store import local_store
+from src.counters import message_counter, last_active_debouncer, with_message_count
+from src.singleflight import AsyncSingleFlight, fingerprint
+from src.breakers import CircuitOpenError, slack_breaker, openai_breaker, openai_key, firestore_breaker, last_good
+from config import (
+    ASYNC_SLACK_CONCURRENCY, ASYNC_OPENAI_CONCURRENCY, ASYNC_FIRESTORE_CONCURRENCY,
+    PULSE_STREAM_SUMMARIES, SEARCH_WINDOW_HOURS, DIGEST_MAX_AGE_HOURS, OPENAI_MAX_RETRIES
+)
+
+# Load environment variables
+load_dotenv()
+
+configure_logging()
+log = get_logger("pulse.app_async")
+
+# Created on first use, so importing this module needs no credentials
+db = LazyClient(get_firestore_async)
+
+slack_app = AsyncApp(
+    token=os.environ.get("SLACK_BOT_TOKEN"),
+    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+)
+slack_api = AsyncSlackWebClient(token=os.environ.get("SLACK_BOT_TOKEN"), breaker=slack_breaker)
+openai_client = LazyClient(get_async_openai)
+
+# Shared by every in-flight request, so a burst of updates queues here instead
+# of opening unbounded connections to each dependency
+slack_limit = asyncio.Semaphore(ASYNC_SLACK_CONCURRENCY)
+openai_limit = asyncio.Semaphore(ASYNC_OPENAI_CONCURRENCY)
+firestore_limit = asyncio.Semaphore(ASYNC_FIRESTORE_CONCURRENCY)
+
+
+class _LimitedSlack:
+    """Slack client view whose calls hold ``slack_limit`` and are timed as spans"""
+
+    def __getattr__(self, name):
+        async def call(**params):
+            async with slack_limit:
+                with span(f"slack.{name}", channel=params.get("channel")):
+                    return await getattr(slack_api, name)(**params)
+        return call
+
+slack = _LimitedSlack()
+
+# Firestore
+
+@timed("firestore.get_user")
+async def get_user(user_id):
+    user = local_store.get_user(user_id)
+    if user is not None:
+        return user
+    async with firestore_limit:
+        with firestore_breaker.guard():
+            doc = await db.collection("users").document(user_id).get(timeout=firestore_breaker.timeout())
+    metrics.record_reads("users")
+    user = doc.to_dict() if doc.exists else None
+    local_store.put_user(user_id, user)
+    return user
+
+@timed("firestore.counters.increment")
+async def increment_message_count(user_id):
+    async with firestore_limit:
+        await message_counter.shard(user_id, db).set({"count": firestore.Increment(1)}, merge=True)
+    metrics.record_writes("counters")
+
+async def get_profile(user_id):
+    """The user's document, with their sharded message count"""
+    profile = await get_user(user_id)
+    if not profile:
+        return None
+    total = message_counter.cached(user_id)
+    if total is None:
+        async with firestore_limit:
+            total = message_counter.remember(user_id, await message_counter.shards(user_id, db).get())
+    return with_message_count(profile, total)
+
+@timed("firestore.get_latest_trends")
+async def get_latest_trends():
+    async with firestore_limit:
+        docs = await db.collection("trends").order_by(
+            "date", direction=firestore.Query.DESCENDING
+        ).limit(1).get()
+    metrics.record_reads("trends")
+    return docs[0].to_dict() if docs else None
+
+@timed("firestore.create_or_update_user")
+async def create_or_update_user(user_id, data):
+    async with firestore_limit:
+        await db.collection("users").document(user_id).set(data, merge=True)
+    metrics.record_writes("users")
+    local_store.forget_user(user_id)
+
+@timed("firestore.users.delete")
+async def delete_user(user_id):
+    async with firestore_limit:
+        await db.collection("users").document(user_id).delete()
+    metrics.record_writes("users")
+    local_store.forget_user(user_id)
+
+# Slack reads. Concurrent updates share identical reads and summaries in flight
+
+history_flights = AsyncSingleFlight("channel_history")
+user_flights = AsyncSingleFlight("users_info")
+channel_lookup_flights = AsyncSingleFlight("channel_lookup")
+summary_flights = AsyncSingleFlight("channel_summary")
+
+async def get_user_name(user_id, cache):
+    """Display name for a user from the shared directory, else looked up once per request"""
+    name = preprocess.user_directory.get(user_id)
+    missed = name is None and preprocess.user_directory.missed(user_id)
+    metrics.record_cache("users_info", name is not None or missed or user_id in cache)
+    if name is not None:
+        return name
+    if missed:
+        return "Unknown"
+    if user_id not in cache:
+        cache[user_id] = asyncio.ensure_future(user_flights.do(user_id, _lookup_user_name, user_id))
+    return await cache[user_id]
+
+async def resolve_mentions(texts):
+    """Look up users mentioned in ``texts`` so preprocessing can name them"""
+    cache = {}
+    await asyncio.gather(*(get_user_name(user_id, cache) for user_id in preprocess.mentioned_users(texts)))
+
+async def _lookup_user_name(user_id):
+    if not user_id:
+        return "Unknown"
+    try:
+        user_info = await slack.users_info(user=user_id)
+    except Exception:
+        preprocess.user_directory.put_miss(user_id)
+        return "Unknown"
+    if not user_info["ok"]:
+        preprocess.user_directory.put_miss(user_id)
+        return "Unknown"
+    name = user_info["user"]["real_name"] or user_info["user"]["name"]
+    preprocess.user_directory.put(user_id, name)
+    return name
+
+async def get_channel_messages(channel_id, hours_back=24):
+    """Get recent messages from a specific channel"""
+    return await history_flights.do((channel_id, hours_back), _fetch_channel_messages, channel_id, hours_back)
+
+async def _fetch_channel_messages(channel_id, hours_back):
+    try:
+        since_ts = (datetime.now() - timedelta(hours=hours_back)).timestamp()
+        result = await slack.conversations_history(channel=channel_id, oldest=str(since_ts), limit=100)
+        if not result["ok"]:
+            log.warning("channel.fetch_messages_failed", channel=channel_id, error=result.get("error"))
+            return []
+
+        messages = result["messages"]
+        # History only returns thread parents, so pull in the missing replies
+        messages = messages + await fetch_missing_replies_async(slack, channel_id, messages, oldest=str(since_ts))
+        messages = [msg for msg in messages if not msg.get("bot_id") and msg.get("text")]
+
+        user_names = {}
+        names = await asyncio.gather(*(get_user_name(msg.get("user"), user_names) for msg in messages))
+        return [pulse_content.format_channel_message(msg, name) for msg, name in zip(messages, names)]
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        log.exception("channel.fetch_messages_error", channel=channel_id, error=str(e))
+        return []
+
+async def _dm_conversation(user_id, channel, since_ts, user_names):
+    try:
+        history = await slack.conversations_history(channel=channel["id"], oldest=str(since_ts), limit=20)
+        if not history["ok"] or not history["messages"]:
+            return None
+        other_name = await get_user_name(channel["user"], user_names)
+        formatted_msgs = [
+            pulse_content.format_dm_message(msg, user_id, other_name)
+            for msg in history["messages"] if msg.get("text")
+        ]
+        if not formatted_msgs:
+            return None
+        return {
+            "partner": other_name,
+            "messages": formatted_msgs[-10:],  # Last 10 messages
+            "latest_ts": max(float(msg["ts"]) for msg in history["messages"])
+        }
+    except Exception as e:
+        log.warning("dm.channel_error", channel=channel.get("id"), error=str(e))
+        return None
+
+async def get_dm_conversations(user_id, hours_back=24):
+    """Get recent DM conversations for a user"""
+    try:
+        result = await slack.conversations_list(types="im", limit=50)
+        if not result["ok"]:
+            return []
+        since_ts = (datetime.now() - timedelta(hours=hours_back)).timestamp()
+        user_names = {}
+        conversations = await asyncio.gather(
+            *(_dm_conversation(user_id, channel, since_ts, user_names) for channel in result["channels"])
+        )
+        return [dm for dm in conversations if dm]
+    except Exception as e:
+        log.exception("dm.fetch_conversations_error", user=user_id, error=str(e))
+        return []
+
+async def get_channel_ids(channel_names):
+    """Map channel names to IDs with a single conversations_list call"""
+    try:
+        result = await channel_lookup_flights.do(
+            "public_channel,private_channel", slack.conversations_list, types="public_channel,private_channel", limit=200
+        )
+    except Exception as e:
+        log.exception("channel.lookup_error", error=str(e))
+        return {}
+    if not result["ok"]:
+        log.warning("channel.list_failed", error=result.get("error"))
+        return {}
+    wanted = set(channel_names)
+    return {channel["name"]: channel["id"] for channel in result["channels"] if channel["name"] in wanted}
+
+# Summaries
+
+async def complete_summary(request, on_text=None, admission=None, **fields):
+    """Run a summary completion, streaming partial text to ``on_text`` when enabled.
+
+    Same token accounting as app.complete_summary.
+    """
+    request = admission.apply(request) if admission else request
+    charge = {"user": admission.user, "team": admission.team} if admission else {}
+    streamed = bool(on_text and PULSE_STREAM_SUMMARIES)
+    key = openai_key(request, streamed)
+    client = openai_client.with_options(max_retries=OPENAI_MAX_RETRIES)
+    async with openai_limit:
+        # Fails fast while OpenAI's breaker is open; otherwise times out at the observed p99 of
+        # calls like this one (same model and cap; streams are timed to their first token)
+        with openai_breaker.guard(key, timed=not streamed), span("openai.chat_completions", **fields):
+            if streamed:
+                started = time.perf_counter()
+                stream = await client.chat.completions.create(
+                    **request, stream=True, timeout=openai_breaker.timeout(key)
+                )
+                text = await collect_stream_async(
+                    stream, on_text, on_first=lambda: openai_breaker.observe(time.perf_counter() - started, key)
+                )
+                # Streamed responses carry no usage field, so the ledger gets an estimate
+                token_budget.ledger.record(
+                    request["model"], None, channel=fields.get("channel"), purpose=fields.get("purpose"),
+                    prompt_tokens=token_budget.request_prompt_tokens(request),
+                    completion_tokens=token_budget.estimate_tokens(text), **charge
+                )
+                return text
+            response = await client.chat.completions.create(**request, timeout=openai_breaker.timeout(key))
+    metrics.record_openai_usage(request["model"], response)
+    token_budget.ledger.record(
+        request["model"], response.usage, channel=fields.get("channel"), purpose=fields.get("purpose"), **charge
+    )
+    return response.choices[0].message.content.strip()
+
+async def admit(user_id, team=None, has_cache=False):
+    """Token budget decision for a user; usage totals are read with the blocking Firestore client"""
+    return await asyncio.to_thread(token_budget.admission.admit, user_id, team, has_cache=has_cache)
+
+async def generate_channel_summary(channel_name, messages, on_text=None, admission=None):
+    """Generate AI summary of channel activity"""
+    if not messages:
+        return f"No recent activity in #{channel_name}"
+    # Routed on what the prompt will carry: plain text with mentions resolved,
+    # long pastes cut down and repeated posts collapsed
+    await resolve_mentions([msg["text"] for msg in messages])
+    messages = collapse_near_duplicates(preprocess.prepare_messages(messages))
+    if not messages:
+        return f"No recent activity in #{channel_name}"
+    route = model_cascade.route([msg["text"] for msg in messages], "channel_summary", channel=channel_name)
+    if route.tier == "extractive":
+        return pulse_content.extractive_channel_summary(messages)
+    request = pulse_content.channel_summary_request(channel_name, messages, route.model)
+    # Same key as app.generate_channel_summary
+    effective = admission.apply(request) if admission else request
+    key = (channel_name, fingerprint(effective["messages"]), effective["model"], effective.get("max_tokens"))
+    try:
+        summary = await summary_flights.do(
+            key, complete_summary, request, on_text, admission, purpose="channel_summary", channel=channel_name
+        )
+    except Exception as e:
+        log.warning("summary.channel_error", channel=channel_name, error=str(e))
+        return fallback_channel_summary(channel_name, messages, e)
+    last_good.put(channel_name, summary)
+    return summary
+
+def fallback_channel_summary(channel_name, messages, error):
+    """Same fallbacks as app.fallback_channel_summary"""
+    entry = last_good.get(channel_name, DIGEST_MAX_AGE_HOURS * 3600)
+    if entry:
+        return pulse_content.stale_summary(entry[1], entry[0])
+    if messages:
+        return pulse_content.degraded_channel_summary(messages)
+    return pulse_content.channel_summary_unavailable(channel_name, str(error))
+
+async def generate_dm_summary(dm_data, on_text=None, admission=None):
+    """Generate AI summary of DM conversations"""
+    if not dm_data:
+        return "No recent DM activity"
+    await resolve_mentions([text for dm in dm_data for text in dm["messages"]])
+    dm_data = preprocess.prepare_conversations(dm_data)
+    if not dm_data:
+        return "No recent DM activity"
+    route = model_cascade.route(
+        [message for _, messages in pulse_content.summarized_dms(dm_data) for message in messages], "dm_summary"
+    )
+    if route.tier == "extractive":
+        return pulse_content.extractive_dm_summary(dm_data)
+    try:
+        return await complete_summary(
+            pulse_content.dm_summary_request(dm_data, route.model), on_text, admission, purpose="dm_summary"
+        )
+    except Exception as e:
+        log.warning("summary.dm_error", error=str(e))
+        return pulse_content.degraded_dm_summary(dm_data)
+
+async def channel_has_activity_since(channel_id, since):
+    """Whether a channel has any top-level message newer than ``since`` (epoch seconds)"""
+    result = await slack.conversations_history(channel=channel_id, oldest=str(since), limit=1)
+    return not result["ok"] or bool(result["messages"])
+
+async def summarize_channel(channel_name, channel_id, on_text=None, since=None, admission=None):
+    """Summary text for one tracked channel, or None if nothing was posted after ``since``"""
+    try:
+        if not channel_id:
+            # get_channel_ids finds nothing while Slack's breaker is open
+            if slack_breaker.state != "closed":
+                raise CircuitOpenError("slack")
+            return pulse_content.CHANNEL_NOT_FOUND_TEXT
+        if since and not await channel_has_activity_since(channel_id, since):
+            return None
+        messages = await get_channel_messages(channel_id, hours_back=24)
+    except CircuitOpenError as e:
+        return fallback_channel_summary(channel_name, [], e)
+    return await generate_channel_summary(channel_name, messages, on_text, admission)
+
+async def summarize_channels(tracked_channels, channel_ids, admission=None):
+    """Summary text per channel name, generated concurrently"""
+    summaries = await asyncio.gather(*(
+        summarize_channel(name, channel_ids.get(name), admission=admission) for name in tracked_channels
+    ))
+    return dict(zip(tracked_channels, summaries))
+
+async def summarize_dms(user_id, on_text=None, since=None, admission=None):
+    """DM summary text, or None when ``since`` is given and no DM is newer"""
+    dm_data = await get_dm_conversations(user_id, hours_back=24)
+    if since and not any(dm["latest_ts"] > since for dm in dm_data):
+        return None
+    return await generate_dm_summary(dm_data, on_text, admission)
+
+async def refresh_pulse_update(user_id, tracked_channels, cached=None, on_done=None, on_text=None, admission=None):
+    """Summarize a user's tracked channels and DMs concurrently.
+
+    Same contract as app.refresh_pulse_update: cached parts are only
+    regenerated when there are messages newer than the digest's watermark,
+    and ``on_done`` is awaited as each part finishes.
+    """
+    cached = cached or {}
+    if admission and admission.action == "cache" and cached:
+        return {name: cached.get("channels", {}).get(name) for name in tracked_channels}, cached.get("dm_summary")
+    since = cached.get("watermark")
+    cached_channels = cached.get("channels", {})
+    stream = on_text or (lambda key: None)
+    results = {f"#{name}": cached_channels.get(name) for name in tracked_channels}
+    results["dms"] = cached.get("dm_summary")
+    channel_ids = await get_channel_ids(tracked_channels)
+
+    async def run(key, summary):
+        summary = await summary
+        if summary is None:
+            log.debug("pulse.update_part_cached", user=user_id, part=key)
+            return
+        if pulse_content.is_summary_error(summary) and results[key] and since:
+            # The digest's summary beats a fallback
+            summary = pulse_content.stale_summary(results[key], since)
+        results[key] = summary
+        if on_done:
+            await on_done(key, summary)
+
+    await asyncio.gather(
+        *(run(f"#{name}", summarize_channel(
+            name, channel_ids.get(name), stream(f"#{name}"), since if name in cached_channels else None, admission
+        )) for name in tracked_channels),
+        run("dms", summarize_dms(user_id, stream("dms"), since if results["dms"] else None, admission))
+    )
+    return {name: results[f"#{name}"] for name in tracked_channels}, results["dms"]
+
+async def cached_pulse_update(user_id, tracked_channels):
+    """The user's pre-warmed digest if it is fresh enough to serve, else None"""
+    try:
+        async with firestore_limit:
+            with firestore_breaker.guard(), span("firestore.get_prewarmed_digest"):
+                doc = await db.collection("pulse_digests").document(user_id).get(timeout=firestore_breaker.timeout())
+        metrics.record_reads("pulse_digests")
+        cached = doc.to_dict() if doc.exists else None
+    except Exception as e:
+        log.warning("pulse.digest_cache_error", user=user_id, error=str(e))
+        cached = None
+    fresh = prewarm.is_fresh(cached, tracked_channels)
+    metrics.record_cache("pulse_digest", fresh)
+    return cached if fresh else None
+
+async def store_prewarmed_digest(user_id, digest):
+    try:
+        async with firestore_limit:
+            with firestore_breaker.guard(), span("firestore.store_prewarmed_digest"):
+                await db.collection("pulse_digests").document(user_id).set(digest, timeout=firestore_breaker.timeout())
+        metrics.record_writes("pulse_digests")
+    except Exception as e:
+        log.warning("pulse.digest_store_error", user=user_id, error=str(e))
+
+async def deliver_pulse_update(user_id, tracked_channels, respond, team=None):
+    """Post the update in the user's DM and fill in each summary as it finishes.
+
+    A pre-warmed digest is shown immediately, then only the parts with
+    newer messages are regenerated. The result is cached for next time.
+    Token budgets apply as in app.deliver_pulse_update.
+    """
+    started = time.perf_counter()
+    watermark = time.time()
+    cached = await cached_pulse_update(user_id, tracked_channels)
+    decision = await admit(user_id, team, has_cache=bool(cached))
+    if decision.action == "cache":
+        await respond(pulse_content.BUDGET_CACHED_TEXT)
+    message = AsyncProgressiveMessage(
+        slack, user_id,
+        lambda parts: pulse_content.pulse_update_blocks(
+            {name: parts.get(f"#{name}") for name in tracked_channels}, parts.get("dms")
+        ),
+        "📊 Your Pulse Update"
+    )
+    parts = {f"#{name}": (cached or {}).get("channels", {}).get(name) for name in tracked_channels}
+    parts["dms"] = (cached or {}).get("dm_summary")
+    try:
+        posted = await message.start(parts)
+    except Exception as e:
+        log.warning("pulse.placeholder_error", user=user_id, error=str(e))
+        posted = False
+
+    if not posted:
+        # Can't DM the user, so send the finished update as the command response instead
+        channel_summaries, dm_summary = await refresh_pulse_update(user_id, tracked_channels, cached, admission=decision)
+        for page in paginate_blocks(pulse_content.pulse_update_blocks(channel_summaries, dm_summary)):
+            await respond(blocks=page, text="📊 Your Pulse Update")
+    else:
+        first_content = [True] if cached else []
+        if cached:
+            metrics.UPDATE_FIRST_CONTENT_SECONDS.observe(time.perf_counter() - started)
+
+        async def done(key, summary):
+            if not first_content:
+                first_content.append(True)
+                metrics.UPDATE_FIRST_CONTENT_SECONDS.observe(time.perf_counter() - started)
+            await message.update(key, summary)
+
+        def partial(key):
+            return lambda text: message.update(key, f"{text} ▌", final=False)
+
+        channel_summaries, dm_summary = await refresh_pulse_update(
+            user_id, tracked_channels, cached, done, partial, decision
+        )
+
+    if decision.action == "cache":
+        # Nothing was regenerated, so the cached digest's watermark still stands
+        return
+    await store_prewarmed_digest(user_id, prewarm.digest_document(channel_summaries, dm_summary, watermark))
+
+# HTTP endpoints served next to /slack/events
+
+async def metrics_endpoint(request):
+    return web.Response(text=metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4"})
+
+async def health_check(request):
+    return web.json_response({"status": "healthy", "timestamp": datetime.now().isoformat()})
+
+# Slack handlers
+
+@slack_app.middleware
+async def log_request(body, next):
+    event_type = body.get("event", {}).get("type") if "event" in body else None
+    if event_type:
+        metrics.EVENTS_TOTAL.labels(event_type).inc()
+    elif body.get("command"):
+        metrics.EVENTS_TOTAL.labels("command").inc()
+    else:
+        metrics.EVENTS_TOTAL.labels(body.get("type", "unknown")).inc()
+    log.debug("request.received", type=body.get("type", "unknown"), event_type=event_type)
+    return await next()
+
+@slack_app.event("message")
+async def handle_message_events(body):
+    event = body.get("event", {})
+    log.debug("message.received", user=event.get("user"), channel=event.get("channel"), subtype=event.get("subtype"))
+
+    if event.get("bot_id") or event.get("subtype") == "bot_message":
+        return
+
+    message_data = {
+        "user": event.get("user"),
+        "channel": event.get("channel"),
+        "text": event.get("text", ""),
+        "timestamp": event.get("ts"),
+        "thread_ts": event.get("thread_ts"),
+        "channel_type": event.get("channel_type", "unknown"),
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP
+    }
+
+    async def store_message():
+        try:
+            async with firestore_limit:
+                with span("firestore.messages.add"):
+                    _, doc_ref = await db.collection('messages').add(message_data)
+            metrics.record_writes("messages")
+            local_store.put_message(doc_ref.id, message_data)
+            # Embedded and tagged in the background, with the sync client on the queues' threads
+            embedding_queue.submit(doc_ref, message_data["text"])
+            tag_queue.submit(doc_ref, message_data["text"])
+            rollups.record(event)
+        except Exception as e:
+            log.exception("message.store_error", channel=event.get("channel"), error=str(e))
+
+    async def update_activity(user_id):
+        try:
+            await increment_message_count(user_id)
+        except Exception as e:
+            log.exception("user.message_count_error", user=user_id, error=str(e))
+        if last_active_debouncer.due(user_id):
+            try:
+                await create_or_update_user(user_id, {"last_active": firestore.SERVER_TIMESTAMP})
+            except Exception as e:
+                last_active_debouncer.forget(user_id)
+                log.exception("user.activity_update_error", user=user_id, error=str(e))
+
+    user_id = event.get("user")
+    if not user_id:
+        log.warning("message.missing_user", channel=event.get("channel"), subtype=event.get("subtype"))
+        await store_message()
+        return
+    await asyncio.gather(store_message(), update_activity(user_id))
+
+@slack_app.event("app_mention")
+async def handle_app_mention_events(body):
+    event = body.get("event", {})
+    log.info("app_mention.received", user=event.get("user"), channel=event.get("channel"))
+    try:
+        await slack.chat_postMessage(channel=event["channel"], text=pulse_content.mention_reply_text(event["user"]))
+    except Exception as e:
+        log.exception("app_mention.respond_error", channel=event.get("channel"), error=str(e))
+
+@slack_app.event("member_joined_channel")
+async def handle_member_joined(body):
+    event = body.get("event", {})
+    log.info("member.joined_channel", user=event.get("user"), channel=event.get("channel"))
+
+@slack_app.event("member_left_channel")
+async def handle_member_left(body):
+    event = body.get("event", {})
+    log.info("member.left_channel", user=event.get("user"), channel=event.get("channel"))
+
+@slack_app.event("channel_created")
+async def handle_channel_created(body):
+    channel = body.get("event", {}).get("channel", {})
+    log.info("channel.created", channel=channel.get("id"), channel_name=channel.get("name"))
+
+@slack_app.command("/pulse")
+async def pulse_command(ack, body, respond):
+    await ack()
+
+    user_id = body["user_id"]
+    text = body.get("text", "").strip()
+    args = text.split() if text else []
+    subcommand = args[0].lower() if args else ""
+    log.info("pulse.command", user=user_id, subcommand=subcommand)
+
+    start = time.perf_counter()
+    try:
+        await handle_pulse_subcommand(user_id, subcommand, respond, args[1:])
+    finally:
+        label = (subcommand or "profile") if subcommand in PULSE_SUBCOMMANDS else "unknown"
+        metrics.COMMAND_SECONDS.labels(label).observe(time.perf_counter() - start)
+
+async def handle_pulse_subcommand(user_id, subcommand, respond, args=()):
+    """Run a single /pulse subcommand"""
+    try:
+        if subcommand in ("", "me"):
+            profile = await get_profile(user_id)
+            if not profile:
+                await respond("👋 Welcome! Please run `/pulse setup` to get started.")
+            elif subcommand == "":
+                await respond(pulse_content.pulse_profile_text(profile))
+            else:
+                await respond(pulse_content.me_text(profile))
+        elif subcommand == "setup":
+            await respond(blocks=pulse_content.setup_blocks())
+        elif subcommand == "help":
+            await respond(pulse_content.get_help_text())
+        elif subcommand == "reset":
+            await delete_user(user_id)
+            log.info("pulse.profile_reset", user=user_id)
+            await respond("✅ Profile deleted! Run `/pulse setup` to start fresh.")
+        elif subcommand in ("update", "summary"):
+            profile = await get_user(user_id)
+            if not profile:
+                await respond("👋 Please run `/pulse setup` first to configure your channels.")
+                return
+            tracked_channels = profile.get('tracked_channels', [])
+            if not tracked_channels:
+                await respond("❌ No channels configured. Run `/pulse setup` to select your role.")
+                return
+
+            try:
+                await create_or_update_user(user_id, {"update_history": prewarm.record_request(profile.get("update_history"))})
+            except Exception as e:
+                log.warning("pulse.history_error", user=user_id, error=str(e))
+
+            await respond("🔄 Generating your pulse update... Summaries will appear in your DM with Pulse as each one finishes.")
+            await deliver_pulse_update(user_id, tracked_channels, respond, profile.get("role"))
+        elif subcommand == "channels":
+            profile = await get_user(user_id)
+            if not profile:
+                await respond("👋 Please run `/pulse setup` first.")
+                return
+            tracked_channels = profile.get('tracked_channels', [])
+            if not tracked_channels:
+                await respond("❌ No channels configured.")
+                return
+            await respond("🔄 Getting channel updates...")
+            channel_ids = await get_channel_ids(tracked_channels)
+            found = [name for name in tracked_channels if name in channel_ids]
+            summaries = await summarize_channels(found, channel_ids, await admit(user_id, profile.get("role")))
+            await respond(pulse_content.format_channels_update(
+                [pulse_content.channel_section(name, summary) for name, summary in summaries.items()]
+            ))
+        elif subcommand == "dms":
+            await respond("🔄 Analyzing your direct messages...")
+            # The role decides the user's team budget; /pulse dms works before setup, with no team
+            decision = await admit(user_id, ((await get_user(user_id)) or {}).get("role"))
+            await respond(pulse_content.format_dms_update(await summarize_dms(user_id, admission=decision)))
+        elif subcommand == "search":
+            query = " ".join(args)
+            if not query:
+                await respond(pulse_content.SEARCH_USAGE_TEXT)
+                return
+            # The query embedding may be an OpenAI call with the sync client
+            results = await asyncio.to_thread(search_index.search, query)
+            if results is None:
+                await respond(pulse_content.SEARCH_INDEXING_TEXT)
+            else:
+                await respond(pulse_content.format_search_results(query, results, SEARCH_WINDOW_HOURS))
+        elif subcommand == "trends":
+            await respond(pulse_content.format_trends(await get_latest_trends()))
+        elif subcommand in ("config", "profile"):
+            profile = await (get_profile if subcommand == "profile" else get_user)(user_id)
+            if not profile:
+                await respond("Please run `/pulse setup` first.")
+            elif subcommand == "config":
+                await respond(blocks=pulse_content.config_blocks(profile))
+            else:
+                await respond(pulse_content.profile_info_text(profile))
+        else:
+            await respond(f"Unknown command: `{subcommand}`. Use `/pulse help` for available commands.")
+    except Exception as e:
+        log.exception("pulse.command_error", user=user_id, subcommand=subcommand, error=str(e))
+        await respond(f"❌ Error: {str(e)}")
+
+async def _set_role(body, respond, updated):
+    user_id = body["user"]["id"]
+    selected_role = body["actions"][0]["selected_option"]["value"]
+    try:
+        tracked_channels = get_channels_for_role(selected_role)
+        await create_or_update_user(user_id, {"role": selected_role, "tracked_channels": tracked_channels})
+        log.info("user.role_updated", user=user_id, role=selected_role, channels=tracked_channels)
+        await respond(pulse_content.role_set_text(selected_role, tracked_channels, updated=updated))
+    except Exception as e:
+        log.exception("config.role_error" if updated else "setup.role_error", user=user_id, error=str(e))
+        await respond(f"❌ Error {'updating' if updated else 'setting up'} role: {str(e)}")
+
+@slack_app.action("setup_role")
+async def handle_setup_role(ack, body, respond):
+    await ack()
+    await _set_role(body, respond, updated=False)
+
+@slack_app.action("update_role")
+async def handle_update_role(ack, body, respond):
+    await ack()
+    await _set_role(body, respond, updated=True)
+
+@slack_app.action("complete_setup")
+async def handle_complete_setup(ack, body, respond):
+    await ack()
+    user_id = body["user"]["id"]
+    try:
+        profile = await get_user(user_id)
+        if not profile or not profile.get('role'):
+            await respond("❌ Please select your role first before completing setup.")
+            return
+        await create_or_update_user(user_id, {"onboarding_completed": True})
+        log.info("setup.completed", user=user_id)
+        await respond(pulse_content.setup_complete_text(profile))
+    except Exception as e:
+        log.exception("setup.complete_error", user=user_id, error=str(e))
+        await respond(f"❌ Setup error: {str(e)}")
+
+@slack_app.action("config_role")
+async def handle_config_role(ack, respond):
+    await ack()
+    await respond(blocks=pulse_content.role_blocks())
+
+@slack_app.error
+async def global_error_handler(error, body, logger):
+    log.error(
+        "slack.unhandled_error",
+        error=str(error),
+        type=body.get("type") if body else None,
+        event_type=body.get("event", {}).get("type") if body else None
+    )
+
+def create_web_app():
+    """aiohttp application serving Slack events, /metrics and /health"""
+    web_app = slack_app.web_app(path="/slack/events")
+    web_app.router.add_get("/metrics", metrics_endpoint)
+    web_app.router.add_get("/health", health_check)
+
+    async def close_clients(app):
+        await slack_api.close()
+    web_app.on_cleanup.append(close_clients)
+    return web_app
+
+async def run_socket_mode(port):
+    """Socket Mode for Slack traffic, with /metrics and /health on ``port``"""
+    web_app = web.Application()
+    web_app.router.add_get("/metrics", metrics_endpoint)
+    web_app.router.add_get("/health", health_check)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    log.info("startup.metrics_server", port=port)
+    try:
+        await AsyncSocketModeHandler(slack_app, os.environ["SLACK_APP_TOKEN"]).start_async()
+    finally:
+        await slack_api.close()
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    required_vars = ["SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "OPENAI_API_KEY"]
+    missing_vars = [var for var in required_vars if not os.environ.get(var)]
+    if missing_vars:
+        log.error("startup.missing_env", missing=missing_vars)
+        exit(1)
+
+    # Built and refreshed on its own thread, with the sync Firestore client
+    search_index.start()
+    if os.environ.get("SLACK_APP_TOKEN"):
+        log.info("startup.socket_mode", runtime="asyncio")
+        asyncio.run(run_socket_mode(int(os.environ.get("METRICS_PORT", os.environ.get("PORT", 3000)))))
+    else:
+        port = int(os.environ.get("PORT", 3000))
+        log.info("startup.http_mode", runtime="asyncio", port=port)
+        web.run_app(create_web_app(), host="0.0.0.0", port=port)
@@ -0,0 +1,40 @@
+"""Helpers shared by the load-test and benchmark scripts."""
+import hashlib
+import hmac
+import json
+import time
+from src.metrics import percentile
+
+
+def sign_request(signing_secret, body, timestamp=None):
+    """Return the Slack signature headers for a raw request body"""
+    timestamp = str(int(timestamp or time.time()))
+    basestring = f"v0:{timestamp}:{body}".encode()
+    signature = "v0=" + hmac.new(signing_secret.encode(), basestring, hashlib.sha256).hexdigest()
+    return {
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature
+    }
+
+
+def latency_report(samples):
+    """Summarize latency samples (seconds) in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p90_ms": round(percentile(samples, 90) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2)
+    }
+
+
+def load_payloads(path):
+    """Load event payloads from a JSON list or a JSON-lines file"""
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
@@ -0,0 +1,182 @@
+"""In-process fake of the OpenAI chat completions API for benchmarks.
+
+    python -m bench.fake_openai --port 8092 --latency-ms 400 [--fixture completions.json]
+
+Point the bot at it with ``OPENAI_BASE_URL=http://localhost:8092/v1``.
+Serves /v1/chat/completions (plain and ``stream=True``) and /v1/models.
+Replies replay the texts in a fixture file (a JSON list of strings, or of
+recorded completion responses) in turn, or a canned summary without one.
+Usage is reported as roughly one token per four characters so token
+accounting can be benchmarked.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_COMPLETION = """• *Topics:* battery pack thermal review, CI flakiness on the firmware build
+• *Decisions:* ship rev C harness on Friday; pin the toolchain version
+• *Blockers:* waiting on supplier quote for the 12V converters
+• *Sentiment:* busy but upbeat"""
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def load_completions(path):
+    """Completion texts from a fixture: strings, or recorded API responses"""
+    with open(path) as f:
+        data = json.load(f)
+    texts = []
+    for item in data:
+        if isinstance(item, str):
+            texts.append(item)
+        else:
+            texts.append(item["choices"][0]["message"]["content"])
+    return texts
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server answering chat completions after a fixed latency"""
+
+    def __init__(self, completions=None, host="127.0.0.1", port=0, latency=0.0, chunk_chars=40):
+        self._completions = itertools.cycle(completions or [DEFAULT_COMPLETION])
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.calls = Counter()
+        self.tokens = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def complete(self, request):
+        """Return (completion text, usage) for a chat completion request"""
+        prompt = "".join(message.get("content") or "" for message in request.get("messages", []))
+        with self._lock:
+            text = next(self._completions)
+        max_tokens = request.get("max_tokens")
+        if max_tokens:
+            text = text[:max_tokens * 4]
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._lock:
+            self.calls["chat.completions"] += 1
+            self.tokens["prompt"] += usage["prompt_tokens"]
+            self.tokens["completion"] += usage["completion_tokens"]
+        if self.latency:
+            time.sleep(self.latency)
+        return text, usage
+
+    def _completion_body(self, request, text, usage):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    def _stream_chunks(self, request, text):
+        """Server-sent event payloads for a streamed completion"""
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini")
+        }
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        for piece in pieces:
+            yield dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, request, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in server._stream_chunks(request, text):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                text, usage = server.complete(request)
+                if request.get("stream"):
+                    self._send_stream(request, text)
+                else:
+                    self._send_json(200, server._completion_body(request, text, usage))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fixture", help="JSON list of completion texts or recorded responses")
+    args = parser.parse_args()
+
+    completions = load_completions(args.fixture) if args.fixture else None
+    server = FakeOpenAIServer(completions, args.host, args.port, args.latency_ms / 1000.0).start()
+    print(f"Fake OpenAI API listening on {server.url}")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps({"calls": dict(server.calls), "tokens": dict(server.tokens)}))
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
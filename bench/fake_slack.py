@@ -0,0 +1,230 @@
+"""In-process fake of the Slack Web API for load tests and benchmarks.
+
+    python -m bench.fake_slack --port 8091 --latency-ms 80 --rate-limit
+
+Point the bot at it with ``SLACK_API_URL=http://localhost:8091/api/``.
+Serves conversations.history/replies/list, users.info, chat.postMessage,
+chat.update and auth.test from an in-memory workspace, adds a configurable
+latency, and can enforce Slack's per-method tier limits with 429 +
+Retry-After so client throttling can be exercised.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from src.slack_client import METHOD_TIERS, PER_CHANNEL_LIMITS, TIER_LIMITS
+
+
+class FakeWorkspace:
+    """Channels, users and messages served by the fake API"""
+
+    def __init__(self, channels=None, users=None, messages=None):
+        self.channels = channels or [
+            {"id": "C0SOFTWARE", "name": "software"},
+            {"id": "C0MECHANICAL", "name": "mechanical"},
+            {"id": "C0ELECTRICAL", "name": "electrical"},
+            {"id": "C0TEAM", "name": "team"}
+        ]
+        self.users = users or {
+            "U0ALICE": {"id": "U0ALICE", "name": "alice", "real_name": "Alice Chen"},
+            "U0BOB": {"id": "U0BOB", "name": "bob", "real_name": "Bob Patel"}
+        }
+        # channel id -> list of messages, newest first like conversations.history
+        self.messages = defaultdict(list, messages or {})
+        self.ims = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_fixture(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        workspace = cls(data.get("channels"), data.get("users"), data.get("messages"))
+        workspace.ims = data.get("ims", [])
+        return workspace
+
+    def post(self, channel, text, user="U0PULSEBOT", thread_ts=None):
+        with self._lock:
+            ts = f"{time.time():.6f}"
+            message = {"type": "message", "user": user, "text": text, "ts": ts}
+            if thread_ts:
+                message["thread_ts"] = thread_ts
+            self.messages[channel].insert(0, message)
+            return message
+
+    def update(self, channel, ts, text):
+        with self._lock:
+            for message in self.messages[channel]:
+                if message["ts"] == ts:
+                    message["text"] = text
+                    return message
+        return None
+
+
+class FakeSlackServer:
+    """Threaded HTTP server implementing the subset of the Web API the bot uses"""
+
+    def __init__(self, workspace=None, host="127.0.0.1", port=0, latency=0.0, rate_limit=False):
+        self.workspace = workspace or FakeWorkspace()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._windows = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _check_rate(self, method, params):
+        """Sliding one-minute window per method (or per channel for chat.postMessage)"""
+        if method in PER_CHANNEL_LIMITS:
+            key, limit = (method, params.get("channel")), PER_CHANNEL_LIMITS[method]
+        else:
+            key, limit = (method,), TIER_LIMITS[METHOD_TIERS.get(method, 3)]
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows[key]
+            while window and now - window[0] > 60:
+                window.popleft()
+            if len(window) >= limit:
+                return max(1, int(60 - (now - window[0])) + 1)
+            window.append(now)
+        return None
+
+    def handle(self, method, params):
+        """Return (status, headers, body) for one API call"""
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit:
+            retry_after = self._check_rate(method, params)
+            if retry_after:
+                with self._lock:
+                    self.throttled[method] += 1
+                return 429, {"Retry-After": str(retry_after)}, {"ok": False, "error": "ratelimited"}
+
+        handler = getattr(self, "_api_" + method.replace(".", "_"), None)
+        if handler is None:
+            return 200, {}, {"ok": False, "error": "unknown_method"}
+        return 200, {}, handler(params)
+
+    def _api_auth_test(self, params):
+        return {"ok": True, "user_id": "U0PULSEBOT", "team_id": "T0FAKE"}
+
+    def _api_conversations_list(self, params):
+        if "im" in params.get("types", ""):
+            return {"ok": True, "channels": self.workspace.ims}
+        return {"ok": True, "channels": self.workspace.channels}
+
+    def _api_conversations_history(self, params):
+        oldest = float(params.get("oldest", 0) or 0)
+        limit = int(params.get("limit", 100))
+        messages = [
+            m for m in self.workspace.messages.get(params.get("channel"), [])
+            if float(m["ts"]) >= oldest and (not m.get("thread_ts") or m["thread_ts"] == m["ts"])
+        ]
+        return {"ok": True, "messages": messages[:limit], "has_more": len(messages) > limit}
+
+    def _api_conversations_replies(self, params):
+        root = params.get("ts")
+        oldest = float(params.get("oldest", 0) or 0)
+        thread = [
+            m for m in self.workspace.messages.get(params.get("channel"), [])
+            if m["ts"] == root or (m.get("thread_ts") == root and float(m["ts"]) >= oldest)
+        ]
+        thread.sort(key=lambda m: float(m["ts"]))
+        return {"ok": True, "messages": thread[:int(params.get("limit", 200))]}
+
+    def _api_users_info(self, params):
+        user = self.workspace.users.get(params.get("user"))
+        return {"ok": True, "user": user} if user else {"ok": False, "error": "user_not_found"}
+
+    def _api_chat_postMessage(self, params):
+        message = self.workspace.post(params.get("channel"), params.get("text", ""), thread_ts=params.get("thread_ts"))
+        return {"ok": True, "channel": params.get("channel"), "ts": message["ts"], "message": message}
+
+    def _api_chat_update(self, params):
+        message = self.workspace.update(params.get("channel"), params.get("ts"), params.get("text", ""))
+        if message is None:
+            return {"ok": False, "error": "message_not_found"}
+        return {"ok": True, "channel": params.get("channel"), "ts": message["ts"], "text": message["text"]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _params(self):
+                parsed = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode()
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update({k: v[-1] for k, v in parse_qs(body).items()})
+                return parsed.path.rsplit("/", 1)[-1], params
+
+            def _respond(self):
+                method, params = self._params()
+                status, headers, body = server.handle(method, params)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", action="store_true", help="Enforce Slack tier limits with 429s")
+    parser.add_argument("--fixture", help="JSON file with channels, users, messages and ims")
+    args = parser.parse_args()
+
+    workspace = FakeWorkspace.from_fixture(args.fixture) if args.fixture else FakeWorkspace()
+    server = FakeSlackServer(workspace, args.host, args.port, args.latency_ms / 1000.0, args.rate_limit).start()
+    print(f"Fake Slack API listening on {server.url}")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps({"calls": dict(server.calls), "throttled": dict(server.throttled)}))
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
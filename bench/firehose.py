@@ -0,0 +1,392 @@
+"""Drive a sustained Slack event firehose to find the bot's ingestion ceiling.
+
+    # In-process through the Bolt app, with the fake Slack API and the Firestore emulator
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.firehose --rates 50 100 200 400
+
+    # Against a running instance over signed HTTP
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.firehose \
+        --url http://localhost:3000/slack/events --metrics-url http://localhost:3000/metrics \
+        --pid $(pgrep -f "python app.py") --rates 50 100 200 400
+
+Events are channel messages, thread replies, file shares (``TRACKED_FILE_TYPES``
+and some untracked types), messages mentioning colleagues, DMs and app
+mentions, mixed by ``--mix``. Users and channels are picked with a Zipf-like
+skew so a few of each are hot. Each rate in ``--rates`` runs open-loop for
+``--step-seconds``.
+
+Every step reports:
+
+- send and storage throughput. Storage is counted by the bot's
+  ``pulse_firestore_documents_total`` for messages.
+- lag from sending an event to its Firestore document's ``created_at``, for
+  one in ``--sample-every`` message events.
+- the listener queue depth (in-process only) and resident memory over time.
+
+A rate counts as sustained when storage keeps up with sending and sampled
+lag stays under ``--max-lag-seconds``. The highest sustained rate is printed
+at the end.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from bench.common import latency_report, sign_request
+
+DEFAULT_MIX = "message=60,reply=20,file=8,mention=6,dm=5,app_mention=1"
+UNTRACKED_FILE_TYPES = ["png", "jpg", "txt", "zip"]
+BOT_USER = "U0PULSEBOT"
+TEAM_ID = "T0FAKE"
+STORED_METRIC = re.compile(r'^pulse_firestore_documents_total\{op="write",collection="messages"\} (\S+)$', re.M)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight)
+    unknown = set(mix) - set(EventGenerator.KINDS)
+    if unknown:
+        raise ValueError(f"unknown event kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _zipf_weights(count, skew):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def rss_bytes(pid):
+    """Resident set size of a process from /proc, or None where that is unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class EventGenerator:
+    """Realistic event_callback payloads following a configurable mix"""
+
+    KINDS = ("message", "reply", "file", "mention", "dm", "app_mention")
+
+    def __init__(self, mix, users=500, channels=40, user_skew=1.0, channel_skew=1.2, seed=0):
+        # Imported here so an in-process target can set SLACK_API_URL before config is first loaded
+        from config import TRACKED_FILE_TYPES
+        self.rng = random.Random(seed)
+        self.kinds, self.kind_weights = zip(*mix.items())
+        self.users = [f"U{i:07d}" for i in range(users)]
+        self.channels = [f"C{i:07d}" for i in range(channels)]
+        self.user_weights = list(itertools.accumulate(_zipf_weights(users, user_skew)))
+        self.channel_weights = list(itertools.accumulate(_zipf_weights(channels, channel_skew)))
+        self.file_types = list(TRACKED_FILE_TYPES) + UNTRACKED_FILE_TYPES
+        self.roots = {}  # channel -> recent thread roots
+        self._lock = threading.Lock()
+
+    def _user(self):
+        return self.rng.choices(self.users, cum_weights=self.user_weights)[0]
+
+    def _channel(self):
+        return self.rng.choices(self.channels, cum_weights=self.channel_weights)[0]
+
+    def _event(self, kind, ts):
+        user, channel = self._user(), self._channel()
+        event = {"type": "message", "channel": channel, "channel_type": "channel", "user": user,
+                 "text": f"Status on the harness review, build {self.rng.randint(1, 9999)}", "ts": ts}
+        if kind == "reply":
+            roots = self.roots.get(channel)
+            if roots:
+                event["thread_ts"] = self.rng.choice(roots)
+        elif kind == "file":
+            file_type = self.rng.choice(self.file_types)
+            event["subtype"] = "file_share"
+            event["files"] = [{
+                "id": f"F{uuid.uuid4().hex[:10].upper()}",
+                "name": f"drawing-{self.rng.randint(1, 999)}.{file_type}",
+                "filetype": file_type,
+                "url_private": "https://files.slack.com/files-pri/T0FAKE/drawing"
+            }]
+        elif kind == "mention":
+            event["text"] = f"<@{self._user()}> can you review the {self.rng.choice(['PCB', 'BOM', 'firmware'])} change?"
+        elif kind == "dm":
+            event["channel"] = "D" + user[1:]
+            event["channel_type"] = "im"
+            event["text"] = "Do you have a minute to look at the thermal test results?"
+        elif kind == "app_mention":
+            event = {"type": "app_mention", "channel": channel, "user": user,
+                     "text": f"<@{BOT_USER}> status?", "ts": ts}
+        if event["type"] == "message" and "thread_ts" not in event and event.get("channel_type") == "channel":
+            roots = self.roots.setdefault(channel, deque(maxlen=20))
+            roots.append(ts)
+        return event
+
+    def next(self):
+        """Return (payload, event); each call gets a unique event id and ts"""
+        with self._lock:
+            kind = self.rng.choices(self.kinds, weights=self.kind_weights)[0]
+            now = time.time()
+            ts = f"{now:.6f}"
+            event = self._event(kind, ts)
+        payload = {
+            "token": "firehose",
+            "team_id": TEAM_ID,
+            "api_app_id": "A0FIREHOSE",
+            "type": "event_callback",
+            "event_id": f"Ev{uuid.uuid4().hex[:10].upper()}",
+            "event_time": int(now),
+            "event": event
+        }
+        return payload, event
+
+
+class InProcessTarget:
+    """Dispatches signed requests straight into the Bolt app (fake Slack API, Firestore emulator)"""
+
+    def __init__(self, project):
+        from bench.run_benchmarks import _free_port, configure_environment, initialize_firebase
+        slack_port = _free_port()
+        configure_environment(slack_port, _free_port(), project, slack_rate_share=1000)
+        initialize_firebase(project)
+        from bench.fake_slack import FakeSlackServer
+        from slack_bolt.request import BoltRequest
+        self.slack_server = FakeSlackServer(port=slack_port).start()
+        import app
+        from src import metrics
+        self.app = app
+        self.BoltRequest = BoltRequest
+        self.stored_counter = metrics.FIRESTORE_DOCUMENTS_TOTAL.labels("write", "messages")
+        self.secret = os.environ["SLACK_SIGNING_SECRET"]
+        self.pid = os.getpid()
+
+    def send(self, body):
+        response = self.app.slack_app.dispatch(self.BoltRequest(body=body, headers=sign_request(self.secret, body)))
+        return response.status
+
+    def stored(self):
+        return self.stored_counter.value
+
+    def backlog(self):
+        return self.app.listener_executor.backlog
+
+    def close(self):
+        self.slack_server.stop()
+
+
+class HttpTarget:
+    """Posts signed requests to a running instance and reads its /metrics"""
+
+    def __init__(self, url, secret, metrics_url=None, pid=None):
+        self.url = url
+        self.secret = secret
+        self.metrics_url = metrics_url
+        self.pid = pid
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, body):
+        try:
+            return self._session().post(self.url, data=body, headers=sign_request(self.secret, body), timeout=30).status_code
+        except requests.RequestException as e:
+            return type(e).__name__
+
+    def stored(self):
+        if not self.metrics_url:
+            return None
+        match = STORED_METRIC.search(requests.get(self.metrics_url, timeout=10).text)
+        return float(match.group(1)) if match else 0.0
+
+    def backlog(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class LagTracker:
+    """Matches sampled events to their Firestore documents to measure ingest lag"""
+
+    def __init__(self, db):
+        self.db = db
+        self.pending = {}  # event ts -> time sent
+        self.lags = []
+        self._lock = threading.Lock()
+
+    def sent(self, ts, at):
+        with self._lock:
+            self.pending[ts] = at
+
+    def poll(self):
+        """Look up pending samples (30 per query, Firestore's ``in`` limit)"""
+        with self._lock:
+            pending = list(self.pending.items())
+        for start in range(0, len(pending), 30):
+            chunk = dict(pending[start:start + 30])
+            query = self.db.collection("messages").where("timestamp", "in", list(chunk))
+            for doc in query.stream():
+                data = doc.to_dict()
+                ts, created = data.get("timestamp"), data.get("created_at")
+                if ts in chunk and created is not None:
+                    with self._lock:
+                        if self.pending.pop(ts, None) is not None:
+                            self.lags.append(max(0.0, created.timestamp() - chunk[ts]))
+
+    def take(self):
+        """Lags observed since the last call, and how many samples are still unstored"""
+        with self._lock:
+            lags, self.lags = self.lags, []
+            return lags, len(self.pending)
+
+
+def run_step(target, generator, rate, seconds, concurrency, sample_every, tracker, grace):
+    """Send ``rate`` events per second for ``seconds``; returns the step report"""
+    statuses = Counter()
+    statuses_lock = threading.Lock()
+    samples = []
+    stored_before = target.stored()
+    sent = 0
+    counter = itertools.count()
+    stop = threading.Event()
+
+    def send(payload, event):
+        body = json.dumps(payload)
+        at = time.time()
+        status = target.send(body)
+        with statuses_lock:
+            statuses[status] += 1
+        if tracker and event["type"] == "message" and next(counter) % sample_every == 0:
+            tracker.sent(event["ts"], at)
+
+    def monitor():
+        while not stop.wait(1.0):
+            samples.append((time.time(), rss_bytes(target.pid) if target.pid else None, target.backlog()))
+            if tracker:
+                tracker.poll()
+
+    watcher = threading.Thread(target=monitor, daemon=True)
+    watcher.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            due = started + sent / rate
+            now = time.perf_counter()
+            if now - started >= seconds:
+                break
+            if due > now:
+                time.sleep(due - now)
+            pool.submit(send, *generator.next())
+            sent += 1
+    send_seconds = time.perf_counter() - started
+
+    # Give in-flight events time to land before counting what was stored
+    deadline = time.time() + grace
+    while tracker and time.time() < deadline and tracker.pending:
+        time.sleep(0.5)
+    stop.set()
+    watcher.join()
+    if tracker:
+        tracker.poll()
+
+    stored_after = target.stored()
+    lags, unstored = tracker.take() if tracker else ([], None)
+    rss = [value for _, value, _ in samples if value is not None]
+    backlogs = [value for _, _, value in samples if value is not None]
+    stored_rate = None
+    if stored_before is not None and stored_after is not None:
+        stored_rate = round((stored_after - stored_before) / send_seconds, 1)
+    minutes = (samples[-1][0] - samples[0][0]) / 60 if len(samples) > 1 else 0
+    return {
+        "target_rate": rate,
+        "sent": sent,
+        "send_rate": round(sent / send_seconds, 1),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "stored_rate": stored_rate,
+        "lag": latency_report(lags),
+        "unstored_samples": unstored,
+        "backlog_max": max(backlogs) if backlogs else None,
+        "rss_mb_start": round(rss[0] / 2 ** 20, 1) if rss else None,
+        "rss_mb_end": round(rss[-1] / 2 ** 20, 1) if rss else None,
+        "rss_mb_per_min": round((rss[-1] - rss[0]) / 2 ** 20 / minutes, 2) if len(rss) > 1 and minutes else None
+    }
+
+
+def sustained(report, max_lag_seconds, message_share):
+    """Whether a step's storage kept up with what it sent"""
+    expected = report["send_rate"] * message_share
+    if report["stored_rate"] is not None and report["stored_rate"] < 0.95 * expected:
+        return False
+    if report["unstored_samples"]:
+        return False
+    p90 = report["lag"].get("p90_ms")
+    return p90 is None or p90 <= max_lag_seconds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Send signed HTTP requests here instead of dispatching in-process")
+    parser.add_argument("--secret", default=os.environ.get("SLACK_SIGNING_SECRET"))
+    parser.add_argument("--metrics-url", help="The target's /metrics, for storage throughput over HTTP")
+    parser.add_argument("--pid", type=int, help="Process to watch for memory growth over HTTP")
+    parser.add_argument("--rates", type=float, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--step-seconds", type=float, default=30)
+    parser.add_argument("--grace-seconds", type=float, default=10, help="Wait for sampled events to be stored")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Relative weights of " + ", ".join(EventGenerator.KINDS))
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=40)
+    parser.add_argument("--user-skew", type=float, default=1.0)
+    parser.add_argument("--channel-skew", type=float, default=1.2)
+    parser.add_argument("--sample-every", type=int, default=20, help="Track lag for one in N message events")
+    parser.add_argument("--max-lag-seconds", type=float, default=5)
+    parser.add_argument("--project", default=os.environ.get("GOOGLE_CLOUD_PROJECT", "pulse-bench"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.url:
+        if not args.secret:
+            parser.error("--secret or SLACK_SIGNING_SECRET is required with --url")
+        target = HttpTarget(args.url, args.secret, args.metrics_url, args.pid)
+    else:
+        if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            parser.error("in-process runs need FIRESTORE_EMULATOR_HOST pointing at a Firestore emulator")
+        target = InProcessTarget(args.project)
+
+    tracker = None
+    if os.environ.get("FIRESTORE_EMULATOR_HOST") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
+        from google.cloud import firestore
+        tracker = LagTracker(firestore.Client(project=args.project))
+
+    generator = EventGenerator(mix, args.users, args.channels, args.user_skew, args.channel_skew, args.seed)
+    message_share = 1 - mix.get("app_mention", 0) / sum(mix.values())
+    best = None
+    try:
+        for rate in args.rates:
+            report = run_step(target, generator, rate, args.step_seconds, args.concurrency,
+                              args.sample_every, tracker, args.grace_seconds)
+            report["sustained"] = sustained(report, args.max_lag_seconds, message_share)
+            print(json.dumps(report, indent=2))
+            if report["sustained"]:
+                best = rate
+            else:
+                break
+    finally:
+        target.close()
+    print(json.dumps({"max_sustained_rate": best}))
+
+
+if __name__ == "__main__":
+    main()
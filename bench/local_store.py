@@ -0,0 +1,102 @@
+"""Compare windowed message queries served by Firestore and by the local SQLite store.
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.local_store --users 1000 [--json]
+
+Seeds the emulator with a synthetic workspace (``bench.seed_firestore``),
+then runs the same ``MessageService`` queries twice: first before the
+local store is reconciled, so they go to Firestore, then after, so they
+are answered from SQLite. The queries are channel, user and received-DM
+windows of ``--hours`` hours. Reports latency percentiles per query and
+tier, the time reconciliation took, and any query whose two answers
+differ in size.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from google.cloud import firestore
+from bench.common import latency_report
+from bench.seed_firestore import synthetic_workspace, clear_emulator, seed
+from src.local_store import local_store
+from src.message_service import MessageService
+
+
+def queries(workspace, count, seed_value=0):
+    """``count`` (name, method name, key) queries over the workspace's channels and users"""
+    rng = random.Random(seed_value)
+    channels = [channel["id"] for channel in workspace["channels"]]
+    users = list(workspace["profiles"])
+    kinds = [("channel", "get_channel_messages", channels), ("user", "get_user_messages", users),
+             ("received_dms", "get_received_dms", users)]
+    return [(name, method, rng.choice(keys)) for name, method, keys in (rng.choice(kinds) for _ in range(count))]
+
+
+def run(service, plan, hours):
+    """Latency samples per query name, and the number of messages each query returned"""
+    samples = {}
+    sizes = []
+    for name, method, key in plan:
+        start = time.perf_counter()
+        messages = getattr(service, method)(key, hours=hours)
+        samples.setdefault(name, []).append(time.perf_counter() - start)
+        sizes.append(len(messages))
+    return samples, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages-per-user", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--hours", type=int, default=24, help="Query window")
+    parser.add_argument("--path", help="SQLite file (default: a temporary file)")
+    parser.add_argument("--project", default=os.environ.get("GOOGLE_CLOUD_PROJECT", "pulse-bench"))
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        parser.error("FIRESTORE_EMULATOR_HOST must point at a running Firestore emulator")
+
+    db = firestore.Client(project=args.project)
+    workspace = synthetic_workspace(args.users, args.messages_per_user)
+    clear_emulator(args.project)
+    seed(db, workspace)
+    plan = queries(workspace, args.queries)
+    service = MessageService(db)
+
+    local_store.path = args.path or os.path.join(tempfile.mkdtemp(), "local.db")
+    local_store.db = db
+    remote, remote_sizes = run(service, plan, args.hours)
+    start = time.perf_counter()
+    reconciled = local_store.sync()
+    reconcile_seconds = time.perf_counter() - start
+    local, local_sizes = run(service, plan, args.hours)
+
+    report = {
+        "messages": len(workspace["stored_messages"]),
+        "reconcile": {"messages": reconciled, "seconds": round(reconcile_seconds, 3)},
+        "firestore": {name: latency_report(samples) for name, samples in remote.items()},
+        "sqlite": {name: latency_report(samples) for name, samples in local.items()},
+        "mismatches": [
+            {"query": plan[i][0], "key": plan[i][2], "firestore": remote_sizes[i], "sqlite": local_sizes[i]}
+            for i in range(len(plan)) if remote_sizes[i] != local_sizes[i]
+        ]
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['messages']} messages; reconciled {reconciled} in {reconcile_seconds:.2f}s")
+    print(f"{'query':<14}{'tier':<11}{'p50 ms':>10}{'p99 ms':>10}")
+    for name in sorted(remote):
+        for tier in ("firestore", "sqlite"):
+            stats = report[tier][name]
+            print(f"{name:<14}{tier:<11}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+    if report["mismatches"]:
+        print(f"{len(report['mismatches'])} queries returned different results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure how much prompt preprocessing shrinks channel summary prompts.
+
+    python -m bench.prompt_compression [--fixtures bench/fixtures/prompt_windows.json] [--json]
+
+Builds the channel summary prompt for each fixture window, first from the
+raw message text and then after each preprocessing step
+(``src/preprocess.py``). It reports the estimated prompt tokens and the
+compression ratio against raw. Tokens are estimated at four characters
+per token (``token_budget.estimate_tokens``), the same estimate the token
+ledger uses. Runs offline; no Slack or OpenAI access is needed.
+"""
+import argparse
+import json
+import os
+from src import preprocess, pulse_content
+from src.token_budget import request_prompt_tokens
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "prompt_windows.json")
+
+
+def stages(lookup):
+    """(name, function from a list of texts to a list of texts), cumulative"""
+    def normalized(texts):
+        return [preprocess.normalize(text, lookup) for text in texts]
+
+    def truncated(texts):
+        return [preprocess.truncate(text) for text in normalized(texts)]
+
+    def condensed(texts):
+        return preprocess.condense(truncated(texts))
+
+    return [("raw", list), ("normalize", normalized), ("+truncate", truncated), ("+condense", condensed)]
+
+
+def window_report(window, lookup):
+    raw = [pulse_content.format_channel_message(msg, lookup(msg["user"]) or "Unknown") for msg in window["messages"]]
+    report = {}
+    for name, stage in stages(lookup):
+        texts = stage([msg["text"] for msg in raw])
+        messages = [dict(msg, text=text) for msg, text in zip(raw, texts) if text]
+        tokens = request_prompt_tokens(pulse_content.channel_summary_request(window["channel"], messages))
+        report[name] = {"tokens": tokens, "messages": len(messages)}
+    for name in report:
+        report[name]["ratio"] = round(report["raw"]["tokens"] / max(report[name]["tokens"], 1), 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+    lookup = fixtures["users"].get
+    reports = {window["name"]: window_report(window, lookup) for window in fixtures["windows"]}
+    names = [name for name, _ in stages(lookup)]
+    reports["total"] = {
+        name: {"tokens": sum(report[name]["tokens"] for report in reports.values()),
+               "messages": sum(report[name]["messages"] for report in reports.values())}
+        for name in names
+    }
+    for name in names:
+        reports["total"][name]["ratio"] = round(
+            reports["total"]["raw"]["tokens"] / max(reports["total"][name]["tokens"], 1), 2
+        )
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print(f"{'window':<16}" + "".join(f"{name:>18}" for name in names))
+    for window, report in reports.items():
+        cells = "".join(f"{report[name]['tokens']:>9} ({report[name]['ratio']:>4.2f}x)" for name in names)
+        print(f"{window:<16}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Replay signed Slack event payloads against a running Pulse instance.
+
+    python -m bench.replay_events --url http://localhost:3000/slack/events \
+        --requests 2000 --concurrency 32 [--payloads events.jsonl]
+
+Without ``--payloads`` a mix of synthetic channel messages, thread replies and
+app mentions is generated. Each replay gets a fresh event id and timestamp.
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from bench.common import latency_report, load_payloads, sign_request
+
+
+def synthetic_payloads(channels=("C0SOFTWARE", "C0TEAM"), users=("U0ALICE", "U0BOB", "U0CAROL")):
+    """A small mix of realistic event_callback payloads"""
+    base_ts = time.time()
+    payloads = []
+    for i in range(30):
+        channel = random.choice(channels)
+        event = {
+            "type": "message",
+            "channel": channel,
+            "channel_type": "channel",
+            "user": random.choice(users),
+            "text": f"Load test message {i} about the battery pack review",
+            "ts": f"{base_ts + i:.6f}"
+        }
+        if i % 3 == 1:
+            event["thread_ts"] = f"{base_ts + i - 1:.6f}"
+        if i % 10 == 9:
+            event = {
+                "type": "app_mention",
+                "channel": channel,
+                "user": random.choice(users),
+                "text": "<@U0PULSEBOT> status?",
+                "ts": f"{base_ts + i:.6f}"
+            }
+        payloads.append({
+            "token": "load-test",
+            "team_id": "T0LOADTEST",
+            "api_app_id": "A0LOADTEST",
+            "type": "event_callback",
+            "event": event
+        })
+    return payloads
+
+
+def refresh(payload):
+    """Give a replayed payload a fresh event id and timestamp"""
+    payload = copy.deepcopy(payload)
+    now = time.time()
+    payload["event_id"] = f"Ev{uuid.uuid4().hex[:10].upper()}"
+    payload["event_time"] = int(now)
+    if "event" in payload and "ts" in payload["event"]:
+        payload["event"]["ts"] = f"{now:.6f}"
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:3000/slack/events")
+    parser.add_argument("--secret", default=os.environ.get("SLACK_SIGNING_SECRET"))
+    parser.add_argument("--payloads", help="JSON list or JSON-lines file of event payloads")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("--secret or SLACK_SIGNING_SECRET is required")
+
+    payloads = load_payloads(args.payloads) if args.payloads else synthetic_payloads()
+    source = itertools.cycle(payloads)
+    source_lock = threading.Lock()
+    local = threading.local()
+    latencies = []
+    statuses = Counter()
+
+    def send(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        with source_lock:
+            payload = next(source)
+        body = json.dumps(refresh(payload))
+        start = time.perf_counter()
+        try:
+            response = session.post(args.url, data=body, headers=sign_request(args.secret, body), timeout=30)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, range(args.requests)))
+    duration = time.perf_counter() - started
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "duration_s": round(duration, 2),
+        "throughput_rps": round(args.requests / duration, 1) if duration else None,
+        "statuses": dict(statuses),
+        "latency": latency_report(latencies)
+    }
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
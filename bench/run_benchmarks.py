@@ -0,0 +1,287 @@
+"""Scenario benchmarks against fake Slack and OpenAI APIs and the Firestore emulator.
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.run_benchmarks \
+        --sizes 100 1000 10000 --iterations 20 --output bench-results.json
+
+    # Later, fail (exit 1) if anything got more than 20% worse
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.run_benchmarks \
+        --baseline bench-results.json --threshold 0.2
+
+The fake Slack and OpenAI servers run in-process and the bot is imported
+pointing at them, so nothing leaves the machine. For each workspace size
+the emulator is cleared and seeded with a synthetic workspace (see
+``bench.seed_firestore``) and these scenarios run:
+
+    pulse_update_cold   /pulse update for users with no cached digest
+    pulse_update_warm   /pulse update again for the same users
+    summary_service     SummaryService.generate_summary
+    message_burst       bursts of concurrent handle_message_events calls
+    get_all_users       UserService.get_all_users
+
+Each reports latency percentiles, calls to each dependency as the bot's
+metrics counted them, requests the fake servers received, and OpenAI
+tokens. The bot's client-side Slack rate limiting is relaxed by default
+(``--slack-rate-share``) so tier-limit waits do not swamp the numbers.
+A scenario whose code cannot be imported or fails every call is
+reported with its errors instead of aborting the run.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from bench.common import latency_report
+from bench.fake_openai import FakeOpenAIServer, load_completions
+from bench.replay_events import refresh, synthetic_payloads
+
+# Compared against the baseline in --baseline mode; counts are per call
+REGRESSION_FIELDS = ("p50_ms", "p90_ms")
+REGRESSION_COUNTS = ("external_calls_per_call", "tokens_per_call")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(slack_port, openai_port, project, slack_rate_share):
+    """Point the bot at the fakes; must run before config or app is imported"""
+    os.environ["SLACK_API_URL"] = f"http://127.0.0.1:{slack_port}/api/"
+    os.environ["SLACK_RATE_LIMIT_SHARE"] = str(slack_rate_share)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_port}/v1"
+    os.environ["GOOGLE_CLOUD_PROJECT"] = project
+    for name, value in (("SLACK_BOT_TOKEN", "xoxb-bench"), ("SLACK_SIGNING_SECRET", "bench-secret"),
+                        ("OPENAI_API_KEY", "sk-bench"), ("LOG_LEVEL", "WARNING")):
+        os.environ.setdefault(name, value)
+
+
+def initialize_firebase(project):
+    """Initialize firebase_admin for the emulator, which needs no real credentials"""
+    import firebase_admin
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(EmulatorCredential(), {"projectId": project})
+
+
+def metric_totals():
+    """Current external call counts by dependency and OpenAI tokens by kind"""
+    from src import metrics
+    calls = Counter()
+    for (dependency, _, _), child in metrics.EXTERNAL_CALLS_TOTAL.children():
+        calls[dependency] += child.value
+    tokens = Counter()
+    for (_, kind), child in metrics.OPENAI_TOKENS_TOTAL.children():
+        tokens[kind] += child.value
+    return calls, tokens
+
+
+def _delta(after, before):
+    return {key: int(after[key] - before.get(key, 0)) for key in after if after[key] - before.get(key, 0)}
+
+
+class Runner:
+    """Times scenario calls and attributes external calls and tokens to them"""
+
+    def __init__(self, slack_server, openai_server):
+        self.slack_server = slack_server
+        self.openai_server = openai_server
+
+    def measure(self, calls, concurrency=1):
+        """Run each zero-argument callable in ``calls``; returns the scenario report"""
+        calls_before, tokens_before = metric_totals()
+        slack_before = Counter(self.slack_server.calls)
+        openai_before = Counter(self.openai_server.calls)
+        latencies = []
+        errors = Counter()
+
+        def timed_call(call):
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                errors[f"{type(e).__name__}: {e}"[:200]] += 1
+            latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(timed_call, calls))
+        else:
+            for call in calls:
+                timed_call(call)
+        elapsed = time.perf_counter() - started
+
+        calls_after, tokens_after = metric_totals()
+        external = _delta(calls_after, calls_before)
+        tokens = _delta(tokens_after, tokens_before)
+        count = max(len(calls), 1)
+        return {
+            "latency": latency_report(latencies),
+            "throughput_per_s": round(len(calls) / elapsed, 2) if elapsed else None,
+            "errors": dict(errors),
+            "external_calls": external,
+            "external_calls_per_call": round(sum(external.values()) / count, 2),
+            "slack_requests": _delta(self.slack_server.calls, slack_before),
+            "openai_requests": _delta(self.openai_server.calls, openai_before),
+            "tokens": tokens,
+            "tokens_per_call": round(sum(tokens.values()) / count, 2)
+        }
+
+
+def unavailable(error):
+    return {"latency": {"count": 0}, "errors": {f"{type(error).__name__}: {error}": 1}, "skipped": True}
+
+
+def run_size(runner, db, size, args):
+    """Seed a workspace of ``size`` users and run every scenario against it"""
+    from bench.fake_slack import FakeWorkspace
+    from bench.seed_firestore import clear_emulator, seed, slack_fixture, synthetic_workspace
+    import app
+
+    workspace = synthetic_workspace(size, args.messages_per_user, seed=args.seed)
+    clear_emulator(args.project)
+    start = time.perf_counter()
+    documents = seed(db, workspace)
+    seed_seconds = time.perf_counter() - start
+    fixture = slack_fixture(workspace)
+    runner.slack_server.workspace = FakeWorkspace(fixture["channels"], fixture["users"], fixture["messages"])
+    runner.slack_server.workspace.ims = fixture["ims"]
+
+    rng = random.Random(args.seed)
+    users = rng.sample(list(workspace["profiles"]), min(args.iterations, size))
+    results = {"seed": {"documents": documents, "seconds": round(seed_seconds, 2)}}
+
+    def pulse_update(user_id):
+        body = {"user_id": user_id, "text": "update"}
+        return lambda: app.pulse_command(ack=lambda *a, **k: None, body=body, respond=lambda *a, **k: None)
+
+    results["pulse_update_cold"] = runner.measure([pulse_update(user) for user in users])
+    results["pulse_update_warm"] = runner.measure([pulse_update(user) for user in users])
+
+    try:
+        from src.message_service import MessageService
+        from src.user_service import UserService
+        from src.summary_service import SummaryService
+        user_service = UserService()
+        summary_service = SummaryService(MessageService(), user_service)
+    except Exception as e:
+        results["summary_service"] = unavailable(e)
+        results["get_all_users"] = unavailable(e)
+    else:
+        results["summary_service"] = runner.measure(
+            [lambda user=user: summary_service.generate_summary(user) for user in users]
+        )
+        results["get_all_users"] = runner.measure([user_service.get_all_users for _ in range(args.list_iterations)])
+
+    payloads = synthetic_payloads(
+        channels=[channel["id"] for channel in workspace["channels"][:8]], users=users[:20] or ("U0BENCH",)
+    )
+    payloads = [payload for payload in payloads if payload["event"]["type"] == "message"]
+    logger = app.log
+
+    def burst():
+        events = [refresh(rng.choice(payloads)) for _ in range(args.burst_size)]
+        with ThreadPoolExecutor(max_workers=args.burst_concurrency) as pool:
+            list(pool.map(lambda body: app.handle_message_events(body, logger), events))
+
+    results["message_burst"] = runner.measure([burst for _ in range(args.bursts)])
+    results["message_burst"]["events_per_burst"] = args.burst_size
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """List of human-readable regressions of ``results`` against ``baseline``"""
+    found = []
+    for size, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous or name == "seed" or current.get("skipped") or previous.get("skipped"):
+                continue
+            pairs = [(field, current["latency"].get(field), previous["latency"].get(field)) for field in REGRESSION_FIELDS]
+            pairs += [(field, current.get(field), previous.get(field)) for field in REGRESSION_COUNTS]
+            for field, now, before in pairs:
+                if now is None or not before:
+                    continue
+                if now > before * (1 + threshold):
+                    found.append(f"{size} users / {name}: {field} {before} -> {now} (+{(now / before - 1) * 100:.0f}%)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=20, help="Users sampled for per-user scenarios")
+    parser.add_argument("--list-iterations", type=int, default=5, help="Calls of get_all_users")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=200)
+    parser.add_argument("--burst-concurrency", type=int, default=16)
+    parser.add_argument("--messages-per-user", type=int, default=3)
+    parser.add_argument("--slack-latency-ms", type=float, default=50)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument(
+        "--slack-rate-share", type=float, default=1000,
+        help="SLACK_RATE_LIMIT_SHARE for the bot; 1 includes waits for Slack's real tier limits"
+    )
+    parser.add_argument("--openai-fixture", help="JSON list of completion texts or recorded responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--project", default="pulse-bench")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown in --baseline mode")
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        parser.error("FIRESTORE_EMULATOR_HOST must point at a running Firestore emulator")
+
+    slack_port, openai_port = _free_port(), _free_port()
+    configure_environment(slack_port, openai_port, args.project, args.slack_rate_share)
+    initialize_firebase(args.project)
+
+    # Imported only now: config reads SLACK_API_URL when it is first imported
+    from google.cloud import firestore
+    from bench.fake_slack import FakeSlackServer
+
+    completions = load_completions(args.openai_fixture) if args.openai_fixture else None
+    slack_server = FakeSlackServer(port=slack_port, latency=args.slack_latency_ms / 1000.0).start()
+    openai_server = FakeOpenAIServer(completions, port=openai_port, latency=args.openai_latency_ms / 1000.0).start()
+    runner = Runner(slack_server, openai_server)
+    db = firestore.Client(project=args.project)
+
+    results = {}
+    try:
+        for size in args.sizes:
+            results[str(size)] = run_size(runner, db, size, args)
+            print(json.dumps({"users": size, "results": results[str(size)]}, indent=2))
+    finally:
+        slack_server.stop()
+        openai_server.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
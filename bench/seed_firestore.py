@@ -0,0 +1,197 @@
+"""Seed the Firestore emulator with a synthetic workspace.
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.seed_firestore \
+        --users 1000 --slack-fixture workspace-1000.json
+
+Writes user profiles, interests and a day of stored messages for
+``--users`` users, and optionally the matching Slack workspace as a
+fixture for ``bench.fake_slack --fixture``. Channel chattiness follows a
+Zipf-like distribution: a few channels carry most of the traffic and a
+long tail is nearly silent. Message timestamps are relative to now, so
+regenerate fixtures rather than reusing old ones.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+import requests
+from google.cloud import firestore
+from config import COLLECTIONS
+from src.pulse_content import ROLE_CHANNEL_MAPPING
+
+ROLES = list(ROLE_CHANNEL_MAPPING)
+TOPICS = ["battery", "firmware", "harness", "CI", "supplier", "thermal", "PCB", "release", "review", "motor"]
+BATCH_SIZE = 500
+
+
+def _channel_weights(count, skew):
+    weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def synthetic_workspace(users, messages_per_user=3, reply_share=0.25, skew=1.1, ims=20, hours=24, seed=0):
+    """A workspace of ``users`` users as Slack fixture data plus Firestore documents.
+
+    Returns a dict with ``channels``, ``users``, ``messages`` and ``ims`` in
+    the shape ``FakeWorkspace.from_fixture`` reads, and ``profiles``,
+    ``interests`` and ``stored_messages`` for Firestore.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    projects = [f"project-{i}" for i in range(max(0, users // 25))]
+    names = sorted({name for channels in ROLE_CHANNEL_MAPPING.values() for name in channels}) + projects
+    channels = [{"id": f"C{i:07d}", "name": name} for i, name in enumerate(names)]
+    by_name = {channel["name"]: channel["id"] for channel in channels}
+
+    slack_users = {}
+    profiles = {}
+    interests = {}
+    for i in range(users):
+        user_id = f"U{i:07d}"
+        role = ROLES[i % len(ROLES)]
+        tracked = list(ROLE_CHANNEL_MAPPING[role])
+        tracked += rng.sample(projects, min(2, len(projects)))
+        last_active = now - rng.uniform(0, 3 * 86400)
+        slack_users[user_id] = {"id": user_id, "name": f"user{i}", "real_name": f"User {i}"}
+        profiles[user_id] = {
+            "id": user_id,
+            "user_id": user_id,
+            "name": f"user{i}",
+            "real_name": f"User {i}",
+            "role": role,
+            "tracked_channels": tracked,
+            "channels": [by_name[name] for name in tracked],
+            "onboarding_completed": True,
+            "message_count": rng.randint(0, 500),
+            "last_active": datetime.fromtimestamp(last_active, timezone.utc)
+        }
+        interests[user_id] = {"topics": rng.sample(TOPICS, 3)}
+
+    # Busy channels are picked at random so the chattiest is not always "electrical"
+    order = list(channels)
+    rng.shuffle(order)
+    weights = _channel_weights(len(order), skew)
+    user_ids = list(slack_users)
+    messages = {}
+    stored = []
+    total = users * messages_per_user
+    for channel, weight in zip(order, weights):
+        count = int(round(total * weight))
+        channel_messages = []
+        roots = []
+        for _ in range(count):
+            ts = now - rng.uniform(60, hours * 3600)
+            user_id = rng.choice(user_ids)
+            message = {
+                "type": "message",
+                "user": user_id,
+                "text": f"Update on the {rng.choice(TOPICS)} work: {rng.choice(TOPICS)} looks on track",
+                "ts": f"{ts:.6f}"
+            }
+            if roots and rng.random() < reply_share:
+                root = rng.choice(roots)
+                if float(root["ts"]) < ts:
+                    message["thread_ts"] = root["ts"]
+                    root["reply_count"] = root.get("reply_count", 0) + 1
+                    root["thread_ts"] = root["ts"]
+                    root["latest_reply"] = max(root.get("latest_reply", root["ts"]), message["ts"])
+            if "thread_ts" not in message:
+                roots.append(message)
+            channel_messages.append(message)
+            stored.append({
+                "channel_id": channel["id"],
+                "user_id": user_id,
+                "recipient_id": None,
+                "text": message["text"],
+                "timestamp": message["ts"],
+                "thread_ts": message.get("thread_ts"),
+                "type": "thread_reply" if message.get("thread_ts") else "message",
+                "files": [],
+                "is_pinned": False,
+                "created_at": datetime.fromtimestamp(ts, timezone.utc),
+                "channel_type": "channel",
+                "tags": []
+            })
+        channel_messages.sort(key=lambda m: float(m["ts"]), reverse=True)
+        messages[channel["id"]] = channel_messages
+
+    im_list = []
+    for i, partner in enumerate(rng.sample(user_ids, min(ims, len(user_ids)))):
+        im_id = f"D{i:07d}"
+        im_list.append({"id": im_id, "user": partner, "is_im": True})
+        history = []
+        for _ in range(rng.randint(1, 6)):
+            ts = now - rng.uniform(60, hours * 3600)
+            sender = rng.choice([partner, "U0PULSEBOT"])
+            history.append({"type": "message", "user": sender, "text": f"Can you look at the {rng.choice(TOPICS)} doc?", "ts": f"{ts:.6f}"})
+        history.sort(key=lambda m: float(m["ts"]), reverse=True)
+        messages[im_id] = history
+
+    return {
+        "channels": channels,
+        "users": slack_users,
+        "messages": messages,
+        "ims": im_list,
+        "profiles": profiles,
+        "interests": interests,
+        "stored_messages": stored
+    }
+
+
+def slack_fixture(workspace):
+    """The Slack half of a synthetic workspace, for ``bench.fake_slack --fixture``"""
+    return {key: workspace[key] for key in ("channels", "users", "messages", "ims")}
+
+
+def clear_emulator(project, host=None):
+    """Delete every document in the emulator's database for ``project``"""
+    host = host or os.environ["FIRESTORE_EMULATOR_HOST"]
+    url = f"http://{host}/emulator/v1/projects/{project}/databases/(default)/documents"
+    requests.delete(url, timeout=60).raise_for_status()
+
+
+def seed(db, workspace, batch_size=BATCH_SIZE):
+    """Write a synthetic workspace's profiles, interests and messages; returns documents written"""
+    writes = [(COLLECTIONS["USERS"], user_id, doc) for user_id, doc in workspace["profiles"].items()]
+    writes += [(COLLECTIONS["INTERESTS"], user_id, doc) for user_id, doc in workspace["interests"].items()]
+    writes += [(COLLECTIONS["MESSAGES"], None, doc) for doc in workspace["stored_messages"]]
+    for start in range(0, len(writes), batch_size):
+        batch = db.batch()
+        for collection, doc_id, doc in writes[start:start + batch_size]:
+            ref = db.collection(collection).document(doc_id) if doc_id else db.collection(collection).document()
+            batch.set(ref, doc)
+        batch.commit()
+    return len(writes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--messages-per-user", type=int, default=3)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for channel chattiness")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--project", default=os.environ.get("GOOGLE_CLOUD_PROJECT", "pulse-bench"))
+    parser.add_argument("--clear", action="store_true", help="Delete existing emulator documents first")
+    parser.add_argument("--slack-fixture", help="Also write the Slack workspace to this JSON file")
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        parser.error("FIRESTORE_EMULATOR_HOST must point at a running Firestore emulator")
+
+    workspace = synthetic_workspace(args.users, args.messages_per_user, skew=args.skew, seed=args.seed)
+    if args.clear:
+        clear_emulator(args.project)
+    start = time.perf_counter()
+    written = seed(firestore.Client(project=args.project), workspace)
+    print(json.dumps({"users": args.users, "documents": written, "seconds": round(time.perf_counter() - start, 2)}))
+    if args.slack_fixture:
+        with open(args.slack_fixture, "w") as f:
+            json.dump(slack_fixture(workspace), f)
+
+
+if __name__ == "__main__":
+    main()
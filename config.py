@@ -8,6 +8,13 @@ load_dotenv()
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
 SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET")
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+SLACK_HTTP_POOL_SIZE = 20  # Pooled keep-alive connections to the Web API
+SLACK_HTTP_TIMEOUT_SECONDS = 30
+SLACK_MAX_RETRIES = 3  # Retries after a 429, each waiting Retry-After
+SLACK_MAX_QUEUE_SECONDS = 60  # Longest a call may wait for a rate-limit token
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))  # Processes on this host sharing the Slack limits
+SLACK_RATE_LIMIT_SHARE = float(os.getenv("SLACK_RATE_LIMIT_SHARE", 1.0 / WEB_CONCURRENCY))  # Fraction of each tier limit this process may use
 
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -16,8 +23,43 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 # Application configuration
-DAILY_SUMMARY_TIME = "09:00"  # 9 AM
-SUMMARY_TIMEZONE = "UTC"  # Change this to your team's timezone
+DAILY_SUMMARY_TIME = "09:00"  # 9 AM in each user's own timezone
+SUMMARY_TIMEZONE = "UTC"  # For users whose Slack profile has no timezone
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", "/tmp/pulse-scheduler.lock")  # One job runner per host
+SCHEDULER_TICK_SECONDS = 1
+LEADER_LEASE_SECONDS = int(os.getenv("LEADER_LEASE_SECONDS", 30))  # Standby takes over within lease + renew
+LEADER_RENEW_SECONDS = int(os.getenv("LEADER_RENEW_SECONDS", 10))
+LEADER_CLOCK_SKEW_SECONDS = 2  # Safety margin subtracted from the local view of the lease
+STARTUP_IMPORT_BUDGET_SECONDS = 2.0  # Longest `import app` may take (checked by bench/import_time.py)
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = 10000  # Records buffered for the background writer before dropping
+LOG_SAMPLE_RATES = {  # Fraction of DEBUG/INFO records kept for high-volume events
+    "request.received": 0.01,
+    "message.received": 0.01,
+    "message.stored": 0.01,
+    "user.activity_updated": 0.01,
+    "span": 0.1
+}
+
+# Health probe configuration
+HEALTH_PROBE_INTERVAL_SECONDS = 15  # How often dependencies are probed in the background
+HEALTH_PROBE_TIMEOUT_SECONDS = 5
+HEALTH_LATENCY_WINDOW = 100  # Probe samples kept per dependency for p50/p99
+READINESS_MAX_ERROR_RATE = 0.25  # Fraction of failed external calls between probes
+READINESS_MIN_CALLS = 20  # Calls needed between probes before the error rate counts
+READINESS_MAX_BACKLOG = 200  # Queued events before the process reports unready
+# Dependencies the process can't serve without; other probes are reported but never make it unready
+READINESS_DEPENDENCIES = ("slack", "firestore")
+
+# Slack listener configuration
+SLACK_LISTENER_THREADS = 10  # Worker threads running event and command handlers
+
+# Async entry point (app_async.py) concurrency limits, shared by every in-flight request
+ASYNC_SLACK_CONCURRENCY = 20  # Slack Web API calls in flight
+ASYNC_OPENAI_CONCURRENCY = 10  # OpenAI completions in flight
+ASYNC_FIRESTORE_CONCURRENCY = 50  # Firestore operations in flight
 
 # Message types to track
 MESSAGE_TYPES = {
@@ -39,15 +81,182 @@ TRACKED_FILE_TYPES = [
     "pptx"
 ]
 
+# Thread grouping configuration
+MAX_THREAD_REPLIES = 3  # Latest replies kept per thread in prompts
+REPLY_FETCH_BATCH_SIZE = 8  # Concurrent conversations_replies calls
+REPLY_FETCH_LIMIT = 200
+
 # GPT-4 configuration
 GPT_MODEL = "gpt-4"
 MAX_TOKENS = 1000
 TEMPERATURE = 0.7
 
+# /pulse update summaries
+PULSE_SUMMARY_MODEL = "gpt-4o-mini"
+CHANNEL_SUMMARY_MAX_TOKENS = 300
+DM_SUMMARY_MAX_TOKENS = 200
+PULSE_SUMMARY_TEMPERATURE = 0.3
+
+# Progressive delivery of /pulse update
+PULSE_STREAM_SUMMARIES = os.getenv("PULSE_STREAM_SUMMARIES", "false").lower() == "true"  # Show tokens as they arrive
+PULSE_UPDATE_MIN_INTERVAL_SECONDS = 1.5  # Minimum gap between chat.update calls for partial text
+PULSE_UPDATE_WORKERS = 4  # Summaries generated concurrently per update in app.py
+SLACK_MAX_BLOCKS_PER_MESSAGE = 50
+SLACK_MAX_SECTION_CHARS = 3000
+
+# Pre-warmed /pulse update digests
+PREWARM_INTERVAL_SECONDS = 300  # How often the pre-warm job looks for users about to ask
+PREWARM_LEAD_MINUTES = 30  # Build a digest this long before a user's typical request time
+PREWARM_ACTIVE_DAYS = 7  # Only users active within this many days are pre-warmed
+PREWARM_HISTORY_SIZE = 14  # Recent /pulse update request times kept per user
+PREWARM_MIN_CONCENTRATION = 0.5  # How clustered request times must be (0-1) to predict one
+PREWARM_MAX_USERS_PER_RUN = 50
+DIGEST_MAX_AGE_HOURS = 12  # Older cached digests are rebuilt from scratch
+
+# Embedding-based relevance ranking
+# "hashing" is a local model with no API calls; "openai" embeds every stored message with a paid API call
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hashing")
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_HASH_DIMENSIONS = 512  # Vector size of the local hashing model
+EMBEDDING_BATCH_SIZE = 100  # Texts per embeddings request
+EMBEDDING_FLUSH_SECONDS = 2.0  # Longest a stored message waits for its batch to be embedded
+EMBEDDING_QUEUE_SIZE = 10000  # Messages waiting to be embedded before new ones are skipped
+RELEVANCE_TOP_K = 50  # Messages kept per user for a summary
+RELEVANCE_MIN_SCORE = 0.1  # Cosine similarity below which a message is never kept
+
+# Auto-tagging stored messages
+AUTO_TAG_BATCH_SIZE = 200  # Messages tagged and written per Firestore batch
+AUTO_TAG_FLUSH_SECONDS = 2.0  # Longest a stored message waits for its batch to be tagged
+AUTO_TAG_QUEUE_SIZE = 10000  # Messages waiting to be tagged before new ones are skipped
+AUTO_TAG_LLM = os.getenv("AUTO_TAG_LLM", "false").lower() == "true"  # Ask the LLM about messages no rule tagged
+AUTO_TAG_LLM_MODEL = PULSE_SUMMARY_MODEL
+AUTO_TAG_LLM_MIN_CHARS = 80  # Shorter untagged messages are left untagged rather than sent to the LLM
+AUTO_TAG_LLM_BATCH_SIZE = 25  # Messages per tagging request
+AUTO_TAG_KEYWORDS = {  # Tag: words and phrases that apply it (plurals match too)
+    "battery": ("battery", "batteries", "cell", "bms", "state of charge", "soc", "thermal runaway", "pack"),
+    "charging": ("charging", "charger", "ccs", "nacs", "dcfc", "obc", "supercharger", "charge port"),
+    "powertrain": ("motor", "inverter", "drive unit", "powertrain", "gearbox", "torque", "regen"),
+    "software": ("firmware", "software", "ota", "release", "deploy", "build", "bug", "ci", "pipeline"),
+    "hardware": ("pcb", "harness", "connector", "ecu", "sensor", "prototype"),
+    "cad": ("cad", "solidworks", "catia", "dwg", "drawing", "model revision"),
+    "manufacturing": ("production line", "assembly", "tooling", "yield", "supplier", "ppap", "scrap"),
+    "testing": ("test", "validation", "dyno", "test rig", "dvp", "homologation"),
+    "safety": ("safety", "iso 26262", "asil", "fmea", "hazard"),
+    "incident": ("incident", "outage", "sev1", "sev2", "rollback", "regression", "recall"),
+    "blocker": ("blocker", "blocked", "blocking"),
+    "decision": ("decision", "decided", "approved", "sign-off", "signoff"),
+}
+
+# Channel activity rollups and trends
+ROLLUP_FLUSH_SECONDS = 30  # How often in-memory hourly counters are added to rollup documents
+ROLLUP_TRENDS_INTERVAL_SECONDS = 3600  # How often trends are recomputed from the rollups
+ROLLUP_TREND_WINDOW_HOURS = 24  # Recent activity compared against the baseline
+ROLLUP_BASELINE_WINDOWS = 7  # The baseline is the average of this many preceding windows
+ROLLUP_SPIKE_RATIO = 2.0  # A channel is spiking at this multiple of its baseline...
+ROLLUP_SPIKE_MIN_MESSAGES = 20  # ...with at least this many messages in the window
+ROLLUP_MIN_BASELINE_HOURS = 72  # Rollup history needed before any channel is flagged as spiking
+ROLLUP_SWARM_MIN_USERS = 5  # Distinct people replying in one thread that make it an issue swarm
+ROLLUP_TOP_ITEMS = 5  # Threads, PRs, swarms and spikes kept per trends document
+
+# Per-user activity counters
+MESSAGE_COUNT_SHARDS = 10  # Shard documents per user's message counter; each sustains about one write/second
+COUNTER_CACHE_SECONDS = 60  # How long a summed counter total is reused
+LAST_ACTIVE_DEBOUNCE_SECONDS = 300  # A user's last_active is written at most this often per process
+
+# Circuit breakers and degraded mode
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a dependency's breaker
+BREAKER_OPEN_SECONDS = 30  # An open breaker fails calls fast this long, then lets one probe through
+BREAKER_LATENCY_WINDOW = 200  # Recent successful call latencies kept per dependency
+BREAKER_MIN_SAMPLES = 20  # With fewer latencies than this, the maximum timeout is used
+BREAKER_TIMEOUT_MULTIPLIER = 2.0  # Call timeout = observed p99 x this...
+BREAKER_TIMEOUTS = {  # ...within these (min, max) seconds
+    "slack": (2.0, SLACK_HTTP_TIMEOUT_SECONDS),
+    "openai": (5.0, 120.0),
+    "firestore": (1.0, 10.0)
+}
+OPENAI_MAX_RETRIES = 0  # SDK retries per summary call; each retry would get the full timeout again
+DEGRADED_SUMMARY_MESSAGES = 5  # Messages listed in place of a summary that can't be generated
+
+# Digest delivery at each user's local time
+DELIVERY_TICK_SECONDS = 60  # How often due deliveries are sent; the timing wheel has one-minute buckets
+DELIVERY_SPREAD_MINUTES = 60  # Users get their digest up to this long after DAILY_SUMMARY_TIME, by a stable offset
+DELIVERY_WEEKLY_DAY = 0  # Weekday of weekly digests (0 = Monday), in the user's timezone
+DELIVERY_CATCHUP_MINUTES = 60  # Deliveries missed this recently (e.g. during a takeover) are made on replanning
+DELIVERY_REPLAN_SECONDS = 3600  # How often the plan is rebuilt from user profiles
+DELIVERY_WORKERS = 8  # Digests built and sent at once; due users queue for a worker
+DELIVERY_TZ_LOOKUPS_PER_PLAN = 200  # Slack users.info calls per replan, for users with no stored timezone
+
+# Local SQLite copy of recent messages and user documents
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", "")  # e.g. /var/lib/pulse/local.db; empty disables it
+LOCAL_STORE_RETENTION_HOURS = 72  # Messages kept locally; longer windows are read from Firestore
+LOCAL_STORE_SYNC_SECONDS = 60  # How often messages stored or updated elsewhere are pulled from Firestore
+LOCAL_STORE_SYNC_OVERLAP_SECONDS = 30  # Each sync re-reads this far back, for late server timestamps
+LOCAL_STORE_USER_TTL_SECONDS = 300  # How long a user document read from Firestore is served locally
+
+# Near-duplicate collapsing and /pulse search
+NEAR_DUPLICATE_THRESHOLD = 0.85  # Hashing-model similarity at which two messages count as the same post
+SEARCH_WINDOW_HOURS = 72  # How far back /pulse search looks
+SEARCH_REFRESH_SECONDS = 60  # How often the search index pulls in newly stored messages, in the background
+SEARCH_WORKERS = 2  # Threads running /pulse search lookups, off the Slack listener threads
+SEARCH_RESULTS = 10
+SEARCH_MIN_SCORE = 0.2
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "brute_force")  # or "hnsw" (needs hnswlib)
+VECTOR_INDEX_HNSW_MIN_SIZE = 50000  # Below this many vectors, brute force is faster than a graph
+
+# OpenAI token budgets
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))  # Org rate limit for the summary model
+OPENAI_RATE_LIMIT_SHARE = float(os.getenv("OPENAI_RATE_LIMIT_SHARE", "1.0"))  # This process's share of it
+BACKGROUND_TOKEN_SHARE = 0.5  # Scheduled jobs defer once this much of the per-minute allowance is in use
+USER_DAILY_TOKEN_BUDGET = int(os.getenv("USER_DAILY_TOKEN_BUDGET", "60000"))
+TEAM_DAILY_TOKEN_BUDGET = int(os.getenv("TEAM_DAILY_TOKEN_BUDGET", "1500000"))
+BUDGET_FALLBACK_MODEL = "gpt-4o-mini"  # Used for summaries over budget
+BUDGET_DOWNGRADE_MAX_TOKENS = 150  # Completion cap for downgraded summaries
+BUDGET_DEFER_SECONDS = 600  # How long a deferred daily digest waits before trying again
+BUDGET_MAX_DEFERRALS = 3  # After this many, the digest is sent cached or downgraded
+TOKEN_LEDGER_FLUSH_SECONDS = 30
+TOKEN_BUDGET_REFRESH_SECONDS = 60  # How often stored daily totals are re-read
+
+# Prompt preprocessing
+PREPROCESS_MAX_LINES = 12  # Longer code blocks and pasted logs keep only their head and tail
+PREPROCESS_HEAD_LINES = 4
+PREPROCESS_TAIL_LINES = 4
+PREPROCESS_MAX_LINE_CHARS = 300
+PREPROCESS_EXTRACTIVE_RANKING = os.getenv("PREPROCESS_EXTRACTIVE_RANKING", "true").lower() == "true"
+PREPROCESS_RANK_MIN_CHARS = 400  # Messages longer than this keep only their most salient sentences...
+PREPROCESS_RANK_KEEP_RATIO = 0.5  # ...up to this share of their length
+# Emoji that carry meaning (status, sign-off, alarm) are kept, as one character; all others are dropped
+PREPROCESS_KEPT_EMOJI = {
+    "white_check_mark": "✅", "heavy_check_mark": "✔", "ballot_box_with_check": "☑", "x": "❌",
+    "heavy_multiplication_x": "✖", "no_entry": "⛔", "no_entry_sign": "🚫", "octagonal_sign": "🛑",
+    "warning": "⚠", "rotating_light": "🚨", "exclamation": "❗", "question": "❓", "bug": "🐛",
+    "fire": "🔥", "rocket": "🚀", "tada": "🎉", "+1": "👍", "thumbsup": "👍", "-1": "👎", "thumbsdown": "👎",
+    "red_circle": "🔴", "large_yellow_circle": "🟡", "large_green_circle": "🟢", "hourglass_flowing_sand": "⏳"
+}
+USER_DIRECTORY_TTL_SECONDS = 3600  # How long a looked-up display name is reused
+USER_DIRECTORY_MISS_TTL_SECONDS = 60  # How long a failed users.info lookup is not retried
+
+# Model cascade: extractive, small or large model per summary
+CASCADE_SMALL_MODEL = PULSE_SUMMARY_MODEL
+CASCADE_LARGE_MODEL = GPT_MODEL
+CASCADE_EXTRACTIVE_MAX_MESSAGES = 3  # Windows this small are listed verbatim, with no LLM call...
+CASCADE_EXTRACTIVE_MAX_CHARS = 280  # ...when every message is at most this long
+CASCADE_LARGE_MIN_MESSAGES = 150
+CASCADE_LARGE_MIN_CHARS = 20000
+CASCADE_LARGE_MIN_SIGNALS = 3  # Messages with a high-signal term that send a window to the large model
+CASCADE_HIGH_SIGNAL_TERMS = (
+    "incident", "outage", "sev1", "sev2", "p0", "rollback", "recall", "blocker", "blocked", "urgent",
+    "safety", "decision", "deadline", "escalate", "regression"
+)
+
 # Database collections
 COLLECTIONS = {
     "MESSAGES": "messages",
     "USERS": "users",
     "INTERESTS": "interests",
-    "ROLES": "roles"  # New collection for roles
+    "ROLES": "roles",  # New collection for roles
+    "LEASES": "leases",  # Leader election leases
+    "PULSE_DIGESTS": "pulse_digests",  # Pre-warmed /pulse update digests, one per user
+    "TOKEN_USAGE": "token_usage",  # OpenAI tokens per day and org/team/user/channel
+    "CHANNEL_ROLLUPS": "channel_rollups",  # Message activity per channel and hour
+    "COUNTERS": "counters"  # Sharded counters, one subcollection of shards per counter
 } 
\ No newline at end of file
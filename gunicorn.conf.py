@@ -0,0 +1,19 @@
+import os
+
+# Slack handlers ack immediately and do their work on the Bolt listener
+# threads, so a few processes with several threads each go a long way.
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# Workers inherit this, so each takes 1/workers of the Slack rate limits (config.SLACK_RATE_LIMIT_SHARE)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Don't preload: the log writer, prober and scheduler threads must be started
+# in each worker, and threads started in the master don't survive the fork.
+preload_app = False
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
@@ -0,0 +1,158 @@
+"""Tagging stored messages by topic, off the ingest path.
+
+Messages are stored with empty ``tags``. ``tag_queue`` collects the new
+message documents and tags them in micro-batches on a background thread,
+writing each batch's ``tags`` with one Firestore batch. Ingest latency does
+not depend on how long tagging takes.
+
+Tags come from ``RuleTagger``: ``AUTO_TAG_KEYWORDS`` compiled into a
+single regular expression, so a message is tagged in one pass over its
+text. With ``AUTO_TAG_LLM``, messages no rule tagged are sent to
+``LLMTagger``, ``AUTO_TAG_LLM_BATCH_SIZE`` per request, unless the token
+budget asks background work to back off.
+"""
+import json
+import re
+from google.cloud import firestore
+from config import (
+    AUTO_TAG_BATCH_SIZE, AUTO_TAG_FLUSH_SECONDS, AUTO_TAG_QUEUE_SIZE, AUTO_TAG_LLM, AUTO_TAG_LLM_MODEL,
+    AUTO_TAG_LLM_MIN_CHARS, AUTO_TAG_LLM_BATCH_SIZE, AUTO_TAG_KEYWORDS, COLLECTIONS
+)
+from src import token_budget
+from src.batch_queue import BatchQueue
+from src.dependencies import get_firestore, get_openai
+from src.metrics import REGISTRY, record_openai_usage, record_writes
+from src.telemetry import get_logger, timed
+
+log = get_logger("pulse.auto_tag")
+
+AUTO_TAG_QUEUE_DROPPED_TOTAL = REGISTRY.counter(
+    "pulse_auto_tag_queue_dropped_total", "Stored messages not tagged because the queue was full"
+)
+MESSAGES_TAGGED_TOTAL = REGISTRY.counter(
+    "pulse_messages_tagged_total", "Stored messages tagged, by the tagger that tagged them", ("tagger",)
+)
+
+
+class RuleTagger:
+    """Tags from a keyword table, matched as whole words in one regex pass"""
+
+    def __init__(self, keywords=AUTO_TAG_KEYWORDS):
+        self.tags = tuple(keywords)
+        self._tag_for = {}
+        for tag, words in keywords.items():
+            for word in words:
+                self._tag_for[self._key(word)] = tag
+        # Longest first, so "test rig" wins over "test"
+        words = sorted(self._tag_for, key=len, reverse=True)
+        alternatives = "|".join(r"\s+".join(map(re.escape, word.split())) for word in words)
+        self._pattern = re.compile(r"\b(" + alternatives + r")(?:e?s)?\b", re.IGNORECASE)
+
+    @staticmethod
+    def _key(word):
+        return " ".join(word.lower().split())
+
+    def tag(self, text):
+        """Sorted tags for ``text``"""
+        if not text:
+            return []
+        return sorted({self._tag_for[self._key(match)] for match in self._pattern.findall(text)})
+
+
+class LLMTagger:
+    """Tags for messages the rules missed, asked of ``model`` in batches"""
+
+    def __init__(self, tags, model=AUTO_TAG_LLM_MODEL, client=None, batch_size=AUTO_TAG_LLM_BATCH_SIZE):
+        self.tags = tuple(tags)
+        self.model = model
+        self.client = client
+        self.batch_size = batch_size
+
+    @timed("openai.auto_tag")
+    def tag(self, texts):
+        """One list of tags per text; texts the model skipped get none"""
+        client = self.client or get_openai()
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            numbered = "\n".join(f"{i}. {' '.join(text.split())[:500]}" for i, text in enumerate(batch, 1))
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": (
+                        "You tag Slack messages from an EV engineering team by topic. Allowed tags: "
+                        + ", ".join(self.tags) + ". Reply with a JSON object mapping each message number "
+                        "to a list of allowed tags, an empty list if none apply."
+                    )},
+                    {"role": "user", "content": numbered}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0
+            )
+            record_openai_usage(self.model, response)
+            token_budget.ledger.record(self.model, response.usage, purpose="auto_tag")
+            try:
+                answer = json.loads(response.choices[0].message.content)
+            except ValueError:
+                log.warning("auto_tag.llm_bad_response", messages=len(batch))
+                answer = {}
+            for i in range(1, len(batch) + 1):
+                tags = answer.get(str(i)) if isinstance(answer, dict) else None
+                results.append(sorted({tag for tag in tags or [] if tag in self.tags}))
+        return results
+
+
+class TagQueue(BatchQueue):
+    """Tags newly stored messages in the background, in batches.
+
+    ``submit`` never blocks the ingest path: when the queue is full the
+    message is left untagged. Only the document ID is kept, so documents
+    added with the async Firestore client can be queued too.
+    """
+
+    name = "auto_tag"
+
+    def __init__(self, rules=None, llm=None, db=None, batch_size=AUTO_TAG_BATCH_SIZE,
+                 flush_seconds=AUTO_TAG_FLUSH_SECONDS, maxsize=AUTO_TAG_QUEUE_SIZE):
+        super().__init__(batch_size, flush_seconds, maxsize, dropped=AUTO_TAG_QUEUE_DROPPED_TOTAL)
+        self.rules = rules or RuleTagger()
+        self.llm = llm if llm is not None else (LLMTagger(self.rules.tags) if AUTO_TAG_LLM else None)
+        self.db = db
+
+    def submit(self, doc_ref, text):
+        """Queue a stored message document for tagging"""
+        if text:
+            self.put((doc_ref.id, text))
+
+    def tag(self, texts):
+        """Tags for each of ``texts``, and the number the LLM tagged"""
+        tags = [self.rules.tag(text) for text in texts]
+        MESSAGES_TAGGED_TOTAL.labels("rules").inc(sum(1 for found in tags if found))
+        missed = [i for i, found in enumerate(tags) if not found and len(texts[i]) >= AUTO_TAG_LLM_MIN_CHARS]
+        if not self.llm or not missed:
+            return tags
+        if token_budget.admission.admit(scheduled=True).action == "defer":
+            return tags
+        for i, found in zip(missed, self.llm.tag([texts[i] for i in missed])):
+            tags[i] = found
+        MESSAGES_TAGGED_TOTAL.labels("llm").inc(sum(1 for i in missed if tags[i]))
+        return tags
+
+    def flush(self, batch):
+        """Tag ``(doc_id, text)`` pairs and write the tags back"""
+        tags = self.tag([text for _, text in batch])
+        db = self.db or get_firestore()
+        messages = db.collection(COLLECTIONS["MESSAGES"])
+        write = db.batch()
+        updated = 0
+        for (doc_id, _), found in zip(batch, tags):
+            if found:
+                write.update(messages.document(doc_id), {"tags": found, "updated_at": firestore.SERVER_TIMESTAMP})
+                updated += 1
+        if updated:
+            write.commit()
+            record_writes(COLLECTIONS["MESSAGES"], updated)
+        log.debug("auto_tag.batch", messages=len(batch), tagged=updated)
+
+
+tag_queue = TagQueue()
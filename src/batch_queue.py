@@ -0,0 +1,69 @@
+"""Background stages that enrich stored messages in micro-batches.
+
+A stage's ``submit`` never blocks the ingest path: work is put on a bounded
+queue and a daemon thread takes it off in batches, flushing each batch once
+it holds ``batch_size`` items or ``flush_seconds`` after its first item.
+When the queue is full, the item is dropped and counted instead.
+"""
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from src.telemetry import get_logger
+
+log = get_logger("pulse.batch_queue")
+
+
+class BatchQueue(ABC):
+    """Base for a background stage; subclasses implement ``flush(batch)``"""
+
+    name = "batch"  # Thread "<name>-queue", log events "<name>.*"
+
+    def __init__(self, batch_size, flush_seconds, maxsize, dropped=None):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = dropped
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        """Queue ``item`` for the next batch, or drop it if the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.dropped is not None:
+                self.dropped.inc()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-queue", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.flush(batch)
+            except Exception as e:
+                log.warning(f"{self.name}.batch_error", items=len(batch), error=str(e))
+
+    @abstractmethod
+    def flush(self, batch):
+        """Process one batch of queued items; an exception is logged and the batch dropped"""
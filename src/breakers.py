@@ -0,0 +1,202 @@
+"""Circuit breakers and latency-derived timeouts for Slack, OpenAI and Firestore.
+
+Each dependency has one ``CircuitBreaker`` shared by the process. Calls
+made under ``breaker.guard()`` are timed and counted:
+
+- ``closed``: calls go through. After ``BREAKER_FAILURE_THRESHOLD``
+  consecutive failures the breaker opens.
+- ``open``: calls fail immediately with ``CircuitOpenError`` for
+  ``BREAKER_OPEN_SECONDS``, so callers fall back at once instead of each
+  waiting out a timeout.
+- ``half_open``: one probe call is let through. Its success closes the
+  breaker; its failure opens it again.
+
+``breaker.timeout(key)`` is the timeout to pass to the call: the p99 of
+recent successful calls with the same ``key`` times
+``BREAKER_TIMEOUT_MULTIPLIER``, within the dependency's bounds in
+``BREAKER_TIMEOUTS``. Latencies are kept per key because calls to one
+dependency can differ by an order of magnitude: OpenAI calls are keyed
+by model and completion cap (``openai_key``), and streamed calls are
+timed to their first token. Errors the caller caused (4xx other than
+408 and 429) do not count as failures, and a rate-limited call that raises
+``Throttled`` inside ``guard`` counts as neither a success nor a failure.
+
+``last_good`` keeps the last summary generated for each channel, as the
+first fallback when a new one can't be made.
+"""
+import contextlib
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from config import (
+    BREAKER_FAILURE_THRESHOLD, BREAKER_OPEN_SECONDS, BREAKER_LATENCY_WINDOW, BREAKER_MIN_SAMPLES,
+    BREAKER_TIMEOUT_MULTIPLIER, BREAKER_TIMEOUTS
+)
+from src.metrics import REGISTRY, percentile
+from src.telemetry import get_logger
+
+log = get_logger("pulse.breakers")
+
+STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+BREAKER_STATE = REGISTRY.gauge(
+    "pulse_circuit_breaker_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)",
+    ("dependency",)
+)
+BREAKER_REJECTED_TOTAL = REGISTRY.counter(
+    "pulse_circuit_breaker_rejected_total", "Calls failed fast because the dependency's breaker was open",
+    ("dependency",)
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, dependency):
+        super().__init__(f"{dependency} is unavailable (circuit open)")
+        self.dependency = dependency
+
+
+class Throttled(Exception):
+    """Raised inside ``guard`` for a call the dependency rate limited: neither a success nor a failure"""
+
+
+def is_dependency_failure(error):
+    """Whether ``error`` says the dependency is unhealthy, not that the request was bad"""
+    # OpenAI errors carry status_code, aiohttp's carry status, requests' carry a response
+    status = getattr(error, "status_code", None) or getattr(error, "status", None) \
+        or getattr(getattr(error, "response", None), "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 429))
+
+
+class CircuitBreaker:
+    """Fails calls to one dependency fast while it is down, and sizes their timeouts"""
+
+    def __init__(self, dependency, failure_threshold=BREAKER_FAILURE_THRESHOLD, open_seconds=BREAKER_OPEN_SECONDS,
+                 timeouts=None, window=BREAKER_LATENCY_WINDOW, min_samples=BREAKER_MIN_SAMPLES,
+                 multiplier=BREAKER_TIMEOUT_MULTIPLIER):
+        self.dependency = dependency
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.min_timeout, self.max_timeout = timeouts or BREAKER_TIMEOUTS[dependency]
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies = defaultdict(lambda: deque(maxlen=window))  # key -> recent successful call seconds
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(dependency).set(0)
+
+    def _set_state(self, state):
+        if state != self.state:
+            log.warning(f"breaker.{state}", dependency=self.dependency, failures=self._failures)
+            self.state = state
+            BREAKER_STATE.labels(self.dependency).set(STATES[state])
+
+    def allow(self):
+        """Whether a call may go out now; an open breaker lets one probe through once it has cooled down"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self, seconds=None, key=None):
+        with self._lock:
+            if seconds is not None:
+                self._latencies[key].append(seconds)
+            self._failures = 0
+            self._probing = False
+            self._set_state("closed")
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def observe(self, seconds, key=None):
+        """Record a latency measured outside ``guard``, e.g. a stream's time to first token"""
+        with self._lock:
+            self._latencies[key].append(seconds)
+
+    def timeout(self, key=None):
+        """Seconds to allow the next ``key`` call: observed p99 × multiplier, within the dependency's bounds"""
+        with self._lock:
+            latencies = list(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return self.max_timeout
+        p99 = percentile(latencies, 99)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+
+    @contextlib.contextmanager
+    def guard(self, key=None, timed=True):
+        """Run a call to the dependency, or raise ``CircuitOpenError`` at once if it is down.
+
+        With ``timed=False`` the call's duration is not recorded; the caller
+        records the latency that matters with ``observe``.
+        """
+        if not self.allow():
+            BREAKER_REJECTED_TOTAL.labels(self.dependency).inc()
+            raise CircuitOpenError(self.dependency)
+        start = time.perf_counter()
+        try:
+            yield
+        except Throttled:
+            with self._lock:
+                self._probing = False
+            raise
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.failure()
+            else:
+                self.success()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: says nothing about the dependency
+            with self._lock:
+                self._probing = False
+            raise
+        self.success(time.perf_counter() - start if timed else None, key)
+
+
+def openai_key(request, streamed=False):
+    """Latency key for an OpenAI request: model, completion cap, and whether only the first token is timed"""
+    return request["model"], request.get("max_tokens"), "first_token" if streamed else "complete"
+
+
+class FallbackCache:
+    """The last good value per key, kept for serving while a dependency is down"""
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self._values = OrderedDict()  # key -> (saved at, value)
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = (time.time(), value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_keys:
+                self._values.popitem(last=False)
+
+    def get(self, key, max_age):
+        """``(saved at, value)`` if saved within ``max_age`` seconds, else None"""
+        entry = self._values.get(key)
+        if entry is None or time.time() - entry[0] > max_age:
+            return None
+        return entry
+
+
+slack_breaker = CircuitBreaker("slack")
+openai_breaker = CircuitBreaker("openai")
+firestore_breaker = CircuitBreaker("firestore")
+last_good = FallbackCache()
@@ -0,0 +1,110 @@
+"""Sharded counters and debounced writes for per-user activity.
+
+Firestore sustains about one write per second to a single document, so
+incrementing ``message_count`` on a user document for every message made
+busy users' (and bots') documents a write hot spot. A ``ShardedCounter``
+spreads increments over ``shards`` documents, picked at random, under
+``counters/{name}_{key}/shards``. Reading sums the shards, and the total
+is cached for ``cache_seconds``.
+
+``Debouncer`` limits how often a per-key write is made, so ``last_active``
+is written at most once per ``LAST_ACTIVE_DEBOUNCE_SECONDS`` per user and
+process.
+"""
+import random
+import threading
+import time
+from google.cloud import firestore
+from config import COLLECTIONS, MESSAGE_COUNT_SHARDS, COUNTER_CACHE_SECONDS, LAST_ACTIVE_DEBOUNCE_SECONDS
+from src.dependencies import get_firestore
+from src.metrics import record_reads, record_writes
+from src.telemetry import timed
+
+
+class ShardedCounter:
+    """A count per key, written to one of ``shards`` documents and summed on read.
+
+    The sync methods use the shared client; the async app passes its own
+    client to ``shard`` and ``shards`` and keeps totals with ``remember``.
+    """
+
+    def __init__(self, name, shards=MESSAGE_COUNT_SHARDS, cache_seconds=COUNTER_CACHE_SECONDS, db=None):
+        self.name = name
+        self.shard_count = shards
+        self.cache_seconds = cache_seconds
+        self.db = db
+        self._totals = {}  # key -> (read at, total)
+
+    def shards(self, key, db=None):
+        """The collection holding ``key``'s shard documents"""
+        client = db or self.db or get_firestore()
+        return client.collection(COLLECTIONS["COUNTERS"]).document(f"{self.name}_{key}").collection("shards")
+
+    def shard(self, key, db=None):
+        """A random shard document of ``key``, to increment"""
+        return self.shards(key, db).document(str(random.randrange(self.shard_count)))
+
+    @timed("firestore.counters.increment")
+    def increment(self, key, amount=1):
+        self.shard(key).set({"count": firestore.Increment(amount)}, merge=True)
+        record_writes(COLLECTIONS["COUNTERS"])
+
+    def cached(self, key):
+        """The cached total for ``key``, or None if it is missing or stale"""
+        entry = self._totals.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.cache_seconds:
+            return None
+        return entry[1]
+
+    def remember(self, key, docs):
+        """Sum shard snapshots into ``key``'s total and cache it"""
+        docs = list(docs)
+        record_reads(COLLECTIONS["COUNTERS"], max(len(docs), 1))
+        total = sum((doc.to_dict() or {}).get("count", 0) for doc in docs)
+        self._totals[key] = (time.monotonic(), total)
+        return total
+
+    @timed("firestore.counters.total")
+    def total(self, key):
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
+        return self.remember(key, self.shards(key).stream())
+
+
+class Debouncer:
+    """Says whether a per-key write is due, at most once per ``interval`` seconds"""
+
+    def __init__(self, interval=LAST_ACTIVE_DEBOUNCE_SECONDS, max_keys=100000):
+        self.interval = interval
+        self.max_keys = max_keys
+        self._last = {}  # key -> time of the last write
+        self._lock = threading.Lock()
+
+    def due(self, key):
+        """True, and the write counted as made, if ``key`` was not written in the last interval"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            if len(self._last) >= self.max_keys:
+                self._last = {k: t for k, t in self._last.items() if now - t < self.interval}
+            self._last[key] = now
+            return True
+
+    def forget(self, key):
+        """Make the next write for ``key`` due, e.g. after this one failed"""
+        with self._lock:
+            self._last.pop(key, None)
+
+
+message_counter = ShardedCounter("message_count")
+last_active_debouncer = Debouncer()
+
+
+def with_message_count(profile, total):
+    """``profile`` with the sharded message count added to any count stored on it"""
+    if profile is None:
+        return None
+    return dict(profile, message_count=(profile.get("message_count") or 0) + total)
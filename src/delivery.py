@@ -0,0 +1,233 @@
+"""Scheduling daily and weekly digests at each user's local delivery time.
+
+One global run at ``DAILY_SUMMARY_TIME`` in ``SUMMARY_TIMEZONE`` generated
+every digest at once, at the wrong local time for most people. Instead,
+each user gets their digest at ``DAILY_SUMMARY_TIME`` in the timezone from
+their Slack profile (``tz``, falling back to ``SUMMARY_TIMEZONE``). Weekly
+digests (``digest_config.frequency``) go out on ``DELIVERY_WEEKLY_DAY``.
+On top of that, a stable per-user offset of up to
+``DELIVERY_SPREAD_MINUTES`` spreads users within each timezone. Generation
+load is then spread across the day, a few users per minute, instead of
+arriving in a single spike.
+
+Users are kept in a ``TimingWheel`` of one-minute buckets. Each scheduler
+tick advances it by the minutes that have passed and delivers the
+buckets that came due, so a tick costs O(1) however many users are
+scheduled. Muted users, users with no tracked channels and users who have
+not finished setup are never scheduled.
+
+``last_digest_sent`` makes delivery restartable. When the plan is rebuilt,
+for example after a restart or a scheduler takeover, a delivery missed in
+the last ``DELIVERY_CATCHUP_MINUTES`` is made at once, and one that was
+already sent is not repeated.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from config import (
+    DAILY_SUMMARY_TIME, SUMMARY_TIMEZONE, DELIVERY_SPREAD_MINUTES, DELIVERY_WEEKLY_DAY, DELIVERY_CATCHUP_MINUTES,
+    DELIVERY_REPLAN_SECONDS
+)
+from src.metrics import REGISTRY
+from src.telemetry import get_logger
+
+log = get_logger("pulse.delivery")
+
+FREQUENCIES = ("daily", "weekly")
+
+DELIVERIES_SCHEDULED = REGISTRY.gauge(
+    "pulse_digest_deliveries_scheduled", "Users with a digest delivery in the timing wheel"
+)
+DELIVERIES_DUE_TOTAL = REGISTRY.counter(
+    "pulse_digest_deliveries_due_total", "Digest deliveries that came due, by frequency", ("frequency",)
+)
+
+
+class TimingWheel:
+    """A hierarchical timing wheel of one-minute buckets.
+
+    Level 0 has a bucket per minute of the hour, level 1 a bucket per hour
+    of the day and level 2 a bucket per day of the week. A key is put in
+    the lowest level whose span reaches its due minute. When an hour (or
+    day) starts, that hour's bucket is emptied into the level below, so each
+    key is moved at most twice before it is due. Keys further out than a
+    week wait in ``overflow`` until they fit.
+    """
+
+    SLOTS = (60, 24, 7)
+    SPANS = (1, 60, 60 * 24)  # Minutes per bucket at each level
+
+    def __init__(self, current):
+        self.current = current  # The last minute advanced to (epoch minutes)
+        self._levels = [[set() for _ in range(slots)] for slots in self.SLOTS]
+        self._overflow = set()
+        self._where = {}  # key -> (due minute, bucket)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, minute):
+        """Make ``key`` due at ``minute``, or at the next advance if that has passed"""
+        self.cancel(key)
+        minute = max(minute, self.current + 1)
+        self._place(key, minute)
+
+    def _place(self, key, minute):
+        delay = minute - self.current
+        for slots, span, buckets in zip(self.SLOTS, self.SPANS, self._levels):
+            if delay < slots * span:
+                bucket = buckets[minute // span % slots]
+                break
+        else:
+            bucket = self._overflow
+        bucket.add(key)
+        self._where[key] = (minute, bucket)
+
+    def cancel(self, key):
+        entry = self._where.pop(key, None)
+        if entry is not None:
+            entry[1].discard(key)
+
+    def advance(self, minute):
+        """Move the wheel to ``minute`` and return the keys that came due on the way"""
+        due = []
+        while self.current < minute:
+            self.current += 1
+            if self.current % self.SPANS[2] == 0:
+                self._cascade(self._overflow)
+                self._cascade(self._levels[2][self.current // self.SPANS[2] % self.SLOTS[2]])
+            if self.current % self.SPANS[1] == 0:
+                self._cascade(self._levels[1][self.current // self.SPANS[1] % self.SLOTS[1]])
+            bucket = self._levels[0][self.current % self.SLOTS[0]]
+            for key in bucket:
+                del self._where[key]
+            due.extend(bucket)
+            bucket.clear()
+        return due
+
+    def _cascade(self, bucket):
+        keys = list(bucket)
+        bucket.clear()
+        for key in keys:
+            self._place(key, self._where[key][0])
+
+
+def _minutes(epoch):
+    return int(epoch // 60)
+
+
+def _sent_minute(value):
+    """``last_digest_sent`` (a datetime, or epoch seconds) in epoch minutes, or None"""
+    if isinstance(value, datetime):
+        return _minutes((value if value.tzinfo else pytz.UTC.localize(value)).timestamp())
+    if isinstance(value, (int, float)):
+        return _minutes(value)
+    return None
+
+
+def delivery_offset(user_id, spread=DELIVERY_SPREAD_MINUTES):
+    """The user's stable offset, in minutes, from the delivery time"""
+    if spread <= 1:
+        return 0
+    return int(hashlib.sha1(user_id.encode()).hexdigest(), 16) % spread
+
+
+def frequency_of(user):
+    return ((user.get("digest_config") or {}).get("frequency") or "daily").lower()
+
+
+def is_schedulable(user):
+    """Whether ``user`` should get scheduled digests at all"""
+    return bool(user.get("onboarding_completed") and user.get("tracked_channels") and not user.get("muted")
+                and frequency_of(user) in FREQUENCIES)
+
+
+def user_timezone(user):
+    try:
+        return pytz.timezone(user.get("tz") or SUMMARY_TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        return pytz.timezone(SUMMARY_TIMEZONE)
+
+
+def next_delivery(user, after, at=DAILY_SUMMARY_TIME, weekly_day=DELIVERY_WEEKLY_DAY):
+    """The first delivery minute (epoch minutes) for ``user`` later than minute ``after``"""
+    tz = user_timezone(user)
+    hour, minute = map(int, at.split(":"))
+    offset = delivery_offset(user["id"])
+    weekly = frequency_of(user) == "weekly"
+    day = datetime.fromtimestamp(after * 60, tz).date() - timedelta(days=1)
+    for _ in range(9):
+        if not weekly or day.weekday() == weekly_day:
+            local = datetime(day.year, day.month, day.day, hour, minute) + timedelta(minutes=offset)
+            due = _minutes(tz.localize(local).timestamp())
+            if due > after:
+                return due
+        day += timedelta(days=1)
+    return None
+
+
+class DigestDelivery:
+    """Which users' digests are due each minute, from a plan rebuilt every ``DELIVERY_REPLAN_SECONDS``"""
+
+    def __init__(self, replan_seconds=DELIVERY_REPLAN_SECONDS, catchup_minutes=DELIVERY_CATCHUP_MINUTES):
+        self.replan_seconds = replan_seconds
+        self.catchup_minutes = catchup_minutes
+        self.planned_at = None
+        self._wheel = None
+        self._users = {}  # user ID -> the fields next_delivery needs
+        self._lock = threading.Lock()
+        DELIVERIES_SCHEDULED.set_function(lambda: len(self._wheel or ()))
+
+    def needs_plan(self, now=None):
+        now = now if now is not None else time.time()
+        return self.planned_at is None or now - self.planned_at >= self.replan_seconds
+
+    def reset(self):
+        """Drop the plan, e.g. on taking over scheduling, since another process may have delivered since"""
+        with self._lock:
+            self._wheel, self._users, self.planned_at = None, {}, None
+
+    def plan(self, users, now=None):
+        """Schedule every schedulable user's next delivery; returns how many were scheduled"""
+        now = now if now is not None else time.time()
+        current = _minutes(now)
+        wheel = TimingWheel(current - 1)
+        schedule = {}
+        for user in users:
+            if not is_schedulable(user):
+                continue
+            fields = {"id": user["id"], "tz": user.get("tz"), "digest_config": user.get("digest_config")}
+            # Deliveries missed in the catch-up window are made now, unless they were sent
+            after = max(current - self.catchup_minutes - 1, _sent_minute(user.get("last_digest_sent")) or 0)
+            due = next_delivery(fields, after)
+            if due is not None:
+                wheel.schedule(user["id"], due)
+                schedule[user["id"]] = fields
+        with self._lock:
+            self._wheel, self._users, self.planned_at = wheel, schedule, now
+        log.info("delivery.planned", users=len(schedule), skipped=len(users) - len(schedule))
+        return len(schedule)
+
+    def due(self, now=None):
+        """IDs of users whose delivery minute has come, each rescheduled for its next delivery"""
+        now = now if now is not None else time.time()
+        current = _minutes(now)
+        with self._lock:
+            if self._wheel is None:
+                return []
+            due = self._wheel.advance(current)
+            for user_id in due:
+                fields = self._users[user_id]
+                DELIVERIES_DUE_TOTAL.labels(frequency_of(fields)).inc()
+                following = next_delivery(fields, current)
+                if following is not None:
+                    self._wheel.schedule(user_id, following)
+        return due
+
+
+delivery = DigestDelivery()
@@ -0,0 +1,89 @@
+"""Clients shared by the whole process, each created on first use.
+
+Firebase is initialized once, and every module and service shares one
+Firestore client (one gRPC channel) and one OpenAI client; app_async.py
+gets their async counterparts the same way. Nothing is
+constructed, and the OpenAI SDK is not even imported, until something
+actually makes a call, so importing the bot stays cheap.
+
+Modules that hold a client at import time use the ``db`` and
+``openai_client`` stand-ins, which forward to the real client on first
+attribute access.
+"""
+import os
+import threading
+
+_clients = {}
+_lock = threading.RLock()  # creating the Firestore client initializes Firebase under it
+
+
+def _shared(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def _initialize_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    cred_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if cred_path and os.path.exists(cred_path):
+        return firebase_admin.initialize_app(credentials.Certificate(cred_path))
+    return firebase_admin.initialize_app()
+
+
+def firebase_app():
+    """The default Firebase app, initialized from GOOGLE_APPLICATION_CREDENTIALS or ADC"""
+    return _shared("firebase", _initialize_firebase)
+
+
+def get_firestore():
+    """The process's Firestore client"""
+    def create():
+        from firebase_admin import firestore
+        return firestore.client(firebase_app())
+    return _shared("firestore", create)
+
+
+def get_openai():
+    """The process's OpenAI client"""
+    def create():
+        from openai import OpenAI
+        return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _shared("openai", create)
+
+
+def get_firestore_async():
+    """The process's Firestore AsyncClient"""
+    def create():
+        from firebase_admin import firestore_async
+        return firestore_async.client(firebase_app())
+    return _shared("firestore_async", create)
+
+
+def get_async_openai():
+    """The process's AsyncOpenAI client"""
+    def create():
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _shared("openai_async", create)
+
+
+class LazyClient:
+    """Stand-in that creates a shared client the first time it is used"""
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+db = LazyClient(get_firestore)
+openai_client = LazyClient(get_openai)
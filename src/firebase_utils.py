@@ -1,20 +1,34 @@
-import os
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# Initialize Firebase only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.environ["GOOGLE_APPLICATION_CREDENTIALS"])
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from firebase_admin import firestore
+from src.dependencies import db
+from src.telemetry import timed
+from src.metrics import record_reads, record_writes
+from src.breakers import firestore_breaker
+from src.local_store import local_store
 
 # --- USER UTILITIES ---
+@timed("firestore.get_user")
 def get_user(user_id):
-    doc = db.collection("users").document(user_id).get()
-    return doc.to_dict() if doc.exists else None
-
+    user = local_store.get_user(user_id)
+    if user is not None:
+        return user
+    with firestore_breaker.guard():
+        doc = db.collection("users").document(user_id).get(timeout=firestore_breaker.timeout())
+    record_reads("users")
+    user = doc.to_dict() if doc.exists else None
+    local_store.put_user(user_id, user)
+    return user
+
+@timed("firestore.create_or_update_user")
 def create_or_update_user(user_id, data):
     db.collection("users").document(user_id).set(data, merge=True)
+    record_writes("users")
+    local_store.forget_user(user_id)
+
+@timed("firestore.users.delete")
+def delete_user(user_id):
+    db.collection("users").document(user_id).delete()
+    record_writes("users")
+    local_store.forget_user(user_id)
 
 def ensure_user_exists(user_id, name):
     if not get_user(user_id):
@@ -33,16 +47,26 @@ def ensure_user_exists(user_id, name):
             "last_digest_sent": None
         })
 
+@timed("firestore.mute_user")
 def mute_user(user_id):
     db.collection("users").document(user_id).update({"muted": True})
+    record_writes("users")
+    local_store.forget_user(user_id)
 
+@timed("firestore.unmute_user")
 def unmute_user(user_id):
     db.collection("users").document(user_id).update({"muted": False})
+    record_writes("users")
+    local_store.forget_user(user_id)
 
+@timed("firestore.update_user_digest_config")
 def update_user_digest_config(user_id, config):
     db.collection("users").document(user_id).update({"digest_config": config})
+    record_writes("users")
+    local_store.forget_user(user_id)
 
 # --- DIGEST UTILITIES ---
+@timed("firestore.add_team_digest")
 def add_team_digest(summary, highlights, blockers, kudos, trends, frequency="daily"):
     db.collection("digests").add({
         "type": "team",
@@ -54,14 +78,18 @@ def add_team_digest(summary, highlights, blockers, kudos, trends, frequency="dai
         "kudos": kudos,
         "trends": trends
     })
+    record_writes("digests")
 
+@timed("firestore.get_latest_team_digest")
 def get_latest_team_digest():
     docs = db.collection("digests").where("type", "==", "team").order_by("date", direction=firestore.Query.DESCENDING).limit(1).stream()
+    record_reads("digests")
     for doc in docs:
         return doc.to_dict()
     return None
 
 # --- BLOCKERS UTILITIES ---
+@timed("firestore.add_blocker")
 def add_blocker(title, description, reported_by, tags):
     db.collection("blockers").add({
         "title": title,
@@ -73,18 +101,25 @@ def add_blocker(title, description, reported_by, tags):
         "resolved_at": None,
         "resolved_by": None
     })
+    record_writes("blockers")
 
+@timed("firestore.get_open_blockers")
 def get_open_blockers():
-    return [doc.to_dict() for doc in db.collection("blockers").where("status", "==", "open").stream()]
+    blockers = [doc.to_dict() for doc in db.collection("blockers").where("status", "==", "open").stream()]
+    record_reads("blockers", max(len(blockers), 1))
+    return blockers
 
+@timed("firestore.resolve_blocker")
 def resolve_blocker(blocker_id, resolved_by):
     db.collection("blockers").document(blocker_id).update({
         "status": "resolved",
         "resolved_at": firestore.SERVER_TIMESTAMP,
         "resolved_by": resolved_by
     })
+    record_writes("blockers")
 
 # --- KUDOS UTILITIES ---
+@timed("firestore.add_kudos")
 def add_kudos(from_user, to_user, message, gpt_generated=False):
     db.collection("kudos").add({
         "from": from_user,
@@ -93,37 +128,71 @@ def add_kudos(from_user, to_user, message, gpt_generated=False):
         "created_at": firestore.SERVER_TIMESTAMP,
         "gpt_generated": gpt_generated
     })
+    record_writes("kudos")
 
+@timed("firestore.get_recent_kudos")
 def get_recent_kudos(limit=10):
-    return [doc.to_dict() for doc in db.collection("kudos").order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit).stream()]
+    kudos = [doc.to_dict() for doc in db.collection("kudos").order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit).stream()]
+    record_reads("kudos", max(len(kudos), 1))
+    return kudos
 
 # --- TRENDS UTILITIES ---
-def add_trend(date, active_threads, top_prs, issue_swarms, summary):
+@timed("firestore.add_trend")
+def add_trend(date, active_threads, top_prs, issue_swarms, summary, spikes=None):
     db.collection("trends").add({
         "date": date,
         "active_threads": active_threads,
         "top_prs": top_prs,
         "issue_swarms": issue_swarms,
+        "spikes": spikes or [],
         "summary": summary
     })
+    record_writes("trends")
 
+@timed("firestore.get_latest_trends")
 def get_latest_trends():
     docs = db.collection("trends").order_by("date", direction=firestore.Query.DESCENDING).limit(1).stream()
+    record_reads("trends")
     for doc in docs:
         return doc.to_dict()
     return None
 
+# --- PRE-WARMED DIGEST UTILITIES ---
+@timed("firestore.get_prewarmed_digest")
+def get_prewarmed_digest(user_id):
+    with firestore_breaker.guard():
+        doc = db.collection("pulse_digests").document(user_id).get(timeout=firestore_breaker.timeout())
+    record_reads("pulse_digests")
+    return doc.to_dict() if doc.exists else None
+
+@timed("firestore.store_prewarmed_digest")
+def store_prewarmed_digest(user_id, digest):
+    with firestore_breaker.guard():
+        db.collection("pulse_digests").document(user_id).set(digest, timeout=firestore_breaker.timeout())
+    record_writes("pulse_digests")
+
 # --- CONFIG UTILITIES (OPTIONAL) ---
+@timed("firestore.set_global_config")
 def set_global_config(config):
     db.collection("config").document("global").set(config, merge=True)
+    record_writes("config")
 
+@timed("firestore.get_global_config")
 def get_global_config():
     doc = db.collection("config").document("global").get()
+    record_reads("config")
     return doc.to_dict() if doc.exists else None
 
 # --- MESSAGES UTILITIES (OPTIONAL) ---
+@timed("firestore.store_message")
 def store_message(message_data):
-    db.collection("messages").add(message_data)
+    message_data = dict(message_data, updated_at=firestore.SERVER_TIMESTAMP)
+    _, doc_ref = db.collection("messages").add(message_data)
+    record_writes("messages")
+    local_store.put_message(doc_ref.id, message_data)
 
+@timed("firestore.get_user_messages")
 def get_user_messages(user_id, limit=20):
-    return [doc.to_dict() for doc in db.collection("messages").where("user_id", "==", user_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()] 
\ No newline at end of file
+    messages = [doc.to_dict() for doc in db.collection("messages").where("user_id", "==", user_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()]
+    record_reads("messages", max(len(messages), 1))
+    return messages 
\ No newline at end of file
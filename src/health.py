@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from config import (
+    HEALTH_PROBE_INTERVAL_SECONDS, HEALTH_PROBE_TIMEOUT_SECONDS, HEALTH_LATENCY_WINDOW, READINESS_MAX_ERROR_RATE,
+    READINESS_MIN_CALLS, READINESS_MAX_BACKLOG
+)
+from src.metrics import EXTERNAL_CALLS_TOTAL, percentile, record_call
+from src.telemetry import get_logger
+
+log = get_logger("pulse.health")
+
+
+class BacklogExecutor(ThreadPoolExecutor):
+    """``ThreadPoolExecutor`` that counts the tasks submitted but not yet started"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backlog = 0
+        self._backlog_lock = threading.Lock()
+
+    def _dequeued(self):
+        with self._backlog_lock:
+            self.backlog -= 1
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._backlog_lock:
+            self.backlog += 1
+
+        def run():
+            self._dequeued()
+            return fn(*args, **kwargs)
+
+        try:
+            future = super().submit(run)
+        except Exception:
+            self._dequeued()
+            raise
+        # A task cancelled while queued never runs
+        future.add_done_callback(lambda f: f.cancelled() and self._dequeued())
+        return future
+
+
+class DependencyProber:
+    """Background thread that probes dependencies on an interval and caches the results.
+
+    ``checks`` maps a dependency name to a callable that raises on failure.
+    The checks run concurrently, and one that has not finished within
+    ``timeout`` counts as failed; a check still hanging from an earlier
+    round is not started again. Readiness and liveness answers only read
+    the cached state, so the probe endpoints never wait on the network.
+
+    Only the ``required`` dependencies (all of them by default) gate
+    readiness, directly or through the external-call error rate. The
+    others, and any breakers added with ``add_breaker``, are reported for
+    information: the process keeps serving degraded while they are down.
+    """
+
+    def __init__(self, checks, interval=HEALTH_PROBE_INTERVAL_SECONDS, timeout=HEALTH_PROBE_TIMEOUT_SECONDS,
+                 window=HEALTH_LATENCY_WINDOW, max_error_rate=READINESS_MAX_ERROR_RATE,
+                 min_calls=READINESS_MIN_CALLS, required=None):
+        self.checks = checks
+        self.required = set(checks if required is None else required)
+        self.interval = interval
+        self.timeout = timeout
+        self.max_error_rate = max_error_rate
+        self.min_calls = min_calls
+        self.results = {}
+        self.samples = {name: deque(maxlen=window) for name in checks}
+        self.backlogs = {}
+        self.breakers = {}
+        self.error_rate = 0.0
+        self.last_probe = None
+        self._last_totals = (0, 0)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(checks)), thread_name_prefix="probe")
+        self._running = {}
+
+    def add_backlog_source(self, name, depth, threshold=READINESS_MAX_BACKLOG):
+        """Register a queue whose depth makes the process unready above ``threshold``"""
+        self.backlogs[name] = (depth, threshold)
+
+    def add_breaker(self, breaker):
+        """Report ``breaker``'s state in readiness answers"""
+        self.breakers[breaker.dependency] = breaker
+
+    def start(self):
+        """Start probing in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="dependency-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                log.exception("health.probe_loop_error", error=str(e))
+            self._stop.wait(self.interval)
+
+    @staticmethod
+    def _probe(check):
+        start = time.perf_counter()
+        try:
+            check()
+        except Exception as e:
+            return time.perf_counter() - start, str(e) or type(e).__name__
+        return time.perf_counter() - start, None
+
+    def probe_all(self):
+        """Probe every dependency at once and refresh the cached error rate"""
+        for name, check in self.checks.items():
+            running = self._running.get(name)
+            if running is None or running.done():
+                self._running[name] = self._executor.submit(self._probe, check)
+        wait(self._running.values(), timeout=self.timeout)
+
+        for name, future in self._running.items():
+            if future.done():
+                elapsed, error = future.result()
+            else:
+                elapsed, error = self.timeout, f"timed out after {self.timeout}s"
+            status = "error" if error else "ok"
+            record_call(f"{name}.probe", elapsed, status)
+
+            with self._lock:
+                self.samples[name].append(elapsed)
+                self.results[name] = {
+                    "ok": status == "ok",
+                    "latency_ms": round(elapsed * 1000, 2),
+                    "error": error,
+                    "checked_at": datetime.now().isoformat()
+                }
+            if error:
+                log.warning("health.probe_failed", dependency=name, error=error)
+
+        self._refresh_error_rate()
+        self.last_probe = time.monotonic()
+
+    def _refresh_error_rate(self):
+        """Error rate of calls to required dependencies made since the previous probe"""
+        total = errors = 0
+        for labels, child in EXTERNAL_CALLS_TOTAL.children():
+            # Skip our own probes so a single failed check doesn't count twice
+            if labels[1] == "probe" or labels[0] not in self.required:
+                continue
+            total += child.value
+            if labels[2] == "error":
+                errors += child.value
+        last_total, last_errors = self._last_totals
+        calls = total - last_total
+        failed = errors - last_errors
+        self._last_totals = (total, errors)
+        self.error_rate = failed / calls if calls >= self.min_calls else 0.0
+
+    def readiness(self):
+        """Return (ready, report) from the cached probe results"""
+        reasons = []
+        dependencies = {}
+        with self._lock:
+            for name in self.checks:
+                result = self.results.get(name)
+                samples = list(self.samples[name])
+                required = name in self.required
+                if result is None:
+                    if required:
+                        reasons.append(f"{name}: not probed yet")
+                    dependencies[name] = {"ok": False, "required": required}
+                    continue
+                if not result["ok"] and required:
+                    reasons.append(f"{name}: {result['error']}")
+                p50 = percentile(samples, 50)
+                p99 = percentile(samples, 99)
+                dependencies[name] = dict(
+                    result,
+                    required=required,
+                    p50_ms=round(p50 * 1000, 2) if p50 is not None else None,
+                    p99_ms=round(p99 * 1000, 2) if p99 is not None else None
+                )
+
+        backlogs = {}
+        for name, (depth, threshold) in self.backlogs.items():
+            try:
+                backlogs[name] = depth()
+            except Exception:
+                backlogs[name] = None
+                continue
+            if backlogs[name] > threshold:
+                reasons.append(f"{name} backlog {backlogs[name]} > {threshold}")
+
+        if self.error_rate > self.max_error_rate:
+            reasons.append(f"error rate {self.error_rate:.2f} > {self.max_error_rate}")
+
+        report = {
+            "status": "ready" if not reasons else "unready",
+            "reasons": reasons,
+            "dependencies": dependencies,
+            "backlogs": backlogs,
+            "breakers": {name: breaker.state for name, breaker in self.breakers.items()},
+            "error_rate": round(self.error_rate, 4),
+            "timestamp": datetime.now().isoformat()
+        }
+        return not reasons, report
+
+    def liveness(self):
+        """Return (alive, report); the process is alive while the prober keeps running"""
+        stale_after = self.interval * 3 + 30
+        if self._thread is None:
+            alive = True
+        else:
+            alive = self._thread.is_alive() and (
+                self.last_probe is None or time.monotonic() - self.last_probe < stale_after
+            )
+        return alive, {"status": "alive" if alive else "stalled", "timestamp": datetime.now().isoformat()}
@@ -0,0 +1,114 @@
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from google.cloud import firestore
+from config import COLLECTIONS, LEADER_LEASE_SECONDS, LEADER_RENEW_SECONDS, LEADER_CLOCK_SKEW_SECONDS
+from src.metrics import record_reads, record_writes
+from src.telemetry import get_logger, span
+
+log = get_logger("pulse.leader")
+
+
+class LeaderElector:
+    """Lease-based leader election on a single Firestore document.
+
+    The lease document holds the current ``holder`` and an ``expires_at``
+    time. A replica becomes leader by writing itself into the document inside
+    a transaction when the lease is free or expired, and keeps it by renewing
+    before it expires. A standby takes over at most ``lease_seconds`` +
+    ``renew_seconds`` after the leader stops renewing.
+    """
+
+    def __init__(self, db, name, lease_seconds=LEADER_LEASE_SECONDS, renew_seconds=LEADER_RENEW_SECONDS,
+                 clock_skew=LEADER_CLOCK_SKEW_SECONDS, holder_id=None):
+        if renew_seconds >= lease_seconds:
+            raise ValueError("renew_seconds must be shorter than lease_seconds")
+        self.db = db
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew_seconds = renew_seconds
+        self.clock_skew = clock_skew
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader_until = 0.0
+        self._next_attempt = 0.0
+
+    @property
+    def lease_ref(self):
+        # Built on use so a lazily created client is not forced at import time
+        return self.db.collection(COLLECTIONS["LEASES"]).document(self.name)
+
+    def is_leader(self):
+        """Whether this replica currently holds an unexpired lease"""
+        return time.monotonic() < self._leader_until
+
+    def maintain(self):
+        """Acquire or renew the lease if an attempt is due; returns is_leader()"""
+        now = time.monotonic()
+        if now >= self._next_attempt:
+            self._next_attempt = now + self.renew_seconds
+            self.try_acquire()
+        return self.is_leader()
+
+    def try_acquire(self):
+        """Try once to take or renew the lease"""
+        was_leader = self.is_leader()
+        # Measure validity from before the round trip so local leadership never outlives the lease
+        started = time.monotonic()
+        try:
+            with span("firestore.leases.transaction", lease=self.name):
+                acquired = self._acquire(self.db.transaction())
+        except Exception as e:
+            log.warning("leader.acquire_error", lease=self.name, error=str(e))
+            acquired = False
+
+        if acquired:
+            self._leader_until = started + self.lease_seconds - self.clock_skew
+            if not was_leader:
+                log.info("leader.acquired", lease=self.name, holder=self.holder_id)
+        else:
+            self._leader_until = 0.0
+            if was_leader:
+                log.warning("leader.lost", lease=self.name, holder=self.holder_id)
+        return acquired
+
+    def _acquire(self, transaction):
+        @firestore.transactional
+        def attempt(transaction):
+            snapshot = self.lease_ref.get(transaction=transaction)
+            record_reads(COLLECTIONS["LEASES"])
+            lease = snapshot.to_dict() if snapshot.exists else None
+            now = datetime.now(timezone.utc)
+            if lease and lease.get("holder") != self.holder_id and lease.get("expires_at") and lease["expires_at"] > now:
+                return False
+
+            acquired_at = lease.get("acquired_at") if lease and lease.get("holder") == self.holder_id else now
+            transaction.set(self.lease_ref, {
+                "holder": self.holder_id,
+                "acquired_at": acquired_at,
+                "renewed_at": now,
+                "expires_at": now + timedelta(seconds=self.lease_seconds)
+            })
+            record_writes(COLLECTIONS["LEASES"])
+            return True
+
+        return attempt(transaction)
+
+    def release(self):
+        """Give up the lease so a standby can take over immediately"""
+        if not self.is_leader():
+            return
+        self._leader_until = 0.0
+
+        @firestore.transactional
+        def attempt(transaction):
+            snapshot = self.lease_ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict().get("holder") == self.holder_id:
+                transaction.delete(self.lease_ref)
+
+        try:
+            attempt(self.db.transaction())
+            log.info("leader.released", lease=self.name, holder=self.holder_id)
+        except Exception as e:
+            log.warning("leader.release_error", lease=self.name, error=str(e))
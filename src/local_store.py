@@ -0,0 +1,284 @@
+"""A local SQLite copy of recent messages and user documents, read before Firestore.
+
+Windowed message queries and user lookups otherwise cost a Firestore round
+trip (50-150 ms) and per-document reads. Set ``LOCAL_STORE_PATH`` to
+keep a copy in a SQLite database on local disk. It is opened in WAL mode,
+so readers never wait on the writer.
+
+- Messages: every ingest path writes each stored message through, under
+  its Firestore document ID. ``start`` first reconciles with Firestore,
+  copying the last ``LOCAL_STORE_RETENTION_HOURS`` of messages. It then
+  pulls messages whose ``updated_at`` is newer, every
+  ``LOCAL_STORE_SYNC_SECONDS``: ones other processes ingested, and the
+  ``tags`` and ``embedding`` fields the background queues add after a
+  message is stored. Messages older than the retention are pruned.
+- Users: documents are cached when read (read-through) for
+  ``LOCAL_STORE_USER_TTL_SECONDS``. A write through any process on the
+  host drops the cached copy.
+- Names: display names looked up with ``users.info`` are kept for
+  ``USER_DIRECTORY_TTL_SECONDS``, so the workers on a host share one
+  directory (``preprocess.user_directory``).
+
+Firestore stays the source of truth. A windowed query is answered locally
+only if the copy covers the whole window, i.e. once reconciliation has
+finished and the window starts after its cutoff; otherwise callers go to
+Firestore as before. Messages other processes ingested can be up to
+``LOCAL_STORE_SYNC_SECONDS`` late, and so can their tags and embeddings.
+Columns mirror the document's own
+fields, so a local query matches exactly the documents the Firestore
+query would.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config import (
+    COLLECTIONS, LOCAL_STORE_PATH, LOCAL_STORE_RETENTION_HOURS, LOCAL_STORE_SYNC_SECONDS,
+    LOCAL_STORE_SYNC_OVERLAP_SECONDS, LOCAL_STORE_USER_TTL_SECONDS, USER_DIRECTORY_TTL_SECONDS
+)
+from src.dependencies import get_firestore
+from src.metrics import record_cache, record_reads
+from src.telemetry import get_logger, timed
+
+log = get_logger("pulse.local_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    doc_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    user_id TEXT,
+    recipient_id TEXT,
+    channel_type TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_user ON messages (user_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_recipient ON messages (recipient_id, channel_type, created_at);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created_at);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS names (
+    user_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    name TEXT NOT NULL
+);
+"""
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    # Server timestamps and other sentinels have no local value
+    return None
+
+
+def _hook(value):
+    if len(value) == 1 and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    return value
+
+
+def _dumps(doc):
+    return json.dumps(doc, default=_default)
+
+
+def _loads(data):
+    return json.loads(data, object_hook=_hook)
+
+
+def _seconds(value):
+    """Epoch seconds of a datetime, or None for anything else (e.g. a server timestamp)"""
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return None
+
+
+class LocalStore:
+    """Recent messages and user documents in a local SQLite database; disabled without a path"""
+
+    def __init__(self, path=LOCAL_STORE_PATH, retention_hours=LOCAL_STORE_RETENTION_HOURS,
+                 sync_seconds=LOCAL_STORE_SYNC_SECONDS, user_ttl=LOCAL_STORE_USER_TTL_SECONDS,
+                 name_ttl=USER_DIRECTORY_TTL_SECONDS, db=None):
+        self.path = path
+        self.retention_hours = retention_hours
+        self.sync_seconds = sync_seconds
+        self.user_ttl = user_ttl
+        self.name_ttl = name_ttl
+        self.db = db
+        self.covered_since = None  # Messages stored since this epoch time are all present
+        self._synced_to = None  # updated_at of the newest message pulled from Firestore
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.path != ":memory:" and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    # --- Messages ---
+
+    def put_message(self, doc_id, message):
+        """Write a message just stored in Firestore through to the local copy"""
+        if not self.enabled:
+            return
+        self._put_messages([(doc_id, message)], stored_at=time.time())
+
+    def _put_messages(self, docs, stored_at=None):
+        rows = []
+        for doc_id, message in docs:
+            # Documents stored with a server timestamp are dated when they were written here
+            created_at = _seconds(message.get("created_at")) or stored_at or time.time()
+            if _seconds(message.get("created_at")) is None:
+                message = dict(message, created_at=datetime.fromtimestamp(created_at, timezone.utc))
+            rows.append((doc_id, message.get("channel_id"), message.get("user_id"), message.get("recipient_id"),
+                         message.get("channel_type"), created_at, _dumps(message)))
+        self._connection().executemany(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def covers(self, cutoff):
+        """Whether every message stored since ``cutoff`` (a datetime) is in the local copy"""
+        if not self.enabled:
+            return False
+        covered = self.covered_since is not None and _seconds(cutoff) >= self.covered_since
+        record_cache("local_messages", covered)
+        return covered
+
+    def _select(self, where, params):
+        rows = self._connection().execute(
+            f"SELECT data FROM messages WHERE {where} ORDER BY created_at DESC", params
+        ).fetchall()
+        return [_loads(data) for data, in rows]
+
+    @timed("sqlite.messages.recent")
+    def recent_messages(self, cutoff):
+        return self._select("created_at >= ?", (_seconds(cutoff),))
+
+    @timed("sqlite.messages.user")
+    def user_messages(self, user_id, cutoff):
+        return self._select("user_id = ? AND created_at >= ?", (user_id, _seconds(cutoff)))
+
+    @timed("sqlite.messages.channel")
+    def channel_messages(self, channel_id, cutoff):
+        return self._select("channel_id = ? AND created_at >= ?", (channel_id, _seconds(cutoff)))
+
+    @timed("sqlite.messages.received_dms")
+    def received_dms(self, user_id, cutoff):
+        return self._select("recipient_id = ? AND channel_type = 'im' AND created_at >= ?",
+                            (user_id, _seconds(cutoff)))
+
+    # --- Users ---
+
+    def get_user(self, user_id):
+        """A cached user document, or None if it isn't cached or is older than the TTL"""
+        if not self.enabled:
+            return None
+        row = self._connection().execute(
+            "SELECT data FROM users WHERE user_id = ? AND fetched_at >= ?", (user_id, time.time() - self.user_ttl)
+        ).fetchone()
+        record_cache("local_users", row is not None)
+        return _loads(row[0]) if row else None
+
+    def put_user(self, user_id, user):
+        """Cache a user document just read from Firestore"""
+        if self.enabled and user is not None:
+            self._connection().execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+                                       (user_id, time.time(), _dumps(user)))
+
+    def forget_user(self, user_id):
+        """Drop a cached user document after it was written"""
+        if self.enabled:
+            self._connection().execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    # --- Names ---
+
+    def get_name(self, user_id):
+        """(display name, epoch time it was looked up) if another lookup on this host is unexpired, else None"""
+        if not self.enabled:
+            return None
+        return self._connection().execute(
+            "SELECT name, fetched_at FROM names WHERE user_id = ? AND fetched_at >= ?",
+            (user_id, time.time() - self.name_ttl)
+        ).fetchone()
+
+    def put_name(self, user_id, name):
+        if self.enabled:
+            self._connection().execute("INSERT OR REPLACE INTO names VALUES (?, ?, ?)", (user_id, time.time(), name))
+
+    # --- Reconciliation ---
+
+    @timed("sqlite.sync")
+    def sync(self):
+        """Copy messages stored or updated in Firestore since the last sync, and prune expired ones.
+
+        The first sync reconciles the whole retention window; after it the
+        local copy covers that window.
+        """
+        now = time.time()
+        if self._synced_to is None:
+            start = now - self.retention_hours * 3600
+            query = self._messages().where("created_at", ">=", datetime.fromtimestamp(start, timezone.utc))
+        else:
+            # Overlap, so documents whose server timestamps landed out of order are not missed
+            start = self._synced_to - LOCAL_STORE_SYNC_OVERLAP_SECONDS
+            query = self._messages().where("updated_at", ">=", datetime.fromtimestamp(start, timezone.utc))
+        docs = [(doc.id, doc.to_dict()) for doc in query.stream()]
+        record_reads(COLLECTIONS["MESSAGES"], max(len(docs), 1))
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            self._put_messages(docs)
+            connection.execute("DELETE FROM messages WHERE created_at < ?", (now - self.retention_hours * 3600,))
+            connection.execute("DELETE FROM users WHERE fetched_at < ?", (now - self.user_ttl,))
+            connection.execute("DELETE FROM names WHERE fetched_at < ?", (now - self.name_ttl,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        newest = max((_seconds(message.get("updated_at")) or 0 for _, message in docs), default=0)
+        self._synced_to = max(self._synced_to or now, newest)
+        if self.covered_since is None:
+            self.covered_since = now - self.retention_hours * 3600
+            log.info("local_store.reconciled", messages=len(docs), seconds=round(time.time() - now, 2))
+        return len(docs)
+
+    def _messages(self):
+        return (self.db or get_firestore()).collection(COLLECTIONS["MESSAGES"])
+
+    def start(self):
+        """Reconcile with Firestore and keep syncing, in the background"""
+        if not self.enabled or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="local-store-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                log.warning("local_store.sync_error", error=str(e))
+            time.sleep(self.sync_seconds)
+
+
+local_store = LocalStore()
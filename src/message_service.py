@@ -2,18 +2,22 @@ from datetime import datetime, timedelta
 import pytz
 from google.cloud import firestore
 from config import COLLECTIONS, MESSAGE_TYPES, TRACKED_FILE_TYPES
-from src.advanced.auto_tag_service import AutoTagService
-
-auto_tag_service = AutoTagService()
+from src.telemetry import timed
+from src.metrics import record_reads, record_writes
+from src.dependencies import get_firestore
+from src.relevance import embedding_queue
+from src.auto_tag import tag_queue
+from src.rollups import rollups
+from src.local_store import local_store
 
 class MessageService:
-    def __init__(self):
-        self.db = firestore.Client()
+    def __init__(self, db=None):
+        self.db = db or get_firestore()
         self.messages_collection = self.db.collection(COLLECTIONS["MESSAGES"])
 
+    @timed("firestore.messages.store_message")
     def store_message(self, message_data):
-        """Store a message in Firestore with metadata and auto-tags"""
-        tags = auto_tag_service.tag_message(message_data.get("text", "")) if message_data.get("text") else []
+        """Store a message in Firestore with metadata; tags are added in the background"""
         message = {
             "channel_id": message_data.get("channel"),
             "user_id": message_data.get("user"),
@@ -25,25 +29,39 @@ class MessageService:
             "files": self._extract_files(message_data),
             "is_pinned": False,  # Will be updated if message is pinned
             "created_at": datetime.now(pytz.UTC),
+            "updated_at": firestore.SERVER_TIMESTAMP,  # Bumped by enrichment writes, for local store syncs
             "channel_type": message_data.get("channel_type", "channel"),
-            "tags": tags
+            "tags": []
         }
         
-        self.messages_collection.add(message)
+        _, doc_ref = self.messages_collection.add(message)
+        record_writes(COLLECTIONS["MESSAGES"])
+        local_store.put_message(doc_ref.id, message)
+        embedding_queue.submit(doc_ref, message["text"])
+        tag_queue.submit(doc_ref, message["text"])
+        rollups.record(message_data)
 
+    @timed("firestore.messages.get_recent_messages")
     def get_recent_messages(self, hours=24):
         """Get messages from the last 24 hours"""
         cutoff_time = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        if local_store.covers(cutoff_time):
+            return local_store.recent_messages(cutoff_time)
         
         query = self.messages_collection.where(
             "created_at", ">=", cutoff_time
         ).order_by("created_at", direction=firestore.Query.DESCENDING)
         
-        return [doc.to_dict() for doc in query.stream()]
+        messages = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["MESSAGES"], max(len(messages), 1))
+        return messages
 
+    @timed("firestore.messages.get_user_messages")
     def get_user_messages(self, user_id, hours=24):
         """Get messages from a specific user in the last 24 hours"""
         cutoff_time = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        if local_store.covers(cutoff_time):
+            return local_store.user_messages(user_id, cutoff_time)
         
         query = self.messages_collection.where(
             "user_id", "==", user_id
@@ -51,11 +69,16 @@ class MessageService:
             "created_at", ">=", cutoff_time
         ).order_by("created_at", direction=firestore.Query.DESCENDING)
         
-        return [doc.to_dict() for doc in query.stream()]
+        messages = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["MESSAGES"], max(len(messages), 1))
+        return messages
 
+    @timed("firestore.messages.get_channel_messages")
     def get_channel_messages(self, channel_id, hours=24):
         """Get messages from a specific channel in the last 24 hours"""
         cutoff_time = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        if local_store.covers(cutoff_time):
+            return local_store.channel_messages(channel_id, cutoff_time)
         
         query = self.messages_collection.where(
             "channel_id", "==", channel_id
@@ -63,11 +86,16 @@ class MessageService:
             "created_at", ">=", cutoff_time
         ).order_by("created_at", direction=firestore.Query.DESCENDING)
         
-        return [doc.to_dict() for doc in query.stream()]
+        messages = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["MESSAGES"], max(len(messages), 1))
+        return messages
 
+    @timed("firestore.messages.get_received_dms")
     def get_received_dms(self, user_id, hours=24):
         """Get DMs received by a user in the last 24 hours"""
         cutoff_time = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        if local_store.covers(cutoff_time):
+            return local_store.received_dms(user_id, cutoff_time)
         query = self.messages_collection.where(
             "recipient_id", "==", user_id
         ).where(
@@ -75,7 +103,9 @@ class MessageService:
         ).where(
             "created_at", ">=", cutoff_time
         ).order_by("created_at", direction=firestore.Query.DESCENDING)
-        return [doc.to_dict() for doc in query.stream()]
+        messages = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["MESSAGES"], max(len(messages), 1))
+        return messages
 
     def _determine_message_type(self, message_data):
         """Determine the type of message"""
@@ -0,0 +1,327 @@
+import bisect
+import math
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span prefixes that are treated as calls to an external dependency
+EXTERNAL_DEPENDENCIES = ("slack", "openai", "firestore")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _rank(count, p):
+    """1-based nearest rank of percentile ``p`` (0-100) among ``count`` values"""
+    return min(count, max(1, math.ceil(count * p / 100.0)))
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile (0-100) of a list of numbers, or None if it is empty"""
+    if not samples:
+        return None
+    return sorted(samples)[_rank(len(samples), p) - 1]
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# --- METRIC CHILDREN ---
+class CounterChild:
+    """A single labelled counter value"""
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class GaugeChild:
+    """A single labelled gauge value, optionally read from a callback"""
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class HistogramChild:
+    """Fixed-bucket histogram safe to update from many threads"""
+    __slots__ = ("buckets", "counts", "count", "total", "_lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def percentile(self, p):
+        """Estimate a percentile (0-100) as the upper bound of its bucket"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return None
+        target = _rank(count, p)
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.total,
+                "buckets": dict(zip(self.buckets + (float("inf"),), self.counts))
+            }
+
+
+# --- METRIC FAMILIES ---
+class _Family:
+    type_name = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values, **labelvalues):
+        """Get the child for a set of label values (cached after first use).
+
+        Values are given in ``labelnames`` order or by name; either way the
+        child is keyed by the string values in declared order, so
+        ``labels("a", 1)`` and ``labels(x=1, name="a")`` share one series.
+        """
+        if labelvalues:
+            if values or set(labelvalues) != set(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            values = tuple(labelvalues[name] for name in self.labelnames)
+        elif len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(value if isinstance(value, str) else str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self):
+        return list(self._children.items())
+
+
+class Counter(_Family):
+    type_name = "counter"
+    child_class = CounterChild
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def render(self):
+        for values, child in self.children():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Family):
+    type_name = "gauge"
+    child_class = GaugeChild
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def set_function(self, function):
+        self._children[()].set_function(function)
+
+    def render(self):
+        for values, child in self.children():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class Histogram(_Family):
+    type_name = "histogram"
+    child_class = HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def render(self):
+        for values, child in self.children():
+            snapshot = child.snapshot()
+            cumulative = 0
+            for bound, count in snapshot["buckets"].items():
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(snapshot['sum'])}"
+            yield f"{self.name}_count{labels} {snapshot['count']}"
+
+
+class Registry:
+    """Collection of metric families rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def register(self, family):
+        with self._lock:
+            existing = self._families.get(family.name)
+            if existing is not None:
+                return existing
+            self._families[family.name] = family
+            return family
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._families.get(name)
+
+    def render(self):
+        lines = []
+        for family in list(self._families.values()):
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.type_name}")
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- STANDARD METRICS ---
+EVENTS_TOTAL = REGISTRY.counter(
+    "pulse_slack_events_total", "Slack requests received by the Bolt app", ("type",)
+)
+COMMAND_SECONDS = REGISTRY.histogram(
+    "pulse_command_duration_seconds", "Latency of /pulse subcommands", ("subcommand",)
+)
+EXTERNAL_CALLS_TOTAL = REGISTRY.counter(
+    "pulse_external_calls_total", "Calls to Slack, OpenAI and Firestore", ("dependency", "operation", "status")
+)
+EXTERNAL_CALL_SECONDS = REGISTRY.histogram(
+    "pulse_external_call_duration_seconds", "Latency of calls to Slack, OpenAI and Firestore", ("dependency", "operation")
+)
+SPAN_SECONDS = REGISTRY.histogram(
+    "pulse_span_duration_seconds", "Latency of internal timed sections", ("span",)
+)
+OPENAI_TOKENS_TOTAL = REGISTRY.counter(
+    "pulse_openai_tokens_total", "OpenAI tokens reported in the usage field", ("model", "kind")
+)
+FIRESTORE_DOCUMENTS_TOTAL = REGISTRY.counter(
+    "pulse_firestore_documents_total", "Firestore documents read or written", ("op", "collection")
+)
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "pulse_cache_requests_total", "Cache lookups by result", ("cache", "result")
+)
+UPDATE_FIRST_CONTENT_SECONDS = REGISTRY.histogram(
+    "pulse_update_first_content_seconds", "Time from a /pulse update request to its first finished summary"
+)
+
+
+def record_call(name, seconds, status="ok"):
+    """Record a timed span, splitting "dependency.operation" names for external calls"""
+    dependency, _, operation = name.partition(".")
+    if dependency in EXTERNAL_DEPENDENCIES:
+        EXTERNAL_CALLS_TOTAL.labels(dependency, operation, status).inc()
+        EXTERNAL_CALL_SECONDS.labels(dependency, operation).observe(seconds)
+    else:
+        SPAN_SECONDS.labels(name).observe(seconds)
+
+
+def record_openai_usage(model, response):
+    """Count prompt and completion tokens from an OpenAI response's usage field"""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+        if value:
+            OPENAI_TOKENS_TOTAL.labels(model, kind.replace("_tokens", "")).inc(value)
+
+
+def record_reads(collection, count=1):
+    """Count Firestore document reads"""
+    FIRESTORE_DOCUMENTS_TOTAL.labels("read", collection).inc(count)
+    return count
+
+
+def record_writes(collection, count=1):
+    """Count Firestore document writes"""
+    FIRESTORE_DOCUMENTS_TOTAL.labels("write", collection).inc(count)
+    return count
+
+
+def record_cache(cache, hit):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS_TOTAL.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render():
+    """Render every registered metric in the Prometheus text format"""
+    return REGISTRY.render()
@@ -0,0 +1,56 @@
+"""Choosing how much model a summary needs.
+
+Every summary is routed to one of three tiers by the size of its window
+and how many high-signal terms (incidents, blockers, decisions) it holds:
+
+- ``extractive``: at most ``CASCADE_EXTRACTIVE_MAX_MESSAGES`` short,
+  routine messages are shown verbatim, with no LLM call.
+- ``small``: ``CASCADE_SMALL_MODEL``, for everything in between.
+- ``large``: ``CASCADE_LARGE_MODEL``, only for windows of at least
+  ``CASCADE_LARGE_MIN_MESSAGES`` messages or ``CASCADE_LARGE_MIN_CHARS``
+  characters, or with ``CASCADE_LARGE_MIN_SIGNALS`` high-signal messages.
+
+Each decision is logged as ``summary.route`` with the numbers behind it,
+for tuning the thresholds.
+"""
+import re
+from collections import namedtuple
+from config import (
+    CASCADE_SMALL_MODEL, CASCADE_LARGE_MODEL, CASCADE_EXTRACTIVE_MAX_MESSAGES, CASCADE_EXTRACTIVE_MAX_CHARS,
+    CASCADE_LARGE_MIN_MESSAGES, CASCADE_LARGE_MIN_CHARS, CASCADE_LARGE_MIN_SIGNALS, CASCADE_HIGH_SIGNAL_TERMS
+)
+from src.metrics import REGISTRY
+from src.telemetry import get_logger
+
+log = get_logger("pulse.model_cascade")
+
+SUMMARY_ROUTES_TOTAL = REGISTRY.counter(
+    "pulse_summary_routes_total", "Summaries by cascade tier", ("purpose", "tier")
+)
+
+HIGH_SIGNAL = re.compile(r"\b(" + "|".join(re.escape(term) for term in CASCADE_HIGH_SIGNAL_TERMS) + r")\b", re.IGNORECASE)
+
+Route = namedtuple("Route", "tier model reason")
+
+
+def route(texts, purpose, **fields):
+    """The tier (and model, None for extractive) for summarizing ``texts``"""
+    count = len(texts)
+    chars = sum(len(text or "") for text in texts)
+    signals = sum(1 for text in texts if text and HIGH_SIGNAL.search(text))
+    if count >= CASCADE_LARGE_MIN_MESSAGES:
+        tier, reason = "large", "messages"
+    elif chars >= CASCADE_LARGE_MIN_CHARS:
+        tier, reason = "large", "chars"
+    elif signals >= CASCADE_LARGE_MIN_SIGNALS:
+        tier, reason = "large", "signals"
+    elif count <= CASCADE_EXTRACTIVE_MAX_MESSAGES and not signals \
+            and all(len(text or "") <= CASCADE_EXTRACTIVE_MAX_CHARS for text in texts):
+        tier, reason = "extractive", "trivial"
+    else:
+        tier, reason = "small", "default"
+    model = {"small": CASCADE_SMALL_MODEL, "large": CASCADE_LARGE_MODEL}.get(tier)
+    SUMMARY_ROUTES_TOTAL.labels(purpose, tier).inc()
+    log.info("summary.route", purpose=purpose, tier=tier, reason=reason, model=model,
+             messages=count, chars=chars, signals=signals, **fields)
+    return Route(tier, model, reason)
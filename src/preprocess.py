@@ -0,0 +1,248 @@
+"""Shrinking Slack messages before they go into a summary prompt.
+
+Each message goes through up to three steps, cheapest first:
+
+1. ``normalize``: Slack markup becomes plain text. User mentions become
+   ``@name`` (looked up in ``user_directory``), channel mentions become
+   ``#name``, links become their label or a short host/path, and
+   ``:emoji:`` codes, emoji characters and bold/italic/strike markers are
+   dropped. Emoji that carry meaning (``PREPROCESS_KEPT_EMOJI``: ✅, ❌,
+   ⚠, 🚨 and the like) are kept as a single character.
+2. ``truncate``: code blocks and pasted logs longer than
+   ``PREPROCESS_MAX_LINES`` keep only their first and last lines, each
+   cut to ``PREPROCESS_MAX_LINE_CHARS``.
+3. ``condense`` (``PREPROCESS_EXTRACTIVE_RANKING``): messages still
+   longer than ``PREPROCESS_RANK_MIN_CHARS`` keep only their most salient
+   sentences. A sentence's salience is the TF-IDF similarity of its
+   terms to the whole window; sentences with a high-signal term
+   (``CASCADE_HIGH_SIGNAL_TERMS``) are kept first.
+
+Messages with nothing left (a lone emoji, say) are dropped.
+"""
+import html
+import math
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from config import (
+    PREPROCESS_MAX_LINES, PREPROCESS_HEAD_LINES, PREPROCESS_TAIL_LINES, PREPROCESS_MAX_LINE_CHARS,
+    PREPROCESS_EXTRACTIVE_RANKING, PREPROCESS_RANK_MIN_CHARS, PREPROCESS_RANK_KEEP_RATIO, USER_DIRECTORY_TTL_SECONDS,
+    USER_DIRECTORY_MISS_TTL_SECONDS, PREPROCESS_KEPT_EMOJI
+)
+from src.local_store import local_store
+from src.metrics import REGISTRY
+from src.model_cascade import HIGH_SIGNAL
+
+PROMPT_CHARS_TOTAL = REGISTRY.counter(
+    "pulse_prompt_chars_total", "Message characters before and after prompt preprocessing", ("stage",)
+)
+
+USER_MENTION = re.compile(r"<@([UW][A-Z0-9]+)(?:\|([^>]*))?>")
+CHANNEL_MENTION = re.compile(r"<#(C[A-Z0-9]+)(?:\|([^>]*))?>")
+SUBTEAM_MENTION = re.compile(r"<!subteam\^[A-Z0-9]+(?:\|@?([^>]*))?>")
+SPECIAL_MENTION = re.compile(r"<!(here|channel|everyone)(?:\|[^>]*)?>")
+DATE = re.compile(r"<!date\^[^|>]*\|([^>]*)>")
+LINK = re.compile(r"<((?:https?|mailto|ftp):[^|>]+)(?:\|([^>]*))?>")
+EMOJI_CODE = re.compile(r"(?<!\w):([a-z0-9_+\-']+):(?::skin-tone-\d:)?(?!\w)")
+EMOJI_CHARACTER = re.compile("[\U0001F000-\U0001FAFF☀-➿⬀-⯿️‍]")
+KEPT_EMOJI_CHARACTERS = frozenset(PREPROCESS_KEPT_EMOJI.values())
+EMPHASIS = re.compile(r"(?<![\w*_~])([*_~])(?=\S)([^*_~\n]+?)(?<=\S)\1(?![\w*_~])")
+CODE_FENCE = re.compile(r"```(.*?)```", re.S)
+SPACES = re.compile(r"[ \t]+")
+BLANK_LINES = re.compile(r"\n{3,}")
+SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+TERM = re.compile(r"[a-z][a-z0-9_]+")
+
+
+class UserDirectory:
+    """Display names by user ID, shared by every request for ``ttl`` seconds.
+
+    With the local store enabled, names are also shared with the other
+    workers on the host, so each name is looked up once per host rather
+    than once per process. A failed lookup (unknown user, Slack error) is
+    remembered for ``miss_ttl`` seconds so it isn't retried for every
+    message that user wrote.
+    """
+
+    def __init__(self, ttl=USER_DIRECTORY_TTL_SECONDS, miss_ttl=USER_DIRECTORY_MISS_TTL_SECONDS, store=local_store):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.store = store
+        self._names = {}
+        self._misses = {}  # user ID -> when a failed lookup may be retried
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._names.get(user_id)
+        if entry is not None and entry[0] >= time.monotonic():
+            return entry[1]
+        shared = self.store.get_name(user_id)
+        if shared is None:
+            return None
+        name, fetched_at = shared
+        with self._lock:
+            self._names[user_id] = (time.monotonic() + self.ttl - (time.time() - fetched_at), name)
+        return name
+
+    def put(self, user_id, name):
+        with self._lock:
+            self._names[user_id] = (time.monotonic() + self.ttl, name)
+            self._misses.pop(user_id, None)
+        self.store.put_name(user_id, name)
+
+    def missed(self, user_id):
+        """Whether a lookup of ``user_id`` failed in the last ``miss_ttl`` seconds"""
+        retry_at = self._misses.get(user_id)
+        return retry_at is not None and retry_at > time.monotonic()
+
+    def put_miss(self, user_id):
+        with self._lock:
+            self._misses[user_id] = time.monotonic() + self.miss_ttl
+
+
+user_directory = UserDirectory()
+
+
+def mentioned_users(texts):
+    """IDs of users mentioned without a label in any of ``texts``"""
+    return {user_id for text in texts for user_id, label in USER_MENTION.findall(text or "") if not label}
+
+
+def _short_link(url, label):
+    if label:
+        return label
+    if url.startswith("mailto:"):
+        return url[len("mailto:"):]
+    parts = urlsplit(url)
+    path = parts.path if len(parts.path) <= 40 else parts.path[:40] + "…"
+    return parts.netloc + path.rstrip("/")
+
+
+def normalize(text, lookup=None):
+    """Plain text for a Slack mrkdwn message; ``lookup(user_id)`` names unlabelled mentions"""
+    lookup = lookup or user_directory.get
+
+    def user(match):
+        user_id, label = match.groups()
+        return "@" + (label or lookup(user_id) or user_id)
+
+    # Code is kept verbatim; only the prose around it is normalized
+    pieces = CODE_FENCE.split(text)
+    for i in range(0, len(pieces), 2):
+        piece = USER_MENTION.sub(user, pieces[i])
+        piece = CHANNEL_MENTION.sub(lambda m: "#" + (m.group(2) or m.group(1)), piece)
+        piece = SUBTEAM_MENTION.sub(lambda m: "@" + (m.group(1) or "team"), piece)
+        piece = SPECIAL_MENTION.sub(lambda m: "@" + m.group(1), piece)
+        piece = DATE.sub(lambda m: m.group(1), piece)
+        piece = LINK.sub(lambda m: _short_link(*m.groups()), piece)
+        piece = EMOJI_CODE.sub(lambda m: PREPROCESS_KEPT_EMOJI.get(m.group(1), ""), piece)
+        piece = EMOJI_CHARACTER.sub(lambda m: m.group(0) if m.group(0) in KEPT_EMOJI_CHARACTERS else "", piece)
+        piece = EMPHASIS.sub(r"\2", piece)
+        pieces[i] = html.unescape(piece)
+    for i in range(1, len(pieces), 2):
+        pieces[i] = "```" + html.unescape(pieces[i]) + "```"
+    text = "".join(pieces)
+    text = SPACES.sub(" ", text)
+    return BLANK_LINES.sub("\n\n", "\n".join(line.strip() for line in text.splitlines())).strip()
+
+
+def _head_tail(lines, max_lines=PREPROCESS_MAX_LINES, head=PREPROCESS_HEAD_LINES, tail=PREPROCESS_TAIL_LINES):
+    lines = [line if len(line) <= PREPROCESS_MAX_LINE_CHARS else line[:PREPROCESS_MAX_LINE_CHARS] + "…"
+             for line in lines]
+    if len(lines) <= max_lines:
+        return lines
+    return lines[:head] + [f"[… {len(lines) - head - tail} lines omitted …]"] + lines[-tail:]
+
+
+def truncate(text):
+    """Keep the head and tail of long code blocks and pasted logs"""
+    def block(match):
+        return "```\n" + "\n".join(_head_tail(match.group(1).strip("\n").splitlines())) + "\n```"
+    text = CODE_FENCE.sub(block, text)
+    # Logs pasted without a code fence show up as a message with many lines;
+    # long prose is left to condense()
+    lines = text.splitlines()
+    return "\n".join(_head_tail(lines)) if len(lines) > PREPROCESS_MAX_LINES else text
+
+
+def _sentences(text):
+    return [sentence.strip() for sentence in SENTENCE.split(text) if sentence.strip()]
+
+
+def condense(texts, min_chars=PREPROCESS_RANK_MIN_CHARS, keep_ratio=PREPROCESS_RANK_KEEP_RATIO):
+    """Cut messages longer than ``min_chars`` down to their most salient sentences.
+
+    Sentences are weighted by TF-IDF over every sentence in the window and
+    scored by cosine similarity to the window's overall term vector, so
+    sentences about what the window is discussing outrank asides. Kept
+    sentences stay in their original order.
+    """
+    long = [i for i, text in enumerate(texts) if len(text) > min_chars and "```" not in text]
+    if not long:
+        return list(texts)
+    window = [_sentences(text) for text in texts]
+    counts = [[Counter(TERM.findall(sentence.lower())) for sentence in sentences] for sentences in window]
+    document_frequency = Counter(term for message in counts for sentence in message for term in sentence)
+    total = sum(len(message) for message in counts) or 1
+    idf = {term: math.log(1 + total / df) for term, df in document_frequency.items()}
+    centroid = Counter()
+    for message in counts:
+        for sentence in message:
+            for term, count in sentence.items():
+                centroid[term] += count * idf[term]
+    centroid_norm = math.sqrt(sum(value * value for value in centroid.values())) or 1.0
+
+    condensed = list(texts)
+    for i in long:
+        scores = []
+        for sentence in counts[i]:
+            weights = {term: count * idf[term] for term, count in sentence.items()}
+            norm = math.sqrt(sum(value * value for value in weights.values())) or 1.0
+            scores.append(sum(weight * centroid[term] for term, weight in weights.items()) / (norm * centroid_norm))
+        # The opening sentence usually says what the message is about, and
+        # blockers, decisions and incidents are kept whatever the window is about
+        if scores:
+            scores[0] += 0.1
+        for j, sentence in enumerate(window[i]):
+            if HIGH_SIGNAL.search(sentence):
+                scores[j] += 1.0
+        budget = int(len(texts[i]) * keep_ratio)
+        kept, used = set(), 0
+        for j in sorted(range(len(scores)), key=lambda j: -scores[j]):
+            if kept and used + len(window[i][j]) > budget:
+                continue
+            kept.add(j)
+            used += len(window[i][j])
+        if len(kept) < len(window[i]):
+            condensed[i] = " … ".join(window[i][j] for j in sorted(kept))
+    return condensed
+
+
+def prepare_texts(texts, lookup=None, rank=PREPROCESS_EXTRACTIVE_RANKING):
+    """Run every step over a window of message texts (empty results stay empty)"""
+    prepared = [truncate(normalize(text or "", lookup)) for text in texts]
+    if rank:
+        prepared = condense(prepared)
+    PROMPT_CHARS_TOTAL.labels("raw").inc(sum(len(text or "") for text in texts))
+    PROMPT_CHARS_TOTAL.labels("prepared").inc(sum(len(text) for text in prepared))
+    return prepared
+
+
+def prepare_messages(messages, lookup=None, rank=PREPROCESS_EXTRACTIVE_RANKING, key="text"):
+    """Copies of message dicts with preprocessed text, without those left empty"""
+    texts = prepare_texts([message.get(key) for message in messages], lookup, rank)
+    return [dict(message, **{key: text}) for message, text in zip(messages, texts) if text]
+
+
+def prepare_conversations(dm_data, lookup=None, rank=PREPROCESS_EXTRACTIVE_RANKING):
+    """Copies of DM conversations with every entry of their ``messages`` preprocessed"""
+    texts = prepare_texts([text for dm in dm_data for text in dm["messages"]], lookup, rank)
+    prepared, start = [], 0
+    for dm in dm_data:
+        messages = [text for text in texts[start:start + len(dm["messages"])] if text]
+        start += len(dm["messages"])
+        if messages:
+            prepared.append(dict(dm, messages=messages))
+    return prepared
@@ -0,0 +1,105 @@
+"""Deciding when to pre-compute a user's /pulse update digest.
+
+Each /pulse update request time is kept on the user's profile
+(``update_history``, epoch seconds). The typical request time is the
+circular mean of those times of day (UTC), so 23:50 and 00:10 average to
+midnight rather than noon. A user whose requests are scattered across the
+day has no typical time and is not pre-warmed. Users with no history fall
+back to the time of day they were last active.
+
+Cached digests carry a ``watermark``: the time their Slack data was read.
+Serving a cached digest only regenerates channels (and DMs) with messages
+newer than the watermark.
+"""
+import math
+import time
+from datetime import datetime, timezone
+from config import (
+    PREWARM_LEAD_MINUTES, PREWARM_ACTIVE_DAYS, PREWARM_HISTORY_SIZE, PREWARM_MIN_CONCENTRATION,
+    DIGEST_MAX_AGE_HOURS
+)
+from src.pulse_content import is_summary_error
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def record_request(history, now=None, size=PREWARM_HISTORY_SIZE):
+    """Append a request time to ``history``, keeping the most recent ``size``"""
+    return (list(history or []) + [now if now is not None else time.time()])[-size:]
+
+
+def _epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _minute_of_day(epoch):
+    moment = datetime.fromtimestamp(epoch, timezone.utc)
+    return moment.hour * 60 + moment.minute
+
+
+def typical_request_minute(history, last_active=None, min_concentration=PREWARM_MIN_CONCENTRATION):
+    """Predicted minute of the day (UTC) a user asks for their update, or None"""
+    times = [_epoch(value) for value in history or []]
+    if not times:
+        last_active = _epoch(last_active)
+        return _minute_of_day(last_active) if last_active else None
+
+    angles = [_minute_of_day(epoch) / MINUTES_PER_DAY * 2 * math.pi for epoch in times]
+    x = sum(math.cos(angle) for angle in angles) / len(angles)
+    y = sum(math.sin(angle) for angle in angles) / len(angles)
+    # Mean resultant length: 1 when every request is at the same time, near 0 when spread out
+    if math.hypot(x, y) < min_concentration:
+        return None
+    return int(round(math.atan2(y, x) / (2 * math.pi) * MINUTES_PER_DAY)) % MINUTES_PER_DAY
+
+
+def is_active(profile, now=None, active_days=PREWARM_ACTIVE_DAYS):
+    last_active = _epoch(profile.get("last_active"))
+    if last_active is None:
+        return False
+    now = now if now is not None else time.time()
+    return now - last_active <= active_days * 86400
+
+
+def due_for_prewarm(profile, now=None, lead_minutes=PREWARM_LEAD_MINUTES):
+    """Whether the user's predicted request time is within the next ``lead_minutes``"""
+    now = now if now is not None else time.time()
+    if profile.get("muted") or not profile.get("tracked_channels") or not is_active(profile, now):
+        return False
+    minute = typical_request_minute(profile.get("update_history"), profile.get("last_active"))
+    if minute is None:
+        return False
+    minutes_until = (minute - _minute_of_day(now)) % MINUTES_PER_DAY
+    return 0 < minutes_until <= lead_minutes
+
+
+def recently_built(digest, now=None, lead_minutes=PREWARM_LEAD_MINUTES):
+    """Whether a digest was already built during the current pre-warm window"""
+    now = now if now is not None else time.time()
+    return bool(digest and digest.get("watermark") and now - digest["watermark"] <= lead_minutes * 60)
+
+
+def is_fresh(digest, tracked_channels, now=None, max_age_hours=DIGEST_MAX_AGE_HOURS):
+    """Whether a cached digest can be served (and refreshed incrementally)"""
+    if not digest or not digest.get("watermark"):
+        return False
+    now = now if now is not None else time.time()
+    if now - digest["watermark"] > max_age_hours * 3600:
+        return False
+    return any(name in digest.get("channels", {}) for name in tracked_channels)
+
+
+def digest_document(channel_summaries, dm_summary, watermark):
+    """Firestore document for a cached digest; failed summaries are left out so they are retried"""
+    return {
+        "channels": {name: summary for name, summary in channel_summaries.items() if not is_summary_error(summary)},
+        "dm_summary": None if is_summary_error(dm_summary) else dm_summary,
+        "watermark": watermark,
+        "generated_at": datetime.now(timezone.utc)
+    }
@@ -0,0 +1,197 @@
+import threading
+import time
+from config import PULSE_UPDATE_MIN_INTERVAL_SECONDS, SLACK_MAX_BLOCKS_PER_MESSAGE, SLACK_MAX_SECTION_CHARS
+from src.telemetry import get_logger
+
+log = get_logger("pulse.progressive")
+
+
+def split_text(text, limit=SLACK_MAX_SECTION_CHARS):
+    """Split text into chunks of at most ``limit`` characters, preferring paragraph then line breaks"""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip("\n")
+    chunks.append(text)
+    return chunks
+
+
+def paginate_blocks(blocks, max_blocks=SLACK_MAX_BLOCKS_PER_MESSAGE, max_section_chars=SLACK_MAX_SECTION_CHARS):
+    """Split Block Kit blocks into messages Slack will accept.
+
+    Section text over Slack's per-section limit becomes several sections,
+    and pages break only between blocks, never inside a section. A page
+    never starts with a divider.
+    """
+    expanded = []
+    for block in blocks:
+        text = block.get("text", {}).get("text") if block.get("type") == "section" else None
+        if text is None or len(text) <= max_section_chars:
+            expanded.append(block)
+            continue
+        for chunk in split_text(text, max_section_chars):
+            expanded.append(dict(block, text=dict(block["text"], text=chunk)))
+
+    pages = [[]]
+    for block in expanded:
+        if len(pages[-1]) >= max_blocks:
+            pages.append([])
+        if not pages[-1] and block.get("type") == "divider" and len(pages) > 1:
+            continue
+        pages[-1].append(block)
+    return pages
+
+
+class ProgressiveMessage:
+    """A Slack message that is posted as a placeholder and edited as its parts finish.
+
+    ``render`` turns the current ``parts`` dict into Block Kit blocks. Each
+    ``update`` re-renders and edits only the pages whose blocks changed,
+    posting extra pages as new messages when the content outgrows one.
+    Final updates are always sent. Partial ones (streamed text) are dropped
+    if another flush is in progress or the last one was under
+    ``min_interval`` seconds ago. Safe to call from several threads.
+    """
+
+    def __init__(self, client, channel, render, text, min_interval=PULSE_UPDATE_MIN_INTERVAL_SECONDS):
+        self.client = client
+        self.channel = channel
+        self.render = render
+        self.text = text
+        self.min_interval = min_interval
+        self.parts = {}
+        self.posted = []  # (ts, blocks) for each page already in Slack
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, parts):
+        """Post the placeholder; returns False if the message could not be posted"""
+        self.parts = dict(parts)
+        return self.flush()
+
+    def update(self, key, value, final=True):
+        self.parts[key] = value
+        return self.flush(force=final)
+
+    def _due(self, force):
+        return force or time.monotonic() - self._last_flush >= self.min_interval
+
+    def _changes(self):
+        """Pages to edit or post: list of (index, ts or None, blocks)"""
+        changes = []
+        for index, page in enumerate(paginate_blocks(self.render(self.parts))):
+            if index < len(self.posted):
+                if self.posted[index][1] != page:
+                    changes.append((index, self.posted[index][0], page))
+            else:
+                changes.append((index, None, page))
+        return changes
+
+    def _applied(self, index, ts, page, result):
+        if not result.get("ok"):
+            log.warning("progressive.flush_failed", channel=self.channel, page=index, error=result.get("error"))
+            return False
+        if ts is None:
+            # Posting to a user ID opens the DM; edits need the conversation ID
+            self.channel = result["channel"]
+            self.posted.append((result["ts"], page))
+        else:
+            self.posted[index] = (ts, page)
+        return True
+
+    def flush(self, force=True):
+        """Send changed pages to Slack; returns False if a page could not be sent"""
+        if not self._lock.acquire(blocking=force):
+            return True
+        try:
+            if not self._due(force):
+                return True
+            self._last_flush = time.monotonic()
+            for index, ts, page in self._changes():
+                if ts is None:
+                    result = self.client.chat_postMessage(channel=self.channel, blocks=page, text=self.text)
+                else:
+                    result = self.client.chat_update(channel=self.channel, ts=ts, blocks=page, text=self.text)
+                if not self._applied(index, ts, page, result):
+                    return False
+            return True
+        finally:
+            self._lock.release()
+
+
+class AsyncProgressiveMessage(ProgressiveMessage):
+    """``ProgressiveMessage`` for an async Slack client; ``start``, ``update`` and ``flush`` are coroutines"""
+
+    def __init__(self, client, channel, render, text, min_interval=PULSE_UPDATE_MIN_INTERVAL_SECONDS):
+        super().__init__(client, channel, render, text, min_interval)
+        self._flushing = False
+        self._dirty = False
+
+    async def start(self, parts):
+        self.parts = dict(parts)
+        return await self.flush()
+
+    async def update(self, key, value, final=True):
+        self.parts[key] = value
+        return await self.flush(force=final)
+
+    async def flush(self, force=True):
+        # One coroutine sends at a time; a final update arriving meanwhile is
+        # picked up by the sender's next pass instead of racing it
+        if self._flushing:
+            self._dirty = self._dirty or force
+            return True
+        if not self._due(force):
+            return True
+        self._flushing = True
+        try:
+            while True:
+                self._dirty = False
+                self._last_flush = time.monotonic()
+                for index, ts, page in self._changes():
+                    if ts is None:
+                        result = await self.client.chat_postMessage(channel=self.channel, blocks=page, text=self.text)
+                    else:
+                        result = await self.client.chat_update(channel=self.channel, ts=ts, blocks=page, text=self.text)
+                    if not self._applied(index, ts, page, result):
+                        return False
+                if not self._dirty:
+                    return True
+        finally:
+            self._flushing = False
+
+
+def collect_stream(stream, on_text, on_first=None):
+    """Join streamed chat completion deltas, calling ``on_text`` with the text so far.
+
+    ``on_first`` is called once, when the first chunk arrives.
+    """
+    text = ""
+    for chunk in stream:
+        if on_first:
+            on_first()
+            on_first = None
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            text += delta
+            on_text(text)
+    return text.strip()
+
+
+async def collect_stream_async(stream, on_text, on_first=None):
+    """Async form of :func:`collect_stream`; ``on_text`` is awaited, ``on_first`` is not"""
+    text = ""
+    async for chunk in stream:
+        if on_first:
+            on_first()
+            on_first = None
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            text += delta
+            await on_text(text)
+    return text.strip()
@@ -0,0 +1,412 @@
+"""Text, prompts and Block Kit payloads shared by the sync and async bots.
+
+Nothing here touches the network, so app.py and app_async.py can render
+identical responses while making their Slack, Firestore and OpenAI calls
+in their own way.
+"""
+from datetime import datetime
+from config import (
+    PULSE_SUMMARY_MODEL, CHANNEL_SUMMARY_MAX_TOKENS, DM_SUMMARY_MAX_TOKENS, PULSE_SUMMARY_TEMPERATURE,
+    DEGRADED_SUMMARY_MESSAGES
+)
+from src.model_cascade import HIGH_SIGNAL
+from src.thread_grouping import group_threads, collapse_threads, format_thread_units
+from src.vector_index import repeat_note
+
+# Channel mapping based on role
+ROLE_CHANNEL_MAPPING = {
+    "software": ["software", "team"],
+    "mechanical": ["mechanical", "team"],
+    "electrical": ["electrical", "team"]
+}
+
+# Subcommands with their own latency histogram; anything else is bucketed as "unknown"
+PULSE_SUBCOMMANDS = {"", "setup", "help", "reset", "me", "update", "summary", "channels", "dms", "config", "profile", "search", "trends"}
+
+DIVIDER = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+CHANNEL_NOT_FOUND_TEXT = "⚠️ *Channel not found or bot not added to channel*"
+PENDING_TEXT = "⏳ _Summarizing…_"
+DM_SUMMARY_UNAVAILABLE = "DM summary unavailable"
+
+ROLE_OPTIONS = [
+    {"text": {"type": "plain_text", "text": "Software Engineering"}, "value": "software"},
+    {"text": {"type": "plain_text", "text": "Mechanical Engineering"}, "value": "mechanical"},
+    {"text": {"type": "plain_text", "text": "Electrical Engineering"}, "value": "electrical"}
+]
+
+def get_channels_for_role(role):
+    """Get the appropriate channels for a given role"""
+    return ROLE_CHANNEL_MAPPING.get(role, ["team"])
+
+def _now_line():
+    return f"*Last 24 hours • {datetime.now().strftime('%B %d, %Y at %H:%M')}*"
+
+# Summarization prompts
+
+def format_channel_message(msg, user_name):
+    """Shape a raw Slack message for the channel summary prompt"""
+    timestamp = datetime.fromtimestamp(float(msg["ts"]))
+    return {
+        "user": user_name,
+        "text": msg["text"],
+        "timestamp": timestamp.strftime("%m/%d %H:%M"),
+        "ts": msg["ts"],
+        "thread_ts": msg.get("thread_ts"),
+        "reply_count": msg.get("reply_count", 0)
+    }
+
+def format_dm_message(msg, user_id, other_name):
+    timestamp = datetime.fromtimestamp(float(msg["ts"]))
+    sender = "You" if msg.get("user") == user_id else other_name
+    return f"{sender} ({timestamp.strftime('%m/%d %H:%M')}): {msg['text']}"
+
+def channel_summary_request(channel_name, messages, model=PULSE_SUMMARY_MODEL):
+    """Keyword arguments for the chat completion summarizing one channel; repeated posts are already collapsed"""
+    # Group replies under their parents and keep the 30 most recently active threads
+    threads = collapse_threads(group_threads(messages)[-30:])
+    message_text = format_thread_units(
+        threads, lambda msg: f"[{msg['timestamp']}] {msg['user']}: {msg['text']}{repeat_note(msg)}"
+    )
+
+    prompt = f"""Analyze the following Slack channel activity from #{channel_name} and provide a concise summary.
+Replies are indented under the message that started their thread.
+
+{message_text}
+
+Please provide:
+1. Key topics/themes discussed
+2. Important decisions or action items
+3. Notable updates or blockers
+4. Overall sentiment/energy
+
+Keep it concise but informative, using clean formatting with bullet points or short paragraphs. Focus on actionable insights."""
+
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that summarizes Slack channel activity for team members."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": CHANNEL_SUMMARY_MAX_TOKENS,
+        "temperature": PULSE_SUMMARY_TEMPERATURE
+    }
+
+def summarized_dms(dm_data):
+    """The conversations and messages a DM summary covers: (partner, messages) pairs"""
+    return [(dm['partner'], dm['messages'][-5:]) for dm in dm_data[:5]]  # Last 5 messages of the top 5 DMs
+
+def dm_summary_request(dm_data, model=PULSE_SUMMARY_MODEL):
+    """Keyword arguments for the chat completion summarizing a user's DMs"""
+    dm_text = ""
+    for partner, messages in summarized_dms(dm_data):
+        dm_text += f"\n--- Conversation with {partner} ---\n"
+        dm_text += "\n".join(messages)
+        dm_text += "\n"
+
+    prompt = f"""Analyze the following direct message conversations and provide a brief summary:
+
+{dm_text}
+
+Summarize:
+1. Key conversations and their topics
+2. Any action items or follow-ups needed
+3. Important updates from colleagues
+
+Keep it professional and concise."""
+
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that summarizes private conversations professionally."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": DM_SUMMARY_MAX_TOKENS,
+        "temperature": PULSE_SUMMARY_TEMPERATURE
+    }
+
+def extractive_channel_summary(messages):
+    """A few quiet messages, listed as they were posted instead of summarized"""
+    return "\n".join(f"• {msg['user']}: {msg['text']}{repeat_note(msg)}" for msg in messages)
+
+def extractive_dm_summary(dm_data):
+    """A few short DMs, listed per conversation instead of summarized"""
+    return "\n".join(
+        f"*{partner}*\n" + "\n".join(f"• {message}" for message in messages)
+        for partner, messages in summarized_dms(dm_data)
+    )
+
+def channel_summary_unavailable(channel_name, error):
+    return f"Summary unavailable for #{channel_name} (Error: {error})"
+
+DEGRADED_NOTE = "_⚠️ Live summaries are temporarily unavailable"
+
+def stale_summary(summary, saved_at):
+    """An earlier summary, served while a new one can't be generated"""
+    return f"{summary}\n{DEGRADED_NOTE}; this one is from {datetime.fromtimestamp(saved_at).strftime('%H:%M')}._"
+
+def degraded_channel_summary(messages, limit=DEGRADED_SUMMARY_MESSAGES):
+    """Key messages in place of a summary: high-signal ones first, then the latest"""
+    key = [i for i, msg in enumerate(messages) if HIGH_SIGNAL.search(msg["text"])][-limit:]
+    chosen = set(key)
+    latest = [i for i in range(len(messages)) if i not in chosen][-(limit - len(key)):] if len(key) < limit else []
+    shown = [messages[i] for i in sorted(key + latest)]
+    lines = [f"• {msg['user']}: {msg['text'] if len(msg['text']) <= 200 else msg['text'][:200] + '…'}"
+             for msg in shown]
+    more = len(messages) - len(shown)
+    return "\n".join(lines + ([f"_…and {more} more_"] if more else []) + [f"{DEGRADED_NOTE}; key messages shown._"])
+
+def degraded_dm_summary(dm_data):
+    """The latest DMs per conversation in place of a summary"""
+    return f"{extractive_dm_summary(dm_data)}\n{DEGRADED_NOTE}; latest messages shown._"
+
+def is_summary_error(summary):
+    """Whether a summary is an error placeholder or fallback rather than generated text"""
+    return not summary or summary == DM_SUMMARY_UNAVAILABLE or summary.startswith("Summary unavailable for #") \
+        or DEGRADED_NOTE in summary
+
+# Pulse update text
+
+def channel_section(channel_name, summary):
+    return f"📍 **#{channel_name}**\n{summary}\n"
+
+def format_channels_update(channel_summaries):
+    return f"""🏢 **Channel Activity Summary**
+{_now_line()}
+
+{DIVIDER}
+
+{chr(10).join(channel_summaries)}
+
+{DIVIDER}
+*💡 Use `/pulse update` for full report including DMs*"""
+
+def format_dms_update(dm_summary):
+    return f"""💬 **Direct Messages Summary**
+{_now_line()}
+
+{DIVIDER}
+
+{dm_summary}
+
+{DIVIDER}
+*💡 Use `/pulse update` for full report including channels*"""
+
+BUDGET_CACHED_TEXT = "⏳ You've reached today's summary budget, so here is your latest digest without new updates."
+
+SEARCH_USAGE_TEXT = "Usage: `/pulse search <words>`, e.g. `/pulse search battery thermal test`"
+SEARCH_INDEXING_TEXT = "⏳ The search index is still being built. Try again in a minute."
+
+def format_search_results(query, results, window_hours):
+    """``/pulse search`` response for ``(score, message)`` results, best first"""
+    if not results:
+        return f"🔍 No channel messages from the last {window_hours} hours match *{query}*."
+    lines = [f"🔍 *Top matches for* _{query}_ (last {window_hours} hours)", ""]
+    for score, message in results:
+        text = message["text"] if len(message["text"]) <= 200 else message["text"][:200] + "…"
+        when = ""
+        if message.get("timestamp"):
+            when = datetime.fromtimestamp(float(message["timestamp"])).strftime("%m/%d %H:%M") + " "
+        lines.append(f"• {when}<#{message['channel']}> <@{message['user']}>: {text}  _({score:.2f})_")
+    return "\n".join(lines)
+
+def format_trends(trends):
+    """``/pulse trends`` response for the latest trends document"""
+    if not trends:
+        return "📈 No trends yet. They are computed hourly from channel activity."
+    lines = ["📈 *Channel trends*", trends.get("summary", ""), ""]
+    for spike in trends.get("spikes", []):
+        lines.append(f"• <#{spike['channel']}>: {spike['messages']} messages, {spike['ratio']}x the usual {spike['baseline']}")
+    for swarm in trends.get("issue_swarms", []):
+        lines.append(f"• 🐝 Thread in <#{swarm['channel']}>: {swarm['participants']} people, {swarm['replies']} replies")
+    for thread in trends.get("active_threads", [])[:3]:
+        lines.append(f"• 💬 Thread in <#{thread['channel']}>: {thread['replies']} replies")
+    for pr in trends.get("top_prs", []):
+        lines.append(f"• 🔀 {pr['pr']}: linked {pr['mentions']} times")
+    return "\n".join(lines)
+
+def _section(text):
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+def _context(text):
+    return {"type": "context", "elements": [{"type": "mrkdwn", "text": text}]}
+
+def pulse_update_blocks(channel_summaries, dm_summary):
+    """Block Kit form of the pulse update, one section per channel.
+
+    ``channel_summaries`` maps channel name to its summary text in display
+    order; ``None`` (for a channel or the DM summary) renders a placeholder
+    so the layout stays fixed while results arrive.
+    """
+    blocks = [
+        {"type": "header", "text": {"type": "plain_text", "text": "📊 Your Pulse Update"}},
+        _context(_now_line()),
+        {"type": "divider"},
+        _section("🏢 *CHANNEL ACTIVITY*")
+    ]
+    for channel_name, summary in channel_summaries.items():
+        blocks.append(_section(f"📍 *#{channel_name}*\n{summary or PENDING_TEXT}"))
+    blocks += [
+        {"type": "divider"},
+        _section("💬 *DIRECT MESSAGES*"),
+        _section(dm_summary or PENDING_TEXT),
+        {"type": "divider"},
+        _context("💡 Use `/pulse channels` or `/pulse dms` for focused updates")
+    ]
+    return blocks
+
+# Profile text
+
+def _channel_list(tracked_channels):
+    return ', '.join(tracked_channels) if tracked_channels else 'None'
+
+def _hashed_channel_list(tracked_channels):
+    return ', '.join([f"#{channel}" for channel in tracked_channels])
+
+def pulse_profile_text(profile):
+    """Default `/pulse` response"""
+    tracked_channels = profile.get('tracked_channels', [])
+    channel_list = _hashed_channel_list(tracked_channels) if tracked_channels else 'None'
+    return f"""📊 *Your Pulse Profile*
+
+👤 **Personal Info**
+• Name: {profile.get('real_name', 'Not set')}
+• Role: {profile.get('role', 'Not set')}
+• Setup: {'✅ Complete' if profile.get('onboarding_completed') else '❌ Incomplete'}
+
+📺 **Tracking**
+• Channels: {channel_list}
+• Messages Sent: {profile.get('message_count', 0)}
+• Last Active: {profile.get('last_active', 'Never')}
+
+⚙️ **Quick Actions**
+• `/pulse setup` - Update your profile
+• `/pulse config` - Change settings
+• `/pulse help` - View all commands"""
+
+def me_text(profile):
+    return f"""📊 *Your Profile*
+• Name: {profile.get('real_name', 'Not set')}
+• Role: {profile.get('role', 'Not set')}
+• Tracked Channels: {_channel_list(profile.get('tracked_channels', []))}
+• Messages: {profile.get('message_count', 0)}"""
+
+def profile_info_text(profile):
+    return f"""*👤 Profile Information*
+• Name: {profile.get('real_name', 'Not set')}
+• Role: {profile.get('role', 'Not set')}
+• Tracked Channels: {_channel_list(profile.get('tracked_channels', []))}
+• Total Messages: {profile.get('message_count', 0)}
+• Setup Complete: {'✅' if profile.get('onboarding_completed') else '❌'}"""
+
+def setup_complete_text(profile):
+    return f"""🎉 *Setup Complete!*
+
+Your profile is configured:
+• Role: {profile.get('role', 'Not set')}
+• Tracking: {_hashed_channel_list(profile.get('tracked_channels', []))}
+
+Try `/pulse` to see your profile!"""
+
+def role_set_text(role, tracked_channels, updated=False):
+    if updated:
+        return f"✅ Role updated to **{role}**\n📺 Now tracking: {_hashed_channel_list(tracked_channels)}"
+    return f"✅ Role set to **{role}**\n📺 You'll now track: {_hashed_channel_list(tracked_channels)}"
+
+def mention_reply_text(user_id):
+    return f"👋 Hi <@{user_id}>! Try `/pulse` to see your profile or `/pulse help` for commands."
+
+def get_help_text():
+    return """🚀 *Pulse Bot Commands*
+
+• `/pulse` - Your complete profile
+• `/pulse update` - AI-powered channel & DM summaries
+• `/pulse channels` - Channel activity only
+• `/pulse dms` - Direct message summaries only
+• `/pulse search <words>` - Find recent channel messages
+• `/pulse trends` - Busy channels, threads and PRs
+• `/pulse setup` - First-time setup
+• `/pulse config` - Manage settings
+• `/pulse help` - This help"""
+
+# Block Kit payloads
+
+def setup_blocks():
+    return [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": "🚀 Welcome to Pulse Bot!"}
+        },
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "*What's your engineering role?*"},
+            "accessory": {
+                "type": "static_select",
+                "placeholder": {"type": "plain_text", "text": "Select your role"},
+                "action_id": "setup_role",
+                "options": ROLE_OPTIONS
+            }
+        },
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "📺 *Channels you'll be tracking:*\n\n• Your role-specific channel\n• Team channel (for all engineering)"}
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": "Complete Setup"},
+                    "style": "primary",
+                    "action_id": "complete_setup"
+                }
+            ]
+        }
+    ]
+
+def config_blocks(profile):
+    return [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": "⚙️ Your Configuration"}
+        },
+        {
+            "type": "section",
+            "fields": [
+                {"type": "mrkdwn", "text": f"*Role:* {profile.get('role', 'Not set')}"},
+                {"type": "mrkdwn", "text": f"*Tracked Channels:* {_channel_list(profile.get('tracked_channels', []))}"}
+            ]
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": "Update Role"},
+                    "action_id": "config_role"
+                }
+            ]
+        }
+    ]
+
+def role_blocks():
+    return [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": "🔧 Update Your Role"}
+        },
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "*Select your engineering role:*"},
+            "accessory": {
+                "type": "static_select",
+                "placeholder": {"type": "plain_text", "text": "Choose your role"},
+                "action_id": "update_role",
+                "options": ROLE_OPTIONS
+            }
+        },
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "💡 *Note:* Changing your role will automatically update your tracked channels."}
+        }
+    ]
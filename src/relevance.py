@@ -0,0 +1,225 @@
+"""Ranking stored messages by how relevant they are to a user's interests.
+
+Messages are embedded once, when they are stored: ``embedding_queue``
+collects new message documents and writes ``embedding`` (plus the
+``embedding_model`` that produced it) back onto them in batches, off the
+ingest path. A user's interest profile is embedded once and cached on their
+interests document until their topics change. At digest time, scoring is a
+single matrix-vector product over the candidate messages, and
+``RelevanceEngine.rank_all`` scores every user against every message in one
+matrix product.
+
+Two models are available (``EMBEDDING_BACKEND``): a local hashing model that
+needs no network (the default), and OpenAI embeddings. The OpenAI model makes
+an embeddings call for every stored message; its tokens are charged to the
+token ledger as ``purpose="embedding"``.
+Vectors from different models are never compared. A message without a
+vector from the current model is embedded when it is ranked.
+"""
+import hashlib
+import re
+import numpy as np
+from google.cloud import firestore
+from config import (
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_HASH_DIMENSIONS, EMBEDDING_BATCH_SIZE, EMBEDDING_FLUSH_SECONDS,
+    EMBEDDING_QUEUE_SIZE, RELEVANCE_TOP_K, RELEVANCE_MIN_SCORE, COLLECTIONS
+)
+from src import token_budget
+from src.batch_queue import BatchQueue
+from src.dependencies import get_firestore, get_openai
+from src.metrics import REGISTRY, record_openai_usage, record_writes
+from src.telemetry import get_logger, timed
+
+log = get_logger("pulse.relevance")
+
+EMBEDDING_QUEUE_DROPPED_TOTAL = REGISTRY.counter(
+    "pulse_embedding_queue_dropped_total", "Stored messages not embedded at ingest because the queue was full"
+)
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(matrix):
+    """Scale each row to unit length (all-zero rows are left as zeros)"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores, k=RELEVANCE_TOP_K, min_score=RELEVANCE_MIN_SCORE):
+    """Indices of the ``k`` highest scores at or above ``min_score``, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [int(i) for i in ordered if scores[i] >= min_score]
+
+
+class HashingEmbedder:
+    """Local model: signed feature hashing of words and word pairs"""
+
+    def __init__(self, dimensions=EMBEDDING_HASH_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    @staticmethod
+    def _fold(word):
+        # Crude plural folding so "batteries" still matches an interest in "battery"
+        if len(word) > 4 and word.endswith("ies"):
+            return word[:-3] + "y"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            return word[:-1]
+        return word
+
+    def _features(self, text):
+        words = [self._fold(word) for word in WORD.findall(text.lower())]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text or ""):
+                value = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                matrix[row, value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        # Dampen repeated words so one long message cannot dominate on term count alone
+        return normalize(np.sign(matrix) * np.log1p(np.abs(matrix)))
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings, requested in batches of ``EMBEDDING_BATCH_SIZE``"""
+
+    def __init__(self, model=EMBEDDING_MODEL, client=None, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.client = client
+        self.batch_size = batch_size
+
+    @timed("openai.embeddings")
+    def embed(self, texts):
+        client = self.client or get_openai()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            # The API rejects empty strings
+            batch = [text or " " for text in texts[start:start + self.batch_size]]
+            response = client.embeddings.create(model=self.model, input=batch)
+            record_openai_usage(self.model, response)
+            token_budget.ledger.record(self.model, response.usage, purpose="embedding",
+                                       prompt_tokens=sum(map(token_budget.estimate_tokens, batch)))
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+_embedder = None
+
+
+def get_embedder():
+    """The process's embedding model, chosen by ``EMBEDDING_BACKEND``"""
+    global _embedder
+    if _embedder is None:
+        _embedder = HashingEmbedder() if EMBEDDING_BACKEND == "hashing" else OpenAIEmbedder()
+    return _embedder
+
+
+class EmbeddingQueue(BatchQueue):
+    """Embeds newly stored messages in the background, in batches.
+
+    ``submit`` never blocks the ingest path: when the queue is full the
+    message is skipped and embedded later, when it is first ranked. A batch
+    is embedded once it is full or ``flush_seconds`` after its first message,
+    then its vectors are written with one Firestore batch. Only the document
+    ID is kept, so documents added with the async Firestore client can be
+    queued too.
+    """
+
+    name = "embedding"
+
+    def __init__(self, embedder=None, db=None, batch_size=EMBEDDING_BATCH_SIZE,
+                 flush_seconds=EMBEDDING_FLUSH_SECONDS, maxsize=EMBEDDING_QUEUE_SIZE):
+        super().__init__(batch_size, flush_seconds, maxsize, dropped=EMBEDDING_QUEUE_DROPPED_TOTAL)
+        self.embedder = embedder
+        self.db = db
+
+    def submit(self, doc_ref, text):
+        """Queue a stored message document for embedding"""
+        if text:
+            self.put((doc_ref.id, text))
+
+    def flush(self, batch):
+        """Embed ``(doc_id, text)`` pairs and write the vectors back"""
+        embedder = self.embedder or get_embedder()
+        vectors = embedder.embed([text for _, text in batch])
+        db = self.db or get_firestore()
+        messages = db.collection(COLLECTIONS["MESSAGES"])
+        write = db.batch()
+        for (doc_id, _), vector in zip(batch, vectors):
+            write.update(messages.document(doc_id), {"embedding": vector.tolist(), "embedding_model": embedder.model,
+                                                     "updated_at": firestore.SERVER_TIMESTAMP})
+        write.commit()
+        record_writes(COLLECTIONS["MESSAGES"], len(batch))
+
+
+embedding_queue = EmbeddingQueue()
+
+
+class RelevanceEngine:
+    """Scores messages against users' interest profiles"""
+
+    def __init__(self, embedder=None):
+        self._embedder = embedder
+        self._profiles = {}  # user_id -> (model, topics, vector)
+
+    @property
+    def embedder(self):
+        return self._embedder or get_embedder()
+
+    def profile_vector(self, user_id, interests, store=None):
+        """Unit vector for a user's interest topics.
+
+        Reuses the vector cached in memory or on the interests document
+        while the topics and model are unchanged; otherwise embeds the
+        topics and passes the new fields to ``store(user_id, fields)``.
+        """
+        model = self.embedder.model
+        topics = sorted(interests.get("topics", []))
+        cached = self._profiles.get(user_id)
+        if cached and cached[:2] == (model, topics):
+            return cached[2]
+
+        if interests.get("embedding_model") == model and interests.get("embedded_topics") == topics:
+            vector = np.asarray(interests["embedding"], dtype=np.float32)
+        else:
+            vector = self.embedder.embed([", ".join(topics)])[0]
+            if store:
+                try:
+                    store(user_id, {"embedding": vector.tolist(), "embedding_model": model, "embedded_topics": topics})
+                except Exception as e:
+                    log.warning("relevance.profile_store_error", user=user_id, error=str(e))
+        self._profiles[user_id] = (model, topics, vector)
+        return vector
+
+    def message_matrix(self, messages):
+        """Unit vectors for messages (rows), embedding any stored without one in one batch"""
+        model = self.embedder.model
+        rows = [m.get("embedding") if m.get("embedding_model") == model else None for m in messages]
+        missing = [i for i, row in enumerate(rows) if not row]
+        if missing:
+            for i, vector in zip(missing, self.embedder.embed([messages[i].get("text", "") for i in missing])):
+                rows[i] = vector
+        return normalize(np.asarray(rows, dtype=np.float32))
+
+    def rank(self, profile, messages, k=RELEVANCE_TOP_K, min_score=RELEVANCE_MIN_SCORE):
+        """The ``k`` messages most similar to one profile vector, best first"""
+        if not messages:
+            return []
+        scores = self.message_matrix(messages) @ profile
+        return [messages[i] for i in top_k(scores, k, min_score)]
+
+    def rank_all(self, profiles, messages, k=RELEVANCE_TOP_K, min_score=RELEVANCE_MIN_SCORE):
+        """Top messages for every user at once: ``profiles`` maps user ID to profile vector"""
+        if not profiles or not messages:
+            return {user_id: [] for user_id in profiles}
+        user_ids = list(profiles)
+        scores = np.stack([profiles[user_id] for user_id in user_ids]) @ self.message_matrix(messages).T
+        return {
+            user_id: [messages[i] for i in top_k(scores[row], k, min_score)]
+            for row, user_id in enumerate(user_ids)
+        }
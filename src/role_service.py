@@ -1,12 +1,16 @@
 from google.cloud import firestore
 from config import COLLECTIONS
 from src.config.roles import ENGINEERING_ROLES, ROLE_HIERARCHY, CHANNEL_ACCESS_LEVELS
+from src.telemetry import timed
+from src.metrics import record_reads, record_writes
+from src.dependencies import get_firestore
 
 class RoleService:
-    def __init__(self):
-        self.db = firestore.Client()
+    def __init__(self, db=None):
+        self.db = db or get_firestore()
         self.roles_collection = self.db.collection(COLLECTIONS["ROLES"])
 
+    @timed("firestore.roles.assign_role")
     def assign_role(self, user_id, role):
         """Assign a role to a user"""
         if role not in ENGINEERING_ROLES:
@@ -21,11 +25,14 @@ class RoleService:
         }
         
         self.roles_collection.document(user_id).set(role_data, merge=True)
+        record_writes(COLLECTIONS["ROLES"])
         return role_data
 
+    @timed("firestore.roles.get_user_role")
     def get_user_role(self, user_id):
         """Get a user's role"""
         doc = self.roles_collection.document(user_id).get()
+        record_reads(COLLECTIONS["ROLES"])
         return doc.to_dict() if doc.exists else None
 
     def can_access_channel(self, user_id, channel):
@@ -63,10 +70,13 @@ class RoleService:
             return []
         return ENGINEERING_ROLES[role]["channels"]
 
+    @timed("firestore.roles.get_users_by_role")
     def get_users_by_role(self, role):
         """Get all users with a specific role"""
         query = self.roles_collection.where("role", "==", role)
-        return [doc.to_dict() for doc in query.stream()]
+        roles = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["ROLES"], max(len(roles), 1))
+        return roles
 
     def get_role_hierarchy(self):
         """Get the role hierarchy"""
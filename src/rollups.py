@@ -0,0 +1,265 @@
+"""Hourly channel activity rollups, and trends computed from them.
+
+``rollups`` counts every stored channel message as it is ingested, per
+channel and hour:
+- messages and thread replies;
+- files and user mentions;
+- distinct posters;
+- replies and distinct repliers per thread;
+- links to GitHub pull requests.
+
+Counts are kept in memory and added every ``ROLLUP_FLUSH_SECONDS`` to one
+``channel_rollups`` document per channel and hour, in one batch of
+``Increment`` and ``ArrayUnion`` writes, so every process adds to the same
+buckets. DMs are not counted.
+
+``detect_trends`` reads only rollup documents, so it costs
+O(channels × hours) however many messages were sent:
+- ``spikes``: channels with ``ROLLUP_SPIKE_RATIO`` times their usual
+  activity over the last ``ROLLUP_TREND_WINDOW_HOURS``. "Usual" is the
+  average of the ``ROLLUP_BASELINE_WINDOWS`` windows before it, or of as
+  many as there is history for. Until the rollups go back
+  ``ROLLUP_MIN_BASELINE_HOURS`` before the window, nothing is flagged,
+  since every channel would look like it was spiking.
+- ``active_threads``: the threads with the most replies.
+- ``top_prs``: the most linked pull requests.
+- ``issue_swarms``: threads at least ``ROLLUP_SWARM_MIN_USERS`` people
+  replied in.
+
+``update_trends`` stores the result with ``firebase_utils.add_trend``.
+"""
+import atexit
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from google.cloud import firestore
+from config import (
+    COLLECTIONS, ROLLUP_FLUSH_SECONDS, ROLLUP_TREND_WINDOW_HOURS, ROLLUP_BASELINE_WINDOWS, ROLLUP_SPIKE_RATIO,
+    ROLLUP_SPIKE_MIN_MESSAGES, ROLLUP_MIN_BASELINE_HOURS, ROLLUP_SWARM_MIN_USERS, ROLLUP_TOP_ITEMS
+)
+from src.dependencies import get_firestore
+from src.firebase_utils import add_trend
+from src.metrics import record_reads, record_writes
+from src.telemetry import get_logger, timed
+
+log = get_logger("pulse.rollups")
+
+PULL_REQUEST = re.compile(r"github\.com/([\w.-]+/[\w.-]+)/pull/(\d+)")
+USER_MENTION = re.compile(r"<@[UW][A-Z0-9]+")
+COUNTERS = ("messages", "replies", "files", "mentions")
+DM_CHANNEL_TYPES = ("im", "mpim")
+
+
+def _bucket():
+    return {"users": set(), "threads": Counter(), "thread_users": defaultdict(set), "prs": Counter(),
+            **{name: 0 for name in COUNTERS}}
+
+
+def _hour(ts):
+    try:
+        seconds = float(ts)
+    except (TypeError, ValueError):
+        seconds = time.time()
+    return int(seconds) // 3600 * 3600
+
+
+class ActivityRollups:
+    """Per-channel, per-hour activity counters, flushed to Firestore in batches"""
+
+    def __init__(self, db=None, flush_seconds=ROLLUP_FLUSH_SECONDS):
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self._pending = defaultdict(_bucket)  # (channel, hour start in epoch seconds) -> counters
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, message):
+        """Count a stored Slack message (the event, or a dict with the same keys)"""
+        channel = message.get("channel")
+        if not channel or message.get("channel_type") in DM_CHANNEL_TYPES:
+            return
+        ts, thread_ts, user = message.get("ts"), message.get("thread_ts"), message.get("user")
+        text = message.get("text") or ""
+        is_reply = bool(thread_ts) and thread_ts != ts
+        with self._lock:
+            bucket = self._pending[(channel, _hour(ts))]
+            bucket["messages"] += 1
+            bucket["files"] += len(message.get("files") or [])
+            bucket["mentions"] += len(USER_MENTION.findall(text))
+            if user:
+                bucket["users"].add(user)
+            if is_reply:
+                bucket["replies"] += 1
+                bucket["threads"][thread_ts] += 1
+                if user:
+                    bucket["thread_users"][thread_ts].add(user)
+            for repo, number in PULL_REQUEST.findall(text):
+                bucket["prs"][f"{repo}#{number}"] += 1
+        self._ensure_started()
+
+    @timed("firestore.rollups.flush")
+    def flush(self):
+        """Add unflushed counters to their rollup documents"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(_bucket)
+        if not pending:
+            return 0
+        entries = list(pending.items())
+        try:
+            for start in range(0, len(entries), 500):
+                batch = (self.db or get_firestore()).batch()
+                for (channel, hour), bucket in entries[start:start + 500]:
+                    batch.set(self._collection().document(self._doc_id(channel, hour)),
+                              self._fields(channel, hour, bucket), merge=True)
+                batch.commit()
+                record_writes(COLLECTIONS["CHANNEL_ROLLUPS"], len(entries[start:start + 500]))
+        except Exception as e:
+            log.warning("rollups.flush_error", buckets=len(entries), error=str(e))
+            self._restore(pending)
+            return 0
+        return len(entries)
+
+    @staticmethod
+    def _fields(channel, hour, bucket):
+        fields = {
+            "channel": channel,
+            "hour": datetime.fromtimestamp(hour, timezone.utc),
+            "updated_at": firestore.SERVER_TIMESTAMP
+        }
+        for name in COUNTERS:
+            if bucket[name]:
+                fields[name] = firestore.Increment(bucket[name])
+        if bucket["users"]:
+            fields["users"] = firestore.ArrayUnion(sorted(bucket["users"]))
+        if bucket["threads"]:
+            fields["threads"] = {ts: firestore.Increment(count) for ts, count in bucket["threads"].items()}
+            fields["thread_users"] = {ts: firestore.ArrayUnion(sorted(users))
+                                      for ts, users in bucket["thread_users"].items()}
+        if bucket["prs"]:
+            fields["prs"] = {pr: firestore.Increment(count) for pr, count in bucket["prs"].items()}
+        return fields
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, bucket in pending.items():
+                target = self._pending[key]
+                for name in COUNTERS:
+                    target[name] += bucket[name]
+                target["users"] |= bucket["users"]
+                target["threads"].update(bucket["threads"])
+                target["prs"].update(bucket["prs"])
+                for ts, users in bucket["thread_users"].items():
+                    target["thread_users"][ts] |= users
+
+    @timed("firestore.rollups.load")
+    def load(self, hours):
+        """Rollup documents for the last ``hours`` hours, every channel"""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+        buckets = [doc.to_dict() for doc in self._collection().where("hour", ">=", cutoff).stream()]
+        record_reads(COLLECTIONS["CHANNEL_ROLLUPS"], max(len(buckets), 1))
+        return buckets
+
+    def _collection(self):
+        return (self.db or get_firestore()).collection(COLLECTIONS["CHANNEL_ROLLUPS"])
+
+    @staticmethod
+    def _doc_id(channel, hour):
+        return f"{channel}_{datetime.fromtimestamp(hour, timezone.utc):%Y%m%d%H}"
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="activity-rollups", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+
+rollups = ActivityRollups()
+
+
+def detect_trends(buckets, now=None, window_hours=ROLLUP_TREND_WINDOW_HOURS, baseline_windows=ROLLUP_BASELINE_WINDOWS,
+                  spike_ratio=ROLLUP_SPIKE_RATIO, spike_min_messages=ROLLUP_SPIKE_MIN_MESSAGES,
+                  min_baseline_hours=ROLLUP_MIN_BASELINE_HOURS, swarm_min_users=ROLLUP_SWARM_MIN_USERS,
+                  top=ROLLUP_TOP_ITEMS):
+    """Spikes, active threads, top PRs and issue swarms from rollup documents"""
+    now = now or datetime.now(timezone.utc)
+    window_start = now - timedelta(hours=window_hours)
+    recent = defaultdict(int)
+    baseline = defaultdict(int)
+    threads = Counter()
+    thread_users = defaultdict(set)
+    prs = Counter()
+    earliest = None
+    for bucket in buckets:
+        earliest = bucket["hour"] if earliest is None else min(earliest, bucket["hour"])
+        channel = bucket["channel"]
+        if bucket["hour"] < window_start:
+            baseline[channel] += bucket.get("messages", 0)
+            continue
+        recent[channel] += bucket.get("messages", 0)
+        for ts, count in (bucket.get("threads") or {}).items():
+            threads[(channel, ts)] += count
+        for ts, users in (bucket.get("thread_users") or {}).items():
+            thread_users[(channel, ts)].update(users)
+        prs.update(bucket.get("prs") or {})
+
+    # With too little history every baseline is near zero, and every busy channel would be a spike
+    history_hours = (window_start - earliest).total_seconds() / 3600 if earliest is not None else 0
+    windows = min(baseline_windows, math.ceil(history_hours / window_hours))
+    spikes = []
+    if history_hours >= min_baseline_hours and windows > 0:
+        for channel, messages in recent.items():
+            usual = baseline[channel] / windows
+            if messages >= spike_min_messages and messages >= spike_ratio * max(usual, 1):
+                spikes.append({"channel": channel, "messages": messages, "baseline": round(usual, 1),
+                               "ratio": round(messages / max(usual, 1), 1)})
+    spikes.sort(key=lambda spike: -spike["ratio"])
+
+    def thread(key, replies):
+        channel, ts = key
+        return {"channel": channel, "thread_ts": ts, "replies": replies, "participants": len(thread_users[key])}
+
+    active_threads = [thread(key, replies) for key, replies in threads.most_common(top)]
+    swarms = sorted((key for key, users in thread_users.items() if len(users) >= swarm_min_users),
+                    key=lambda key: (-len(thread_users[key]), -threads[key]))
+    return {
+        "spikes": spikes[:top],
+        "active_threads": active_threads,
+        "top_prs": [{"pr": pr, "mentions": count} for pr, count in prs.most_common(top)],
+        "issue_swarms": [thread(key, threads[key]) for key in swarms[:top]]
+    }
+
+
+def trends_summary(trends):
+    """One line describing ``detect_trends`` results"""
+    parts = [f"<#{spike['channel']}> is {spike['ratio']}x busier than usual ({spike['messages']} messages)"
+             for spike in trends["spikes"][:3]]
+    if trends["issue_swarms"]:
+        count = len(trends["issue_swarms"])
+        parts.append(f"{count} thread{'s' if count != 1 else ''} drew {ROLLUP_SWARM_MIN_USERS}+ people")
+    if trends["top_prs"]:
+        parts.append(f"most discussed PR: {trends['top_prs'][0]['pr']}")
+    return "; ".join(parts) or "Activity is steady across channels."
+
+
+def update_trends():
+    """Recompute trends from the rollups and store them as the latest trends document"""
+    rollups.flush()
+    now = datetime.now(timezone.utc)
+    buckets = rollups.load(ROLLUP_TREND_WINDOW_HOURS * (ROLLUP_BASELINE_WINDOWS + 1))
+    trends = detect_trends(buckets, now)
+    summary = trends_summary(trends)
+    add_trend(now, trends["active_threads"], trends["top_prs"], trends["issue_swarms"], summary,
+              spikes=trends["spikes"])
+    log.info("trends.updated", buckets=len(buckets), spikes=len(trends["spikes"]),
+             swarms=len(trends["issue_swarms"]))
+    return dict(trends, summary=summary)
@@ -0,0 +1,156 @@
+import fcntl
+import os
+import threading
+import schedule
+from config import SCHEDULER_LOCK_PATH, SCHEDULER_TICK_SECONDS
+from src.telemetry import get_logger, span
+
+log = get_logger("pulse.scheduler")
+
+
+class ProcessLock:
+    """Non-blocking exclusive file lock shared by every worker process on a host.
+
+    The kernel releases the lock when the holding process exits, so a
+    surviving worker picks the jobs up on its next attempt.
+    """
+
+    def __init__(self, path=SCHEDULER_LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class JobScheduler:
+    """Runs scheduled jobs in a daemon thread, in only one process at a time.
+
+    Every worker starts a scheduler, but jobs only run in the worker that
+    holds ``lock`` and, when a ``leader`` elector is given, only on the
+    replica that holds the leader lease; the others keep trying to take
+    over. Jobs are only scheduled once this process becomes active, so a
+    takeover never replays runs that the previous holder already made.
+
+    The lock and lease are kept by a separate thread, so a job that runs
+    longer than the lease does not let it expire. A job still running when
+    the lease is lost is not interrupted, but no further job starts.
+    """
+
+    def __init__(self, lock=None, leader=None, tick=SCHEDULER_TICK_SECONDS):
+        self.lock = lock or ProcessLock()
+        self.leader = leader
+        self.tick = tick
+        self.schedule = schedule.Scheduler()
+        self._registrations = []
+        self._active = False
+        self._holding = False  # Lock and lease held, as last seen by the lease thread
+        self._term = 0  # Times the lease thread has taken the lock and lease
+        self._active_term = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lease_thread = None
+
+    def every(self, seconds, job):
+        """Run ``job`` every ``seconds`` seconds"""
+        self._registrations.append(lambda: self.schedule.every(seconds).seconds.do(self._run_job, job))
+
+    def on_activate(self, callback):
+        """Call ``callback`` each time this process becomes the one running jobs"""
+        self._registrations.append(callback)
+
+    def once_after(self, seconds, job):
+        """Run ``job`` once, ``seconds`` from now, if this process is still active.
+
+        Not re-registered on takeover, so a pending run is lost if the
+        lease moves to another replica first.
+        """
+        def run_once():
+            self._run_job(job)
+            return schedule.CancelJob
+        self.schedule.every(seconds).seconds.do(run_once)
+
+    def _run_job(self, job):
+        # The lease may have been lost while an earlier job ran
+        if not self._holding:
+            return
+        with span(f"job.{job.__name__}"):
+            try:
+                job()
+            except Exception as e:
+                log.exception("scheduler.job_error", job=job.__name__, error=str(e))
+
+    def hold(self):
+        """Take or keep the host lock and the leader lease; returns whether both are held"""
+        was_held = self.lock.held
+        holding = self.lock.try_acquire()
+        if holding and not was_held:
+            log.info("scheduler.lock_acquired", pid=os.getpid())
+        # Only the host's lock holder contends for the cross-replica lease
+        if holding and self.leader is not None:
+            holding = self.leader.maintain()
+        if holding and not self._holding:
+            self._term += 1
+        self._holding = holding
+        return holding
+
+    def is_active(self):
+        """Whether this process is the one allowed to run jobs, registering them when it becomes so"""
+        active, term = self._holding, self._term
+        # A new term means the lease was lost and retaken in between, so another process may have run jobs
+        if active and (not self._active or term != self._active_term):
+            self._active_term = term
+            self.schedule.clear()
+            for register in self._registrations:
+                register()
+        elif self._active and not active:
+            log.info("scheduler.standby", pid=os.getpid())
+            self.schedule.clear()
+        self._active = active
+        return active
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._lease_thread = threading.Thread(target=self._maintain, name="scheduler-lease", daemon=True)
+        self._lease_thread.start()
+        self._thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.leader is not None:
+            self.leader.release()
+        self.lock.release()
+
+    def _maintain(self):
+        while not self._stop.is_set():
+            self.hold()
+            self._stop.wait(self.tick)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.is_active():
+                self.schedule.run_pending()
+            self._stop.wait(self.tick)
@@ -0,0 +1,98 @@
+"""Coalescing concurrent identical calls into one.
+
+When many users ask for ``/pulse update`` at once, their updates fetch the
+same channel history, look up the same users and summarize the same
+channel windows. A ``SingleFlight`` group runs one call per key at a time:
+callers that arrive while it is in flight wait for it and share its result
+(or its exception) instead of making their own. Nothing is cached after
+the call returns.
+
+Each group counts its calls in ``pulse_singleflight_calls_total`` as
+``leader`` (made the call) or ``coalesced`` (shared another's).
+``AsyncSingleFlight`` does the same for coroutines on one event loop.
+"""
+import asyncio
+import hashlib
+import threading
+from src.metrics import REGISTRY
+from src.telemetry import get_logger
+
+log = get_logger("pulse.singleflight")
+
+SINGLEFLIGHT_CALLS_TOTAL = REGISTRY.counter(
+    "pulse_singleflight_calls_total", "Calls per singleflight group, made (leader) or shared (coalesced)",
+    ("group", "role")
+)
+
+
+def fingerprint(*parts):
+    """A short stable key for values too large to key on directly, such as a prompt"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time across threads"""
+
+    def __init__(self, group):
+        self.group = group
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """``fn(*args, **kwargs)``, or the result of the identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            SINGLEFLIGHT_CALLS_TOTAL.labels(self.group, "coalesced").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        SINGLEFLIGHT_CALLS_TOTAL.labels(self.group, "leader").inc()
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                log.debug("singleflight.coalesced", group=self.group, waiters=call.waiters)
+
+
+class AsyncSingleFlight:
+    """Runs at most one coroutine per key at a time on the event loop"""
+
+    def __init__(self, group):
+        self.group = group
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """``await fn(*args, **kwargs)``, or the result of the identical call already in flight"""
+        future = self._calls.get(key)
+        if future is not None:
+            SINGLEFLIGHT_CALLS_TOTAL.labels(self.group, "coalesced").inc()
+            # Shielded so one waiter being cancelled does not cancel the call for the others
+            return await asyncio.shield(future)
+        SINGLEFLIGHT_CALLS_TOTAL.labels(self.group, "leader").inc()
+        future = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
@@ -0,0 +1,281 @@
+import asyncio
+import contextlib
+import json
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    SLACK_API_URL, SLACK_HTTP_POOL_SIZE, SLACK_HTTP_TIMEOUT_SECONDS, SLACK_MAX_RETRIES,
+    SLACK_MAX_QUEUE_SECONDS, SLACK_RATE_LIMIT_SHARE
+)
+from src.breakers import CircuitOpenError, Throttled
+from src.metrics import REGISTRY
+from src.telemetry import get_logger
+
+log = get_logger("pulse.slack")
+
+# Requests per minute for each Slack rate-limit tier
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# Tier of each Web API method we call; unknown methods are treated as tier 3
+METHOD_TIERS = {
+    "auth.test": 4,
+    "conversations.history": 3,
+    "conversations.replies": 3,
+    "conversations.list": 2,
+    "conversations.info": 3,
+    "users.info": 4,
+    "users.list": 2,
+    "chat.update": 3,
+    "chat.postEphemeral": 4
+}
+
+# Methods limited per channel rather than per method (about one message per second)
+PER_CHANNEL_LIMITS = {"chat.postMessage": 60}
+
+SLACK_API_CALLS_TOTAL = REGISTRY.counter(
+    "pulse_slack_api_calls_total", "Slack Web API calls by method and result", ("method", "status")
+)
+SLACK_API_THROTTLED_TOTAL = REGISTRY.counter(
+    "pulse_slack_api_throttled_total", "Slack calls delayed by the local limiter or a 429", ("method", "source")
+)
+SLACK_API_QUEUE_SECONDS = REGISTRY.histogram(
+    "pulse_slack_api_queue_seconds", "Time Slack calls waited for a rate-limit token", ("method",)
+)
+
+
+class SlackRateLimited(Exception):
+    """Raised when a call could not be made within the allowed wait"""
+
+    def __init__(self, method, retry_after=None):
+        super().__init__(f"Rate limited on {method}" + (f", retry after {retry_after}s" if retry_after else ""))
+        self.method = method
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token, returning how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def refund(self):
+        """Return a reserved token that was not used"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def block_for(self, seconds):
+        """Stop handing out usable tokens for ``seconds`` (after a 429)"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0)
+
+
+class _RateLimitedClient:
+    """Token buckets and request encoding shared by the sync and async clients"""
+
+    def __init__(self, token, base_url, timeout, max_retries, max_queue_seconds, rate_share, breaker=None):
+        self.token = token
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.max_queue_seconds = max_queue_seconds
+        self.rate_share = rate_share
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = name.replace("_", ".")
+        return lambda **params: self.api_call(method, **params)
+
+    def _bucket(self, method, params):
+        if method in PER_CHANNEL_LIMITS:
+            key = (method, params.get("channel"))
+            per_minute = PER_CHANNEL_LIMITS[method]
+        else:
+            key = (method,)
+            per_minute = TIER_LIMITS[METHOD_TIERS.get(method, 3)]
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = per_minute * self.rate_share / 60.0
+            with self._buckets_lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(rate, max(1.0, rate * 10)))
+        return bucket
+
+    def _reserve(self, method, bucket):
+        """Take a token and return how long to wait before using it"""
+        wait = bucket.reserve()
+        SLACK_API_QUEUE_SECONDS.labels(method).observe(wait)
+        if wait <= 0:
+            return 0.0
+        if wait > self.max_queue_seconds:
+            bucket.refund()
+            raise SlackRateLimited(method, wait)
+        SLACK_API_THROTTLED_TOTAL.labels(method, "local").inc()
+        return wait
+
+    def _rate_limited(self, method, bucket, retry_after, attempt):
+        SLACK_API_CALLS_TOTAL.labels(method, "rate_limited").inc()
+        SLACK_API_THROTTLED_TOTAL.labels(method, "remote").inc()
+        log.warning("slack.rate_limited", method=method, retry_after=retry_after, attempt=attempt)
+        bucket.block_for(retry_after)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    def _guard(self):
+        return self.breaker.guard() if self.breaker else contextlib.nullcontext()
+
+    def _timeout(self):
+        """Per-request timeout: the breaker's latency-derived one, never above the client's"""
+        return min(self.timeout, self.breaker.timeout()) if self.breaker else self.timeout
+
+    def _request(self, method, params):
+        data = {key: self._encode(value) for key, value in params.items() if value is not None}
+        headers = {"Authorization": f"Bearer {self.token}"}
+        return self.base_url + method, data, headers
+
+
+class SlackWebClient(_RateLimitedClient):
+    """Slack Web API client with pooled connections and per-method rate limiting.
+
+    Calls look like ``WebClient`` calls (``client.conversations_history(...)``)
+    and return the decoded response dict; callers check ``result["ok"]``.
+    Each method draws from a token bucket sized to its Slack tier, shared by
+    every thread using this client. Callers queue for a token instead of
+    being rejected, and 429 responses block the bucket for ``Retry-After``
+    seconds before the call is retried. With a ``breaker``, requests use its
+    latency-derived timeout and fail fast while Slack is down.
+    """
+
+    def __init__(self, token, base_url=SLACK_API_URL, pool_size=SLACK_HTTP_POOL_SIZE,
+                 timeout=SLACK_HTTP_TIMEOUT_SECONDS, max_retries=SLACK_MAX_RETRIES,
+                 max_queue_seconds=SLACK_MAX_QUEUE_SECONDS, rate_share=SLACK_RATE_LIMIT_SHARE, breaker=None):
+        super().__init__(token, base_url, timeout, max_retries, max_queue_seconds, rate_share, breaker)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def api_call(self, method, **params):
+        """Call a Web API method, waiting for rate-limit tokens and retrying 429s"""
+        bucket = self._bucket(method, params)
+        url, data, headers = self._request(method, params)
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._reserve(method, bucket)
+            if wait:
+                time.sleep(wait)
+            try:
+                with self._guard():
+                    response = self.session.post(url, data=data, headers=headers, timeout=self._timeout())
+                    if response.status_code == 429:
+                        raise Throttled()
+                    response.raise_for_status()
+            except Throttled:
+                self._rate_limited(method, bucket, float(response.headers.get("Retry-After", 1)), attempt)
+                continue
+            except CircuitOpenError:
+                bucket.refund()
+                raise
+            except requests.RequestException:
+                SLACK_API_CALLS_TOTAL.labels(method, "transport_error").inc()
+                raise
+
+            result = response.json()
+            SLACK_API_CALLS_TOTAL.labels(method, "ok" if result.get("ok") else "error").inc()
+            return result
+
+        raise SlackRateLimited(method)
+
+
+class AsyncSlackWebClient(_RateLimitedClient):
+    """asyncio counterpart of ``SlackWebClient``.
+
+    Same call style and token buckets, but calls are coroutines
+    (``await client.conversations_history(...)``) that wait for tokens with
+    ``asyncio.sleep`` and share one aiohttp connection pool. Create it inside
+    the running event loop.
+    """
+
+    def __init__(self, token, base_url=SLACK_API_URL, pool_size=SLACK_HTTP_POOL_SIZE,
+                 timeout=SLACK_HTTP_TIMEOUT_SECONDS, max_retries=SLACK_MAX_RETRIES,
+                 max_queue_seconds=SLACK_MAX_QUEUE_SECONDS, rate_share=SLACK_RATE_LIMIT_SHARE, breaker=None):
+        super().__init__(token, base_url, timeout, max_retries, max_queue_seconds, rate_share, breaker)
+        self.pool_size = pool_size
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def api_call(self, method, **params):
+        """Call a Web API method, waiting for rate-limit tokens and retrying 429s"""
+        bucket = self._bucket(method, params)
+        url, data, headers = self._request(method, params)
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._reserve(method, bucket)
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                with self._guard():
+                    async with self.session.post(
+                        url, data=data, headers=headers, timeout=aiohttp.ClientTimeout(total=self._timeout())
+                    ) as response:
+                        if response.status == 429:
+                            raise Throttled()
+                        response.raise_for_status()
+                        result = await response.json(content_type=None)
+            except Throttled:
+                self._rate_limited(method, bucket, float(response.headers.get("Retry-After", 1)), attempt)
+                continue
+            except CircuitOpenError:
+                bucket.refund()
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                SLACK_API_CALLS_TOTAL.labels(method, "transport_error").inc()
+                raise
+
+            SLACK_API_CALLS_TOTAL.labels(method, "ok" if result.get("ok") else "error").inc()
+            return result
+
+        raise SlackRateLimited(method)
@@ -1,14 +1,22 @@
-import openai
-import os
 from datetime import datetime, timedelta
 import pytz
-from config import GPT_MODEL, MAX_TOKENS, TEMPERATURE
+from config import GPT_MODEL, MAX_TOKENS, TEMPERATURE, OPENAI_MAX_RETRIES
+from src.thread_grouping import group_threads, collapse_threads, format_thread_units
+from src.telemetry import timed
+from src.metrics import record_openai_usage
+from src.dependencies import get_openai
+from src.relevance import RelevanceEngine
+from src.vector_index import collapse_near_duplicates, repeat_note
+from src import token_budget, model_cascade, preprocess
+from src.breakers import openai_breaker, openai_key, is_dependency_failure
 
 class SummaryService:
-    def __init__(self, message_service, user_service):
+    def __init__(self, message_service, user_service, openai_client=None, relevance=None, admission=None):
         self.message_service = message_service
         self.user_service = user_service
-        openai.api_key = os.getenv("OPENAI_API_KEY")
+        self.openai = openai_client or get_openai()
+        self.relevance = relevance or RelevanceEngine()
+        self.admission = admission or token_budget.admission
 
     def generate_summary(self, user_id):
         """Generate a personalized summary for a user"""
@@ -30,10 +38,18 @@ class SummaryService:
         # Prepare context for GPT-4
         context = self._prepare_context(user, interests, messages, dms_received)
         
-        # Generate summary using GPT-4
-        summary = self._generate_gpt_summary(context)
-        
-        return summary
+        # Small windows are listed as-is; otherwise the cascade picks the model,
+        # and the token budget may still downgrade it
+        route = model_cascade.route(self._context_texts(context), "personal_summary", user=user_id)
+        if route.tier == "extractive":
+            return self._extractive_summary(context)
+        try:
+            return self._generate_gpt_summary(context, self.admission.admit(user_id, user.get("role")), route.model)
+        except Exception as e:
+            # OpenAI is down or timed out: list the window rather than fail
+            if not is_dependency_failure(e):
+                raise
+            return self._extractive_summary(context)
 
     def _get_relevant_messages(self, user_id, interests):
         """Get messages relevant to the user's interests"""
@@ -49,14 +65,13 @@ class SummaryService:
         for followed_user in followed_users:
             messages.extend(self.message_service.get_user_messages(followed_user))
         
-        # Filter messages by topics of interest
+        # A followed user's message in a tracked channel shows up twice
+        messages = list({(m.get("channel_id"), m.get("timestamp")): m for m in messages}.values())
+        
+        # Keep the messages closest to the user's interests by embedding similarity
         if interests and interests.get("topics"):
-            filtered_messages = []
-            for message in messages:
-                if any(topic.lower() in message.get("text", "").lower() 
-                      for topic in interests["topics"]):
-                    filtered_messages.append(message)
-            messages = filtered_messages
+            profile = self.relevance.profile_vector(user_id, interests, self.user_service.store_interest_embedding)
+            messages = self.relevance.rank(profile, messages)
         
         return messages
 
@@ -68,68 +83,128 @@ class SummaryService:
                 "team": user.get("team", ""),
                 "interests": interests.get("topics", []) if interests else []
             },
-            "messages": [],
+            "threads": [],
             "dms_received": []
         }
         
+        # Drop duplicates (a followed user's message in a tracked channel) before grouping
+        unique_messages = {}
         for message in messages:
-            context["messages"].append({
+            unique_messages[(message.get("channel_id"), message.get("timestamp"))] = {
                 "text": message.get("text", ""),
                 "channel": message.get("channel_id", ""),
                 "user": message.get("user_id", ""),
                 "timestamp": message.get("timestamp", ""),
+                "thread_ts": message.get("thread_ts"),
                 "type": message.get("type", ""),
                 "files": message.get("files", [])
-            })
-        for dm in dms_received:
+            }
+        
+        # Plain text with mentions resolved and long pastes cut down; cross-posts and
+        # repeated status messages go into the prompt once, with a count
+        prepared = preprocess.prepare_messages(list(unique_messages.values()), self._user_name)
+        deduplicated = collapse_near_duplicates(prepared, ts_key="timestamp", channel_key="channel")
+        context["threads"] = collapse_threads(
+            group_threads(deduplicated, ts_key="timestamp")
+        )
+        dm_texts = preprocess.prepare_texts([dm.get("text", "") for dm in dms_received], self._user_name)
+        for dm, text in zip(dms_received, dm_texts):
+            if not text:
+                continue
             context["dms_received"].append({
-                "text": dm.get("text", ""),
+                "text": text,
                 "sender": dm.get("user_id", ""),
                 "timestamp": dm.get("timestamp", "")
             })
         
         return context
 
-    def _generate_gpt_summary(self, context):
+    def _user_name(self, user_id):
+        """Name for a mentioned user, from the shared directory or their profile"""
+        name = preprocess.user_directory.get(user_id)
+        if name is None and not preprocess.user_directory.missed(user_id):
+            user = self.user_service.get_user(user_id)
+            name = (user or {}).get("name")
+            if name:
+                preprocess.user_directory.put(user_id, name)
+            else:
+                preprocess.user_directory.put_miss(user_id)
+        return name
+
+    def _context_texts(self, context):
+        """Text of every message and DM the prompt would carry"""
+        texts = []
+        for thread in context["threads"]:
+            texts.extend(message["text"] for message in ([thread["head"]] if thread["head"] else []) + thread["replies"])
+        texts.extend(dm["text"] for dm in context["dms_received"])
+        return texts
+
+    def _extractive_summary(self, context):
+        """Verbatim listing for windows too small to be worth a model call"""
+        lines = []
+        if context["threads"]:
+            lines.append("*Messages*")
+            lines.append(format_thread_units(context["threads"], self._format_message))
+        if context["dms_received"]:
+            lines.append("*Direct messages*")
+            lines.extend(f"{dm['sender']}: {dm['text']}" for dm in context["dms_received"])
+        return "\n".join(lines)
+
+    @timed("openai.chat_completions")
+    def _generate_gpt_summary(self, context, admission=None, model=GPT_MODEL):
         """Generate summary using GPT-4"""
         prompt = self._create_prompt(context)
-        
-        response = openai.ChatCompletion.create(
-            model=GPT_MODEL,
-            messages=[
+        request = {
+            "model": model,
+            "messages": [
                 {"role": "system", "content": "You are a helpful assistant that summarizes Slack messages for EV engineering team members."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=MAX_TOKENS,
-            temperature=TEMPERATURE
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE
+        }
+        if admission:
+            request = admission.apply(request)
+        
+        key = openai_key(request)
+        with openai_breaker.guard(key):
+            response = self.openai.with_options(max_retries=OPENAI_MAX_RETRIES).chat.completions.create(
+                **request, timeout=openai_breaker.timeout(key)
+            )
+        
+        record_openai_usage(request["model"], response)
+        token_budget.ledger.record(
+            request["model"], response.usage, purpose="personal_summary",
+            user=admission.user if admission else None, team=admission.team if admission else None
         )
         
         return response.choices[0].message.content
 
+    def _format_message(self, message):
+        """Format a single message line for the prompt"""
+        line = f"[{message['timestamp']}] {message['user']} ({message['type']}): {message['text']}{repeat_note(message)}"
+        for file in message['files']:
+            line += f"\n    File: {file['name']} ({file['type']})"
+        return line
+
     def _create_prompt(self, context):
         """Create prompt for GPT-4"""
         user = context["user"]
-        messages = context["messages"]
+        threads = context["threads"]
         dms_received = context.get("dms_received", [])
         
         prompt = f"""Please create a personalized daily summary for {user['name']} from the EV engineering team ({user['team']}).
         
 User's interests: {', '.join(user['interests'])}
 
-Here are the relevant messages from the last 24 hours:\n"""
+Here are the relevant messages from the last 24 hours, grouped by thread (replies are indented under their parent):\n"""
         
-        for message in messages:
+        for thread in threads:
+            head = thread["head"] or thread["replies"][0]
             prompt += f"""
-Channel: {message['channel']}
-User: {message['user']}
-Time: {message['timestamp']}
-Type: {message['type']}
-Content: {message['text']}
+Channel: {head['channel']}
 """
-            if message['files']:
-                prompt += "Files:\n"
-                for file in message['files']:
-                    prompt += f"- {file['name']} ({file['type']})\n"
+            prompt += format_thread_units([thread], self._format_message) + "\n"
         if dms_received:
             prompt += "\nHere are the direct messages you received in the last 24 hours:\n"
             for dm in dms_received:
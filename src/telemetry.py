@@ -0,0 +1,196 @@
+import atexit
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+from src.metrics import REGISTRY, record_call
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+# --- STRUCTURED LOGGING ---
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", record.getMessage())
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records for high-volume events.
+
+    Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only freeze the message here
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.fields = dict(getattr(record, "fields", {}), exc=record.exc_text)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger:
+    """Thin wrapper that logs an event name plus keyword fields"""
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(name)
+
+    def is_enabled_for(self, level):
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def _log(self, level, event, fields, exc_info=None):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={"event": event, "fields": fields})
+
+
+def get_logger(name):
+    """Get a structured logger"""
+    return StructuredLogger(name)
+
+
+def configure_logging(level=LOG_LEVEL, stream=None, sample_rates=None):
+    """Route the "pulse" loggers through a background JSON-lines writer"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonLinesFormatter())
+
+        handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates))
+
+        root = logging.getLogger("pulse")
+        root.setLevel(level)
+        root.addHandler(handler)
+        root.propagate = False
+
+        REGISTRY.gauge(
+            "pulse_log_records_dropped", "Log records dropped because the log queue was full"
+        ).set_function(lambda: handler.dropped)
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Flush and stop the background log writer"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+# --- TIMING SPANS ---
+_span_log = get_logger("pulse.span")
+
+
+@contextmanager
+def span(name, /, **fields):
+    """Time a block, record it in the metrics registry and log it at DEBUG.
+
+    Names of the form "slack.*", "openai.*" and "firestore.*" are recorded as
+    external dependency calls.
+
+    The yielded dict can be used to attach extra fields to the span log.
+    They are logged together under "fields", so any name (``event``,
+    ``level``, ``status``...) is safe to use.
+    """
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield fields
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        record_call(name, elapsed, status)
+        if fields:
+            _span_log.debug("span", span=name, duration_ms=round(elapsed * 1000, 2), status=status, fields=fields)
+        else:
+            _span_log.debug("span", span=name, duration_ms=round(elapsed * 1000, 2), status=status)
+
+
+def timed(name):
+    """Decorator form of :func:`span`; works on plain and ``async`` functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
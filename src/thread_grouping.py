@@ -0,0 +1,160 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from config import MAX_THREAD_REPLIES, REPLY_FETCH_BATCH_SIZE, REPLY_FETCH_LIMIT
+from src.telemetry import get_logger
+
+log = get_logger("pulse.threads")
+
+
+def _ts_value(ts):
+    """Convert a Slack ts string into a sortable float"""
+    try:
+        return float(ts)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def group_threads(messages, ts_key="ts", thread_key="thread_ts"):
+    """Group a flat message list into thread units in a single pass.
+
+    Each unit is a dict with the thread root ``thread_ts``, the ``head``
+    message (None when the parent is outside the window) and its ``replies``
+    in chronological order. Units are returned ordered by latest activity.
+    """
+    units = {}
+    for msg in messages:
+        ts = msg.get(ts_key)
+        root = msg.get(thread_key) or ts
+        unit = units.get(root)
+        if unit is None:
+            unit = {"thread_ts": root, "head": None, "replies": [], "reply_count": 0, "latest_ts": 0.0}
+            units[root] = unit
+
+        if ts == root:
+            unit["head"] = msg
+            unit["reply_count"] = max(unit["reply_count"], msg.get("reply_count") or 0)
+        else:
+            unit["replies"].append(msg)
+        unit["latest_ts"] = max(unit["latest_ts"], _ts_value(ts))
+
+    for unit in units.values():
+        unit["replies"].sort(key=lambda m: _ts_value(m.get(ts_key)))
+        unit["reply_count"] = max(unit["reply_count"], len(unit["replies"]))
+
+    return sorted(units.values(), key=lambda u: u["latest_ts"])
+
+
+def collapse_thread(unit, max_replies=MAX_THREAD_REPLIES):
+    """Collapse a thread into its head, the latest replies and a reply count"""
+    replies = unit["replies"]
+    # Keep at least one reply for orphaned threads so the unit is never empty
+    keep = max(max_replies, 0 if unit["head"] is not None else 1)
+    kept = replies[-keep:] if keep > 0 else []
+    return {
+        "thread_ts": unit["thread_ts"],
+        "head": unit["head"],
+        "replies": kept,
+        "reply_count": unit["reply_count"],
+        "omitted": unit["reply_count"] - len(kept)
+    }
+
+
+def collapse_threads(units, max_replies=MAX_THREAD_REPLIES):
+    """Collapse every thread unit in a list"""
+    return [collapse_thread(unit, max_replies) for unit in units]
+
+
+def format_thread_units(units, format_message):
+    """Render collapsed thread units as indented prompt text"""
+    lines = []
+    for unit in units:
+        head = unit["head"]
+        if head is not None:
+            lines.append(format_message(head))
+        else:
+            lines.append("(reply to an earlier thread)")
+
+        if unit["omitted"] > 0:
+            lines.append(f"  ↳ {unit['reply_count']} replies, {unit['omitted']} earlier omitted")
+        for reply in unit["replies"]:
+            lines.append(f"  ↳ {format_message(reply)}")
+    return "\n".join(lines)
+
+
+def threads_missing_replies(messages, ts_key="ts", thread_key="thread_ts"):
+    """Return the thread roots whose replies are not present in the list"""
+    present = {}
+    parents = {}
+    for msg in messages:
+        ts = msg.get(ts_key)
+        root = msg.get(thread_key) or ts
+        if ts == root:
+            if msg.get("reply_count"):
+                parents[root] = msg["reply_count"]
+        else:
+            present[root] = present.get(root, 0) + 1
+    return [root for root, count in parents.items() if present.get(root, 0) < count]
+
+
+def _replies_params(channel_id, root, oldest, limit):
+    params = {"channel": channel_id, "ts": root, "limit": limit}
+    if oldest:
+        params["oldest"] = oldest
+    return params
+
+
+def _thread_replies(result, root):
+    if not result["ok"]:
+        return []
+    # The first message returned is the parent, which we already have
+    return [msg for msg in result["messages"] if msg.get("ts") != root]
+
+
+def fetch_missing_replies(client, channel_id, messages, oldest=None,
+                          batch_size=REPLY_FETCH_BATCH_SIZE, limit=REPLY_FETCH_LIMIT):
+    """Fetch replies for threads whose replies are missing from ``messages``.
+
+    Slack has no multi-thread replies method, so the calls are deduplicated,
+    restricted to threads that actually need them and issued in bounded
+    concurrent batches rather than sequentially one by one.
+    """
+    roots = threads_missing_replies(messages)
+    if not roots:
+        return []
+
+    def fetch(root):
+        try:
+            result = client.conversations_replies(**_replies_params(channel_id, root, oldest, limit))
+        except Exception as e:
+            log.warning("thread.fetch_replies_error", channel=channel_id, thread_ts=root, error=str(e))
+            return []
+        return _thread_replies(result, root)
+
+    replies = []
+    with ThreadPoolExecutor(max_workers=max(1, min(batch_size, len(roots)))) as pool:
+        for batch in pool.map(fetch, roots):
+            replies.extend(batch)
+    return replies
+
+
+async def fetch_missing_replies_async(client, channel_id, messages, oldest=None,
+                                      batch_size=REPLY_FETCH_BATCH_SIZE, limit=REPLY_FETCH_LIMIT):
+    """Coroutine form of :func:`fetch_missing_replies` for an async Slack client"""
+    roots = threads_missing_replies(messages)
+    if not roots:
+        return []
+    limiter = asyncio.Semaphore(batch_size)
+
+    async def fetch(root):
+        async with limiter:
+            try:
+                result = await client.conversations_replies(**_replies_params(channel_id, root, oldest, limit))
+            except Exception as e:
+                log.warning("thread.fetch_replies_error", channel=channel_id, thread_ts=root, error=str(e))
+                return []
+        return _thread_replies(result, root)
+
+    replies = []
+    for batch in await asyncio.gather(*(fetch(root) for root in roots)):
+        replies.extend(batch)
+    return replies
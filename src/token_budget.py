@@ -0,0 +1,256 @@
+"""OpenAI token accounting and budget enforcement.
+
+``ledger`` records the token usage of every summary completion against
+the requesting user, the channel summarized and the user's team (their
+role). Counts are kept in memory and flushed to the ``token_usage``
+collection every ``TOKEN_LEDGER_FLUSH_SECONDS`` in one batch of
+``Increment`` writes: one document per day, scope and key, so every
+process adds to the same totals. Each call is also logged as
+``openai.usage``.
+
+``admission`` decides, before an update is generated, whether it may
+spend tokens:
+
+- ``allow``: go ahead with the normal model.
+- ``defer``: scheduled work (pre-warming, the daily digest) waits while
+  this process is already using ``BACKGROUND_TOKEN_SHARE`` of its
+  per-minute token allowance, or while the user or team is over budget,
+  leaving the headroom to interactive requests.
+- ``cache``: a user or team over its daily budget is served their cached
+  digest instead of a new one.
+- ``downgrade``: with nothing cached, or when this process is over its
+  per-minute allowance, generate with ``BUDGET_FALLBACK_MODEL`` and a
+  smaller completion.
+"""
+import atexit
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime, timezone
+from google.cloud import firestore
+from config import (
+    COLLECTIONS, OPENAI_TOKENS_PER_MINUTE, OPENAI_RATE_LIMIT_SHARE, BACKGROUND_TOKEN_SHARE,
+    USER_DAILY_TOKEN_BUDGET, TEAM_DAILY_TOKEN_BUDGET, BUDGET_FALLBACK_MODEL, BUDGET_DOWNGRADE_MAX_TOKENS,
+    TOKEN_LEDGER_FLUSH_SECONDS, TOKEN_BUDGET_REFRESH_SECONDS
+)
+from src.breakers import firestore_breaker
+from src.dependencies import get_firestore
+from src.metrics import REGISTRY, record_reads, record_writes
+from src.telemetry import get_logger
+
+log = get_logger("pulse.token_budget")
+
+BUDGET_DECISIONS_TOTAL = REGISTRY.counter(
+    "pulse_openai_budget_decisions_total", "Token budget admission decisions", ("action", "reason")
+)
+
+SCOPES = ("org", "team", "user", "channel")
+
+
+def _day(now=None):
+    return datetime.fromtimestamp(now if now is not None else time.time(), timezone.utc).strftime("%Y-%m-%d")
+
+
+def _usage_counts(usage):
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for calls without usage"""
+    return max(1, len(text or "") // 4)
+
+
+def request_prompt_tokens(request):
+    """Estimated prompt tokens of chat completion keyword arguments"""
+    return sum(estimate_tokens(message.get("content")) for message in request.get("messages", []))
+
+
+class UsageLedger:
+    """Token usage per day for the org, each team, user and channel"""
+
+    def __init__(self, db=None, flush_seconds=TOKEN_LEDGER_FLUSH_SECONDS, refresh_seconds=TOKEN_BUDGET_REFRESH_SECONDS):
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self.refresh_seconds = refresh_seconds
+        self._pending = defaultdict(lambda: defaultdict(int))  # (day, scope, key) -> field -> tokens
+        self._stored = {}  # (day, scope, key) -> (read at, total tokens already in Firestore)
+        self._minute = deque()  # (time, tokens) for this process's last minute of calls
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, model, usage=None, user=None, team=None, channel=None, purpose=None,
+               prompt_tokens=None, completion_tokens=None):
+        """Count one completion's tokens; explicit counts are used when the response had no usage"""
+        prompt, completion = _usage_counts(usage)
+        prompt = prompt or prompt_tokens or 0
+        completion = completion or completion_tokens or 0
+        total = prompt + completion
+        if not total:
+            return
+        now = time.time()
+        day = _day(now)
+        with self._lock:
+            self._minute.append((now, total))
+            for scope, key in (("org", "all"), ("team", team), ("user", user), ("channel", channel)):
+                if not key:
+                    continue
+                counts = self._pending[(day, scope, key)]
+                counts["prompt_tokens"] += prompt
+                counts["completion_tokens"] += completion
+                counts["total_tokens"] += total
+                counts["calls"] += 1
+                counts[f"models.{model}"] += total
+        log.info("openai.usage", model=model, user=user, team=team, channel=channel, purpose=purpose,
+                 prompt_tokens=prompt, completion_tokens=completion, estimated=usage is None)
+        self._ensure_started()
+
+    def minute_tokens(self, now=None):
+        """Tokens this process used in the last 60 seconds"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            while self._minute and self._minute[0][0] < now - 60:
+                self._minute.popleft()
+            return sum(tokens for _, tokens in self._minute)
+
+    def used_today(self, scope, key):
+        """Today's tokens for a scope and key across all processes (stored total plus unflushed)"""
+        day = _day()
+        entry = (day, scope, key)
+        stored = self._stored.get(entry)
+        if stored is None or time.monotonic() - stored[0] > self.refresh_seconds:
+            with firestore_breaker.guard():
+                doc = self._collection().document(self._doc_id(entry)).get(timeout=firestore_breaker.timeout())
+            record_reads(COLLECTIONS["TOKEN_USAGE"])
+            stored = (time.monotonic(), (doc.to_dict() or {}).get("total_tokens", 0) if doc.exists else 0)
+            self._stored[entry] = stored
+        with self._lock:
+            pending = self._pending.get(entry, {}).get("total_tokens", 0)
+        return stored[1] + pending
+
+    def flush(self):
+        """Write unflushed counts to Firestore in batches"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        if not pending:
+            return 0
+        entries = list(pending.items())
+        try:
+            for start in range(0, len(entries), 500):
+                batch = (self.db or get_firestore()).batch()
+                for entry, counts in entries[start:start + 500]:
+                    day, scope, key = entry
+                    fields = {"day": day, "scope": scope, "key": key, "updated_at": firestore.SERVER_TIMESTAMP}
+                    models = {}
+                    for field, value in counts.items():
+                        if field.startswith("models."):
+                            models[field[len("models."):]] = firestore.Increment(value)
+                        else:
+                            fields[field] = firestore.Increment(value)
+                    fields["models"] = models
+                    batch.set(self._collection().document(self._doc_id(entry)), fields, merge=True)
+                batch.commit()
+                record_writes(COLLECTIONS["TOKEN_USAGE"], len(entries[start:start + 500]))
+        except Exception as e:
+            log.warning("token_ledger.flush_error", entries=len(entries), error=str(e))
+            self._restore(pending)
+            return 0
+        # Keep cached stored totals current so a flush never makes usage look lower
+        for entry, counts in entries:
+            stored = self._stored.get(entry)
+            if stored is not None:
+                self._stored[entry] = (stored[0], stored[1] + counts["total_tokens"])
+        return len(entries)
+
+    def _restore(self, pending):
+        with self._lock:
+            for entry, counts in pending.items():
+                for field, value in counts.items():
+                    self._pending[entry][field] += value
+
+    def _collection(self):
+        return (self.db or get_firestore()).collection(COLLECTIONS["TOKEN_USAGE"])
+
+    @staticmethod
+    def _doc_id(entry):
+        return "_".join(str(part).replace("/", "-") for part in entry)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="token-ledger", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+
+class Admission(namedtuple("Admission", "action model reason user team")):
+    """An admission decision, carried with the request so its usage is charged to the same user and team"""
+
+    def apply(self, request):
+        """Chat completion keyword arguments adjusted for this decision"""
+        if self.action != "downgrade":
+            return request
+        return dict(request, model=self.model,
+                    max_tokens=min(request.get("max_tokens") or BUDGET_DOWNGRADE_MAX_TOKENS, BUDGET_DOWNGRADE_MAX_TOKENS))
+
+
+class AdmissionController:
+    """Decides whether a user's summaries may spend tokens now"""
+
+    def __init__(self, ledger, tokens_per_minute=OPENAI_TOKENS_PER_MINUTE * OPENAI_RATE_LIMIT_SHARE,
+                 user_budget=USER_DAILY_TOKEN_BUDGET, team_budget=TEAM_DAILY_TOKEN_BUDGET,
+                 background_share=BACKGROUND_TOKEN_SHARE, fallback_model=BUDGET_FALLBACK_MODEL):
+        self.ledger = ledger
+        self.tokens_per_minute = tokens_per_minute
+        self.user_budget = user_budget
+        self.team_budget = team_budget
+        self.background_share = background_share
+        self.fallback_model = fallback_model
+
+    def _over_budget(self, user, team):
+        try:
+            if user and self.ledger.used_today("user", user) >= self.user_budget:
+                return "user_budget"
+            if team and self.ledger.used_today("team", team) >= self.team_budget:
+                return "team_budget"
+        except Exception as e:
+            # Budgets are best effort: never block summaries because usage can't be read
+            log.warning("token_budget.usage_read_error", user=user, team=team, error=str(e))
+        return None
+
+    def admit(self, user=None, team=None, scheduled=False, has_cache=False, can_defer=None):
+        """Decide how ``user``'s next update may be generated.
+
+        ``scheduled`` work may be deferred unless ``can_defer`` is False
+        (its last attempt); ``has_cache`` says whether a cached digest can
+        be served instead.
+        """
+        can_defer = scheduled if can_defer is None else can_defer
+        minute = self.ledger.minute_tokens()
+        over = self._over_budget(user, team)
+        if can_defer and (over or minute >= self.tokens_per_minute * self.background_share):
+            action, reason = "defer", over or "rate"
+        elif over:
+            action, reason = ("cache" if has_cache else "downgrade"), over
+        elif minute >= self.tokens_per_minute:
+            action, reason = "downgrade", "rate"
+        else:
+            action, reason = "allow", "ok"
+        BUDGET_DECISIONS_TOTAL.labels(action, reason).inc()
+        if action != "allow":
+            log.info("token_budget.decision", user=user, team=team, action=action, reason=reason,
+                     scheduled=scheduled, minute_tokens=minute)
+        return Admission(action, self.fallback_model if action == "downgrade" else None, reason, user, team)
+
+
+ledger = UsageLedger()
+admission = AdmissionController(ledger)
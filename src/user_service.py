@@ -1,23 +1,27 @@
 from google.cloud import firestore
 from config import COLLECTIONS
 from src.role_service import RoleService
+from src.telemetry import timed
+from src.metrics import record_reads, record_writes
+from src.dependencies import get_firestore
+from src.local_store import local_store
 
 class UserService:
-    def __init__(self):
-        self.db = firestore.Client()
+    def __init__(self, db=None, role_service=None):
+        self.db = db or get_firestore()
         self.users_collection = self.db.collection(COLLECTIONS["USERS"])
         self.interests_collection = self.db.collection(COLLECTIONS["INTERESTS"])
-        self.role_service = RoleService()
+        self.role_service = role_service or RoleService(self.db)
 
+    @timed("firestore.users.create_user")
     def create_user(self, user_id, user_data):
         """Create or update a user profile"""
         # Get role and set default channels/interests
         role = user_data.get("role", "DEFAULT")
-        role_service = RoleService()
         
         # Set default channels and interests based on role
-        default_channels = role_service.get_default_channels(role)
-        default_interests = role_service.get_default_interests(role)
+        default_channels = self.role_service.get_default_channels(role)
+        default_interests = self.role_service.get_default_interests(role)
         
         user = {
             "id": user_id,
@@ -30,20 +34,27 @@ class UserService:
         }
         
         self.users_collection.document(user_id).set(user, merge=True)
+        record_writes(COLLECTIONS["USERS"])
+        local_store.forget_user(user_id)
         
         # Set default interests
         if default_interests:
             self.update_user_interests(user_id, {"topics": default_interests})
         
         # Assign role
-        role_service.assign_role(user_id, role)
+        self.role_service.assign_role(user_id, role)
         
         return user
 
+    @timed("firestore.users.get_user")
     def get_user(self, user_id):
         """Get user profile by ID"""
-        doc = self.users_collection.document(user_id).get()
-        user_data = doc.to_dict() if doc.exists else None
+        user_data = local_store.get_user(user_id)
+        if user_data is None:
+            doc = self.users_collection.document(user_id).get()
+            record_reads(COLLECTIONS["USERS"])
+            user_data = doc.to_dict() if doc.exists else None
+            local_store.put_user(user_id, user_data)
         
         if user_data:
             # Add role information
@@ -54,9 +65,11 @@ class UserService:
         
         return user_data
 
+    @timed("firestore.users.get_all_users")
     def get_all_users(self):
         """Get all user profiles"""
         users = [doc.to_dict() for doc in self.users_collection.stream()]
+        record_reads(COLLECTIONS["USERS"], max(len(users), 1))
         
         # Add role information to each user
         for user in users:
@@ -67,6 +80,7 @@ class UserService:
         
         return users
 
+    @timed("firestore.users.update_user_interests")
     def update_user_interests(self, user_id, interests):
         """Update user's interests"""
         interest_doc = {
@@ -77,25 +91,40 @@ class UserService:
         }
         
         self.interests_collection.document(user_id).set(interest_doc, merge=True)
+        record_writes(COLLECTIONS["INTERESTS"])
         return interest_doc
 
+    @timed("firestore.users.get_user_interests")
     def get_user_interests(self, user_id):
         """Get user's interests"""
         doc = self.interests_collection.document(user_id).get()
+        record_reads(COLLECTIONS["INTERESTS"])
         return doc.to_dict() if doc.exists else None
 
+    @timed("firestore.users.store_interest_embedding")
+    def store_interest_embedding(self, user_id, fields):
+        """Cache the embedding of a user's interest topics on their interests document"""
+        self.interests_collection.document(user_id).set(fields, merge=True)
+        record_writes(COLLECTIONS["INTERESTS"])
+
+    @timed("firestore.users.get_users_by_interest")
     def get_users_by_interest(self, topic):
         """Get users interested in a specific topic"""
         query = self.interests_collection.where("topics", "array_contains", topic)
-        return [doc.to_dict() for doc in query.stream()]
+        interests = [doc.to_dict() for doc in query.stream()]
+        record_reads(COLLECTIONS["INTERESTS"], max(len(interests), 1))
+        return interests
 
+    @timed("firestore.users.get_followed_users")
     def get_followed_users(self, user_id):
         """Get users that a specific user follows"""
         doc = self.interests_collection.document(user_id).get()
+        record_reads(COLLECTIONS["INTERESTS"])
         if doc.exists:
             return doc.to_dict().get("followed_users", [])
         return []
 
+    @timed("firestore.users.add_user_to_channel")
     def add_user_to_channel(self, user_id, channel_id):
         """Add a channel to user's channel list if they have permission"""
         if not self.role_service.can_access_channel(user_id, channel_id):
@@ -106,7 +135,10 @@ class UserService:
             "channels": firestore.ArrayUnion([channel_id]),
             "updated_at": firestore.SERVER_TIMESTAMP
         })
+        record_writes(COLLECTIONS["USERS"])
+        local_store.forget_user(user_id)
 
+    @timed("firestore.users.remove_user_from_channel")
     def remove_user_from_channel(self, user_id, channel_id):
         """Remove a channel from user's channel list"""
         user_ref = self.users_collection.document(user_id)
@@ -114,6 +146,8 @@ class UserService:
             "channels": firestore.ArrayRemove([channel_id]),
             "updated_at": firestore.SERVER_TIMESTAMP
         })
+        record_writes(COLLECTIONS["USERS"])
+        local_store.forget_user(user_id)
 
     def get_users_by_role(self, role):
         """Get all users with a specific role"""
@@ -0,0 +1,308 @@
+"""In-process vector search over recent messages, and near-duplicate collapsing.
+
+``VectorIndex`` keeps unit vectors in one NumPy matrix and answers queries
+with a single matrix-vector product (brute force, exact). Past
+``VECTOR_INDEX_HNSW_MIN_SIZE`` vectors, and only when ``hnswlib`` is
+installed and ``VECTOR_INDEX_BACKEND`` is ``"hnsw"``, queries go through an
+approximate HNSW graph instead. Results are re-scored against the exact
+vectors either way.
+
+``collapse_near_duplicates`` groups messages whose text is nearly identical
+(cross-posted announcements, repeated CI and status messages) so a summary
+prompt carries each one once, marked with how many times it was posted.
+It uses the local hashing model: near-duplicates are a matter of wording,
+and checking them costs no API calls.
+
+``MessageSearchIndex`` backs ``/pulse search``. It indexes public-channel
+messages stored in the last ``SEARCH_WINDOW_HOURS``. A background thread
+builds it and then, every ``SEARCH_REFRESH_SECONDS``, reads only the
+messages stored since its last refresh, so a search is one query embedding
+and one in-memory lookup.
+"""
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from config import (
+    COLLECTIONS, NEAR_DUPLICATE_THRESHOLD, SEARCH_WINDOW_HOURS, SEARCH_REFRESH_SECONDS, SEARCH_RESULTS,
+    SEARCH_MIN_SCORE, VECTOR_INDEX_BACKEND, VECTOR_INDEX_HNSW_MIN_SIZE
+)
+from src.dependencies import get_firestore
+from src.metrics import record_reads
+from src.relevance import HashingEmbedder, get_embedder, normalize, top_k
+from src.telemetry import get_logger, timed
+
+log = get_logger("pulse.vector_index")
+
+_duplicate_embedder = HashingEmbedder()
+NUMBER = re.compile(r"\d+")
+
+
+class VectorIndex:
+    """Unit vectors keyed by ID, searched by cosine similarity"""
+
+    def __init__(self, dimensions=None, backend=VECTOR_INDEX_BACKEND, hnsw_min_size=VECTOR_INDEX_HNSW_MIN_SIZE):
+        self.dimensions = dimensions
+        self.backend = backend
+        self.hnsw_min_size = hnsw_min_size
+        self._vectors = None
+        self._keys = []
+        self._items = []
+        self._positions = {}
+        self._hnsw = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, keys, vectors, items=None):
+        """Add rows to the index; keys already present are skipped"""
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        items = items if items is not None else [None] * len(keys)
+        fresh = [i for i, key in enumerate(keys) if key not in self._positions]
+        if not fresh:
+            return
+        if self._vectors is None:
+            self.dimensions = vectors.shape[1]
+            self._vectors = np.empty((0, self.dimensions), dtype=np.float32)
+        start = len(self._keys)
+        self._vectors = np.concatenate([self._vectors, vectors[fresh]])
+        for offset, i in enumerate(fresh):
+            self._positions[keys[i]] = start + offset
+            self._keys.append(keys[i])
+            self._items.append(items[i])
+        if self._hnsw is not None:
+            self._hnsw.add_items(vectors[fresh], np.arange(start, start + len(fresh)))
+
+    def remove_where(self, predicate):
+        """Drop every entry whose item matches ``predicate``"""
+        keep = [i for i, item in enumerate(self._items) if not predicate(item)]
+        if len(keep) == len(self._keys):
+            return 0
+        removed = len(self._keys) - len(keep)
+        self._vectors = self._vectors[keep]
+        self._keys = [self._keys[i] for i in keep]
+        self._items = [self._items[i] for i in keep]
+        self._positions = {key: i for i, key in enumerate(self._keys)}
+        self._hnsw = None  # Rebuilt on the next search when still large enough
+        return removed
+
+    def search(self, query, k=SEARCH_RESULTS, min_score=SEARCH_MIN_SCORE):
+        """``(score, key, item)`` for the ``k`` nearest entries, best first"""
+        if not self._keys:
+            return []
+        query = normalize(np.asarray(query, dtype=np.float32))
+        candidates = self._approximate_candidates(query, k)
+        if candidates is None:
+            scores = self._vectors @ query
+            ranked = top_k(scores, k, min_score)
+        else:
+            scores = np.full(len(self._keys), -1.0, dtype=np.float32)
+            scores[candidates] = self._vectors[candidates] @ query
+            ranked = top_k(scores, k, min_score)
+        return [(float(scores[i]), self._keys[i], self._items[i]) for i in ranked]
+
+    def _approximate_candidates(self, query, k):
+        if self.backend != "hnsw" or len(self._keys) < self.hnsw_min_size:
+            return None
+        if self._hnsw is None:
+            self._hnsw = self._build_hnsw()
+            if self._hnsw is None:
+                return None
+        # Over-fetch, then re-score exactly so results match the brute-force scores
+        labels, _ = self._hnsw.knn_query(query, k=min(len(self._keys), k * 4))
+        return labels[0].astype(np.int64)
+
+    def _build_hnsw(self):
+        try:
+            import hnswlib
+        except ImportError:
+            log.warning("vector_index.hnsw_unavailable", reason="hnswlib is not installed")
+            self.backend = "brute_force"
+            return None
+        graph = hnswlib.Index(space="ip", dim=self.dimensions)
+        graph.init_index(max_elements=max(len(self._keys) * 2, 1024), ef_construction=200, M=16)
+        graph.add_items(self._vectors, np.arange(len(self._keys)))
+        graph.set_ef(100)
+        return graph
+
+
+def near_duplicate_clusters(texts, threshold=NEAR_DUPLICATE_THRESHOLD, embedder=None, chunk_size=256):
+    """Group indices of near-identical texts; each cluster starts with its first text"""
+    if not texts:
+        return []
+    # Build numbers, durations and counts differ between otherwise identical status posts
+    vectors = (embedder or _duplicate_embedder).embed([NUMBER.sub("0", text) for text in texts])
+    cluster_of = np.full(len(texts), -1)
+    clusters = []
+    # Similarities are computed a block of rows at a time so memory stays O(chunk × n)
+    for start in range(0, len(texts), chunk_size):
+        block = vectors[start:start + chunk_size] @ vectors.T
+        for offset, row in enumerate(block):
+            i = start + offset
+            if cluster_of[i] >= 0:
+                continue
+            members = [j for j in np.flatnonzero(row >= threshold) if j >= i and cluster_of[j] < 0]
+            cluster_of[members or [i]] = len(clusters)
+            clusters.append(sorted(set(members) | {i}))
+    return clusters
+
+
+def _is_standalone(message, ts_key):
+    # Thread heads and replies stay put so no thread loses its parent or a reply
+    thread_ts = message.get("thread_ts")
+    return not message.get("reply_count") and (not thread_ts or thread_ts == message.get(ts_key))
+
+
+def collapse_near_duplicates(messages, ts_key="ts", channel_key=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Keep one copy of each group of near-identical standalone messages.
+
+    The kept copy is the latest one, with ``repeats`` set to the group size
+    (and ``repeat_channels`` when ``channel_key`` is given); every other
+    message is returned unchanged, in the original order.
+    """
+    standalone = [i for i, message in enumerate(messages) if message.get("text") and _is_standalone(message, ts_key)]
+    if len(standalone) < 2:
+        return list(messages)
+    clusters = near_duplicate_clusters([messages[i]["text"] for i in standalone], threshold)
+    dropped = set()
+    collapsed = {}
+    for cluster in clusters:
+        if len(cluster) == 1:
+            continue
+        members = [standalone[j] for j in cluster]
+        keep = max(members, key=lambda i: _epoch(messages[i].get(ts_key)))
+        representative = dict(messages[keep], repeats=len(members))
+        if channel_key:
+            representative["repeat_channels"] = sorted({messages[i].get(channel_key) for i in members} - {None})
+        collapsed[keep] = representative
+        dropped.update(i for i in members if i != keep)
+    if dropped:
+        log.debug("summary.near_duplicates_collapsed", messages=len(messages), dropped=len(dropped))
+    return [collapsed.get(i, message) for i, message in enumerate(messages) if i not in dropped]
+
+
+def repeat_note(message):
+    """Prompt annotation for a collapsed near-duplicate, or an empty string"""
+    repeats = message.get("repeats", 1)
+    if repeats <= 1:
+        return ""
+    channels = message.get("repeat_channels") or []
+    where = f" in {len(channels)} channels" if len(channels) > 1 else ""
+    return f" (posted {repeats} times{where})"
+
+
+def _epoch(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MessageSearchIndex:
+    """Search over public-channel messages stored in the last ``window_hours``, refreshed in the background"""
+
+    def __init__(self, db=None, embedder=None, window_hours=SEARCH_WINDOW_HOURS,
+                 refresh_seconds=SEARCH_REFRESH_SECONDS):
+        self.db = db
+        self._embedder = embedder
+        self.window_hours = window_hours
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._model = None
+        self._watermark = None
+        self._lock = threading.Lock()  # Held only to swap in changes, never across I/O
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def embedder(self):
+        return self._embedder or get_embedder()
+
+    @property
+    def ready(self):
+        """Whether the first build has finished"""
+        return self._index is not None
+
+    def refresh(self):
+        """Index messages stored since the last refresh and drop those past the window"""
+        with self._refresh_lock:
+            model = self.embedder.model
+            rebuild = self._index is None or self._model != model
+            index = VectorIndex() if rebuild else self._index
+            watermark = None if rebuild else self._watermark
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=self.window_hours)
+            since = max(watermark, cutoff) if watermark else cutoff
+            query = (self.db or get_firestore()).collection(COLLECTIONS["MESSAGES"]) \
+                .where("created_at", ">", since).order_by("created_at")
+            docs = [(doc.id, doc.to_dict()) for doc in query.stream()]
+            record_reads(COLLECTIONS["MESSAGES"], max(len(docs), 1))
+            if docs:
+                watermark = docs[-1][1].get("created_at") or watermark
+            docs = [(doc_id, message) for doc_id, message in docs
+                    if message.get("text") and message.get("channel_type", "channel") == "channel"]
+            keys, vectors, items = self._rows(docs, model)
+            with self._lock:
+                if keys:
+                    index.add(keys, vectors, items)
+                index.remove_where(lambda item: _epoch(item["created_at"]) < cutoff.timestamp())
+                self._index, self._model, self._watermark = index, model, watermark
+            return len(index)
+
+    def _rows(self, docs, model):
+        """Keys, vectors and items to add for ``docs``, embedding those without a ``model`` vector"""
+        vectors = [message.get("embedding") if message.get("embedding_model") == model else None
+                   for _, message in docs]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self.embedder.embed([docs[i][1]["text"] for i in missing])):
+                vectors[i] = vector
+        items = [{
+            "text": message["text"],
+            "channel": message.get("channel") or message.get("channel_id"),
+            "user": message.get("user") or message.get("user_id"),
+            "timestamp": message.get("timestamp"),
+            "created_at": message.get("created_at")
+        } for _, message in docs]
+        return [doc_id for doc_id, _ in docs], vectors, items
+
+    def start(self):
+        """Build the index and keep refreshing it, in the background"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("search.refresh_error", error=str(e))
+            time.sleep(self.refresh_seconds)
+
+    @timed("vector_index.search")
+    def search(self, text, k=SEARCH_RESULTS, min_score=SEARCH_MIN_SCORE):
+        """Messages most similar to ``text`` as ``(score, message)`` pairs, best first.
+
+        Returns None while the index is still being built (starting the build
+        if nothing has yet).
+        """
+        if not self.ready:
+            self.start()
+            return None
+        start = time.perf_counter()
+        query = self.embedder.embed([text])[0]
+        with self._lock:
+            results = self._index.search(query, k, min_score)
+            indexed = len(self._index)
+        log.debug("search.lookup", indexed=indexed, results=len(results),
+                  ms=round((time.perf_counter() - start) * 1000, 2))
+        return [(score, item) for score, _, item in results]
+
+
+search_index = MessageSearchIndex()
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+from src.auto_tag import RuleTagger, TagQueue
+
+KEYWORDS = {"testing": ["test", "test rig"], "battery": ["battery", "cell"], "firmware": ["firmware"]}
+
+
+def test_tags_whole_words_and_plurals():
+    tagger = RuleTagger(KEYWORDS)
+    assert tagger.tag("New cells arrived for the Battery pack") == ["battery"]
+    assert tagger.tag("Flashed firmware on the test  rig") == ["firmware", "testing"]
+    assert tagger.tag("cellular signal is fine, contest results later") == []
+
+
+def test_empty_text_has_no_tags():
+    assert RuleTagger(KEYWORDS).tag("") == []
+    assert RuleTagger(KEYWORDS).tag(None) == []
+
+
+class RecordingFirestore:
+    """Just enough of the Firestore client for a batch of updates"""
+
+    def __init__(self):
+        self.updates = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: (name, doc_id))
+
+    def batch(self):
+        return SimpleNamespace(update=lambda ref, fields: self.updates.__setitem__(ref, fields), commit=lambda: None)
+
+
+def test_queue_writes_tags_only_for_tagged_messages():
+    db = RecordingFirestore()
+    queue = TagQueue(rules=RuleTagger(KEYWORDS), llm=False, db=db)
+    queue.flush([("m1", "battery cell swap"), ("m2", "lunch at noon")])
+    assert list(db.updates) == [("messages", "m1")]
+    assert db.updates[("messages", "m1")]["tags"] == ["battery"]
@@ -0,0 +1,64 @@
+import threading
+import pytest
+from src.batch_queue import BatchQueue
+from src.metrics import REGISTRY
+
+DROPPED = REGISTRY.counter("pulse_test_batch_queue_dropped_total", "Items dropped by the test queue")
+
+
+class Collecting(BatchQueue):
+    name = "collecting"
+
+    def __init__(self, batch_size=3, flush_seconds=0.05, maxsize=100, fail=False):
+        super().__init__(batch_size, flush_seconds, maxsize, dropped=DROPPED)
+        self.batches = []
+        self.fail = fail
+        self.flushed = threading.Event()
+
+    def flush(self, batch):
+        self.batches.append(batch)
+        self.flushed.set()
+        if self.fail:
+            raise RuntimeError("flush failed")
+
+
+def test_flush_must_be_implemented():
+    class Incomplete(BatchQueue):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(1, 1, 1)
+
+
+def test_full_batches_flush_without_waiting():
+    stage = Collecting(batch_size=3, flush_seconds=5)
+    for item in range(3):
+        stage.put(item)
+    assert stage.flushed.wait(2)
+    assert stage.batches == [[0, 1, 2]]
+
+
+def test_partial_batches_flush_after_flush_seconds():
+    stage = Collecting(batch_size=10, flush_seconds=0.05)
+    stage.put("only")
+    assert stage.flushed.wait(2)
+    assert stage.batches == [["only"]]
+
+
+def test_a_failed_flush_does_not_stop_the_stage():
+    stage = Collecting(batch_size=1, fail=True)
+    stage.put(1)
+    assert stage.flushed.wait(2)
+    stage.flushed.clear()
+    stage.put(2)
+    assert stage.flushed.wait(2)
+    assert stage.batches == [[1], [2]]
+
+
+def test_items_are_dropped_and_counted_when_full():
+    stage = Collecting(maxsize=1)
+    stage._thread = threading.current_thread()  # Keep the worker from draining the queue
+    before = DROPPED.labels().value
+    stage.put(1)
+    stage.put(2)
+    assert DROPPED.labels().value == before + 1
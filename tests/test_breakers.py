@@ -0,0 +1,105 @@
+import pytest
+from src.breakers import CircuitBreaker, CircuitOpenError, FallbackCache, is_dependency_failure
+from src.pulse_content import degraded_channel_summary, is_summary_error
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def make_breaker(**kwargs):
+    kwargs.setdefault("timeouts", (1.0, 30.0))
+    return CircuitBreaker("test", **kwargs)
+
+
+def fail(breaker, error=RuntimeError):
+    with pytest.raises(error):
+        with breaker.guard():
+            raise error()
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = make_breaker(failure_threshold=3, open_seconds=60)
+    for _ in range(3):
+        fail(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pytest.fail("an open breaker must not make the call")
+
+
+def test_success_resets_the_failure_count():
+    breaker = make_breaker(failure_threshold=2)
+    fail(breaker)
+    with breaker.guard():
+        pass
+    fail(breaker)
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = make_breaker(failure_threshold=1, open_seconds=0)
+    fail(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_opens_again():
+    breaker = make_breaker(failure_threshold=5, open_seconds=0)
+    for _ in range(5):
+        fail(breaker)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+@pytest.mark.parametrize("status, failure", [(400, False), (404, False), (408, True), (429, True), (500, True),
+                                             (None, True)])
+def test_client_errors_are_not_dependency_failures(status, failure):
+    assert is_dependency_failure(StatusError(status)) is failure
+
+
+def test_client_errors_do_not_open_the_breaker():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(StatusError):
+        with breaker.guard():
+            raise StatusError(400)
+    assert breaker.state == "closed"
+
+
+def test_timeout_is_p99_times_multiplier_within_bounds():
+    breaker = make_breaker(min_samples=10, multiplier=2)
+    assert breaker.timeout("k") == 30.0
+    for seconds in [1.0] * 98 + [4.0, 100.0]:
+        breaker.observe(seconds, "k")
+    assert breaker.timeout("k") == 8.0
+    assert breaker.timeout("other") == 30.0
+    for _ in range(100):
+        breaker.observe(0.01, "fast")
+    assert breaker.timeout("fast") == 1.0
+
+
+def test_fallback_cache_expires_and_evicts():
+    cache = FallbackCache(max_keys=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert cache.get("a", max_age=60) is None
+    assert cache.get("c", max_age=60)[1] == 3
+    assert cache.get("c", max_age=-1) is None
+
+
+def test_degraded_summary_shows_key_messages_first():
+    messages = [{"user": "alice", "text": f"routine update {i}"} for i in range(6)]
+    messages[1]["text"] = "Rollback of the charger firmware is a blocker"
+    summary = degraded_channel_summary(messages, limit=2)
+    lines = summary.splitlines()
+    assert lines[:2] == ["• alice: Rollback of the charger firmware is a blocker", "• alice: routine update 5"]
+    assert "_…and 4 more_" in lines
+    assert is_summary_error(summary)
+    assert not is_summary_error("All quiet in #general.")
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+from src.counters import Debouncer, ShardedCounter, with_message_count
+
+
+def shard(count):
+    return SimpleNamespace(to_dict=lambda: {"count": count})
+
+
+def test_total_sums_shards_and_is_cached():
+    counter = ShardedCounter("message_count", shards=4, cache_seconds=60)
+    assert counter.cached("U1") is None
+    assert counter.remember("U1", [shard(2), shard(5), SimpleNamespace(to_dict=lambda: None)]) == 7
+    assert counter.cached("U1") == 7
+    assert counter.cached("U2") is None
+
+
+def test_cached_total_expires():
+    counter = ShardedCounter("message_count", cache_seconds=-1)
+    counter.remember("U1", [shard(1)])
+    assert counter.cached("U1") is None
+
+
+def test_debouncer_allows_one_write_per_interval():
+    debouncer = Debouncer(interval=60)
+    assert debouncer.due("U1")
+    assert not debouncer.due("U1")
+    assert debouncer.due("U2")
+    debouncer.forget("U1")
+    assert debouncer.due("U1")
+
+
+def test_debouncer_prunes_expired_keys_when_full():
+    debouncer = Debouncer(interval=0, max_keys=2)
+    for key in ("a", "b", "c"):
+        assert debouncer.due(key)
+    assert len(debouncer._last) <= 2
+
+
+def test_message_count_adds_to_the_stored_count():
+    assert with_message_count({"id": "U1", "message_count": 3}, 4)["message_count"] == 7
+    assert with_message_count({"id": "U1"}, 4)["message_count"] == 4
+    assert with_message_count(None, 4) is None
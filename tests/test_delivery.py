@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import pytest
+import pytz
+from config import DAILY_SUMMARY_TIME
+from src.delivery import DigestDelivery, TimingWheel, delivery_offset, next_delivery
+
+DAY = 24 * 60
+WEEK = 7 * DAY
+NEW_YORK = pytz.timezone("America/New_York")
+
+
+def epoch_minute(tz, *fields):
+    return int(tz.localize(datetime(*fields)).timestamp() // 60)
+
+
+def local(tz, minute):
+    return datetime.fromtimestamp(minute * 60, tz)
+
+
+def at_local(minutes, user_id):
+    """The delivery time that puts ``user_id``'s digest ``minutes`` after local midnight"""
+    minutes -= delivery_offset(user_id)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# Start just before a minute, hour, day and week boundary, and mid-hour
+@pytest.mark.parametrize("start", [100 * WEEK - 1, 100 * WEEK + 59, 100 * WEEK + DAY - 1, 100 * WEEK + 30])
+def test_every_key_fires_at_its_minute_across_cascades(start):
+    wheel = TimingWheel(start)
+    delays = [1, 2, 58, 59, 60, 61, 119, 120, 121, 1439, DAY, DAY + 1, 3 * DAY + 7, WEEK - 1, WEEK, WEEK + 1,
+              2 * WEEK + 90, 5 * WEEK]
+    for delay in delays:
+        wheel.schedule(delay, start + delay)
+    fired = {}
+    for minute in range(start + 1, start + max(delays) + 1):
+        for key in wheel.advance(minute):
+            fired[key] = minute
+    assert fired == {delay: start + delay for delay in delays}
+    assert len(wheel) == 0
+
+
+def test_far_keys_wait_in_overflow_until_they_fit():
+    start = 100 * WEEK
+    wheel = TimingWheel(start)
+    wheel.schedule("far", start + 3 * WEEK)
+    assert "far" in wheel._overflow
+    assert wheel.advance(start + 3 * WEEK - 1) == []
+    assert "far" not in wheel._overflow
+    assert wheel.advance(start + 3 * WEEK) == ["far"]
+
+
+def test_advancing_several_minutes_returns_everything_passed():
+    wheel = TimingWheel(1000)
+    for key, minute in (("a", 1001), ("b", 1030), ("c", 1090), ("d", 2000)):
+        wheel.schedule(key, minute)
+    assert sorted(wheel.advance(1100)) == ["a", "b", "c"]
+    assert "d" in wheel and len(wheel) == 1
+
+
+def test_past_minutes_are_due_on_the_next_advance():
+    wheel = TimingWheel(1000)
+    wheel.schedule("late", 900)
+    assert wheel.advance(1001) == ["late"]
+
+
+def test_rescheduling_and_cancelling():
+    wheel = TimingWheel(1000)
+    wheel.schedule("moved", 1010)
+    wheel.schedule("moved", 1500)
+    wheel.schedule("cancelled", 1020)
+    wheel.cancel("cancelled")
+    assert wheel.advance(1499) == []
+    assert wheel.advance(1500) == ["moved"]
+
+
+def test_delivery_keeps_local_time_across_spring_forward():
+    user = {"id": "U0ALICE", "tz": "America/New_York"}
+    at = at_local(8 * 60, user["id"])
+    before = epoch_minute(NEW_YORK, 2024, 3, 9, 12, 0)
+    first = next_delivery(user, before, at=at)
+    second = next_delivery(user, first, at=at)
+    assert local(NEW_YORK, first).replace(tzinfo=None) == datetime(2024, 3, 10, 8, 0)
+    assert local(NEW_YORK, second).replace(tzinfo=None) == datetime(2024, 3, 11, 8, 0)
+    # The clocks went forward, so that day was an hour short
+    assert second - first == DAY
+
+
+def test_delivery_in_the_skipped_hour_happens_once_that_day():
+    user = {"id": "U0BOB", "tz": "America/New_York"}
+    at = at_local(2 * 60 + 15, user["id"])  # 02:15 does not exist on 2024-03-10
+    first = next_delivery(user, epoch_minute(NEW_YORK, 2024, 3, 9, 12, 0), at=at)
+    assert local(NEW_YORK, first).date() == datetime(2024, 3, 10).date()
+    assert local(NEW_YORK, next_delivery(user, first, at=at)).date() == datetime(2024, 3, 11).date()
+
+
+def test_delivery_in_the_repeated_hour_happens_once():
+    user = {"id": "U0CAROL", "tz": "America/New_York"}
+    at = at_local(60 + 15, user["id"])  # 01:15 happens twice on 2024-11-03
+    first = next_delivery(user, epoch_minute(NEW_YORK, 2024, 11, 2, 12, 0), at=at)
+    second = next_delivery(user, first, at=at)
+    assert local(NEW_YORK, first).date() == datetime(2024, 11, 3).date()
+    assert local(NEW_YORK, second).replace(tzinfo=None) == datetime(2024, 11, 4, 1, 15)
+
+
+def test_weekly_delivery_is_on_the_weekly_day_in_the_users_timezone():
+    tokyo = pytz.timezone("Asia/Tokyo")
+    user = {"id": "U0DAN", "tz": "Asia/Tokyo", "digest_config": {"frequency": "weekly"}}
+    due = next_delivery(user, epoch_minute(tokyo, 2024, 5, 1, 12, 0), at="09:00", weekly_day=0)
+    assert local(tokyo, due).weekday() == 0
+    assert local(tokyo, due).date() == datetime(2024, 5, 6).date()
+
+
+def test_unknown_timezone_falls_back_to_the_default():
+    user = {"id": "U0ERIN", "tz": "Mars/Olympus_Mons"}
+    assert next_delivery(user, 28_000_000) is not None
+
+
+def test_plan_catches_up_missed_deliveries_but_not_sent_ones():
+    hour, minute = map(int, DAILY_SUMMARY_TIME.split(":"))
+    # Half an hour after U0MISSED's delivery, e.g. after a takeover
+    due_at = datetime(2024, 5, 1, hour, minute) + timedelta(minutes=delivery_offset("U0MISSED"))
+    now = NEW_YORK.localize(due_at + timedelta(minutes=30))
+    base = {"onboarding_completed": True, "tracked_channels": ["general"], "tz": "America/New_York"}
+    users = [
+        dict(base, id="U0MISSED"),
+        dict(base, id="U0SENT", last_digest_sent=now),
+        dict(base, id="U0MUTED", muted=True)
+    ]
+    delivery = DigestDelivery(catchup_minutes=60)
+    assert delivery.plan(users, now=now.timestamp()) == 2
+    assert delivery.due(now=now.timestamp() + 60) == ["U0MISSED"]
+    # Rescheduled for the next day, not repeated
+    assert delivery.due(now=now.timestamp() + 120) == []
@@ -0,0 +1,93 @@
+import threading
+import time
+from src.breakers import CircuitBreaker
+from src.health import BacklogExecutor, DependencyProber
+from src.metrics import record_call
+
+
+def test_backlog_counts_tasks_waiting_for_a_worker():
+    executor = BacklogExecutor(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    executor.submit(block)
+    assert started.wait(2)
+    queued = [executor.submit(lambda: None) for _ in range(3)]
+    assert executor.backlog == 3
+    queued[0].cancel()
+    assert executor.backlog == 2
+    release.set()
+    executor.shutdown(wait=True)
+    assert executor.backlog == 0
+
+
+def test_probes_run_concurrently_and_hung_ones_time_out():
+    hang = threading.Event()
+    calls = {"slow": 0}
+
+    def slow():
+        calls["slow"] += 1
+        hang.wait(5)
+
+    def failing():
+        raise RuntimeError("down")
+
+    prober = DependencyProber({"fast": lambda: None, "slow": slow, "failing": failing}, timeout=0.2)
+    start = time.monotonic()
+    prober.probe_all()
+    assert time.monotonic() - start < 1.0
+    assert prober.results["fast"]["ok"]
+    assert prober.results["failing"]["error"] == "down"
+    assert prober.results["slow"]["error"] == "timed out after 0.2s"
+
+    # Still hanging, so it isn't started a second time
+    prober.probe_all()
+    assert calls["slow"] == 1
+    ready, report = prober.readiness()
+    assert not ready
+    assert "slow: timed out after 0.2s" in report["reasons"]
+    hang.set()
+
+
+def test_backlog_above_threshold_makes_the_process_unready():
+    prober = DependencyProber({"ok": lambda: None})
+    prober.probe_all()
+    depth = [0]
+    prober.add_backlog_source("queue", lambda: depth[0], threshold=10)
+    assert prober.readiness()[0]
+    depth[0] = 11
+    ready, report = prober.readiness()
+    assert not ready
+    assert report["backlogs"] == {"queue": 11}
+
+
+def test_only_required_dependencies_gate_readiness():
+    def down():
+        raise RuntimeError("down")
+
+    prober = DependencyProber({"slack": lambda: None, "openai": down}, required=("slack",))
+    prober.add_breaker(CircuitBreaker("openai", timeouts=(1, 10)))
+    assert not prober.readiness()[0]  # Slack not probed yet
+    prober.probe_all()
+    ready, report = prober.readiness()
+    assert ready
+    assert report["dependencies"]["openai"]["ok"] is False
+    assert report["dependencies"]["openai"]["required"] is False
+    assert report["breakers"] == {"openai": "closed"}
+
+
+def test_error_rate_counts_only_required_dependencies():
+    prober = DependencyProber({"slack": lambda: None}, required=("slack",), min_calls=1)
+    prober.probe_all()
+    for _ in range(5):
+        record_call("openai.chat_completions", 0.1, "error")
+    prober.probe_all()
+    assert prober.error_rate == 0.0
+    record_call("slack.chat_postMessage", 0.1, "error")
+    prober.probe_all()
+    assert prober.error_rate == 1.0
+    assert not prober.readiness()[0]
@@ -0,0 +1,86 @@
+import time
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from src.local_store import LocalStore
+from src.preprocess import UserDirectory
+
+
+def store(tmp_path, **kwargs):
+    return LocalStore(path=str(tmp_path / "local.db"), **kwargs)
+
+
+def test_disabled_without_a_path():
+    disabled = LocalStore(path="")
+    disabled.put_name("U1", "Alice")
+    assert disabled.get_name("U1") is None
+    assert not disabled.covers(datetime.now(timezone.utc))
+
+
+def test_names_are_shared_between_directories_on_a_host(tmp_path):
+    # Two workers: separate directories and connections, one database file
+    first = UserDirectory(store=store(tmp_path))
+    second = UserDirectory(store=store(tmp_path))
+    assert second.get("U1") is None
+    first.put("U1", "Alice Chen")
+    assert second.get("U1") == "Alice Chen"
+
+
+def test_expired_names_are_not_shared(tmp_path):
+    writer, reader = store(tmp_path), store(tmp_path, name_ttl=60)
+    writer.put_name("U1", "Alice")
+    writer._connection().execute("UPDATE names SET fetched_at = ?", (time.time() - 120,))
+    assert reader.get_name("U1") is None
+
+
+def test_user_documents_expire_and_are_forgotten(tmp_path):
+    local = store(tmp_path, user_ttl=60)
+    local.put_user("U1", {"role": "software"})
+    assert local.get_user("U1") == {"role": "software"}
+    store(tmp_path).forget_user("U1")
+    assert local.get_user("U1") is None
+
+
+def test_message_queries_match_their_window(tmp_path):
+    local = store(tmp_path)
+    now = datetime.now(timezone.utc)
+    local.put_message("m1", {"channel_id": "C1", "user_id": "U1", "text": "new", "created_at": now})
+    local.put_message("m2", {"channel_id": "C1", "user_id": "U2", "text": "old",
+                             "created_at": now - timedelta(hours=5)})
+    local.put_message("m3", {"channel_id": "D1", "user_id": "U2", "recipient_id": "U1", "channel_type": "im",
+                             "text": "dm", "created_at": now})
+    cutoff = now - timedelta(hours=1)
+    assert [m["text"] for m in local.channel_messages("C1", cutoff)] == ["new"]
+    assert [m["text"] for m in local.channel_messages("C1", now - timedelta(hours=6))] == ["new", "old"]
+    assert [m["text"] for m in local.received_dms("U1", cutoff)] == ["dm"]
+    assert local.user_messages("U2", cutoff)[0]["created_at"] == now
+
+
+class QueriedMessages:
+    """Just enough of a Firestore collection for sync's one-field queries"""
+
+    def __init__(self, docs):
+        self.docs = docs  # doc ID -> message
+        self.queries = []
+
+    def collection(self, name):
+        return self
+
+    def where(self, field, op, value):
+        self.queries.append(field)
+        matches = [(doc_id, message) for doc_id, message in self.docs.items()
+                   if message.get(field) is not None and message[field] >= value]
+        return SimpleNamespace(stream=lambda: [SimpleNamespace(id=doc_id, to_dict=lambda m=message: dict(m))
+                                               for doc_id, message in matches])
+
+
+def test_sync_picks_up_fields_added_after_a_message_was_stored(tmp_path):
+    now = datetime.now(timezone.utc)
+    db = QueriedMessages({"m1": {"channel_id": "C1", "text": "battery", "created_at": now, "updated_at": now}})
+    local = store(tmp_path, db=db)
+    assert local.sync() == 1
+    assert local.channel_messages("C1", now - timedelta(hours=1))[0].get("tags") is None
+
+    db.docs["m1"] = dict(db.docs["m1"], tags=["battery"], updated_at=now + timedelta(seconds=5))
+    assert local.sync() == 1
+    assert db.queries == ["created_at", "updated_at"]
+    assert local.channel_messages("C1", now - timedelta(hours=1))[0]["tags"] == ["battery"]
@@ -0,0 +1,67 @@
+import pytest
+from src.metrics import Registry, percentile
+
+
+def test_positional_and_keyword_labels_share_one_series():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls", ("dependency", "status"))
+    calls.labels("slack", "ok").inc()
+    calls.labels(status="ok", dependency="slack").inc()
+    calls.labels(dependency="slack", status="ok").inc(2)
+    (values, child), = calls.children()
+    assert values == ("slack", "ok")
+    assert child.value == 4
+
+
+def test_label_values_are_keyed_as_strings():
+    registry = Registry()
+    responses = registry.counter("responses_total", "Responses", ("code",))
+    responses.labels(200).inc()
+    responses.labels("200").inc()
+    responses.labels(code=200).inc()
+    assert [(values, child.value) for values, child in responses.children()] == [(("200",), 3)]
+
+
+@pytest.mark.parametrize("args, kwargs", [
+    (("slack",), {}),
+    ((), {"dependency": "slack"}),
+    ((), {"dependency": "slack", "status": "ok", "extra": "x"}),
+    (("slack",), {"status": "ok"})
+])
+def test_wrong_labels_are_rejected(args, kwargs):
+    calls = Registry().counter("calls_total", "Calls", ("dependency", "status"))
+    with pytest.raises(ValueError):
+        calls.labels(*args, **kwargs)
+
+
+def test_render_is_prometheus_text():
+    registry = Registry()
+    registry.counter("events_total", "Events", ("kind",)).labels(kind='say "hi"').inc()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    text = registry.render()
+    assert 'events_total{kind="say \\"hi\\""} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_histogram_percentile_is_the_bucket_upper_bound():
+    latency = Registry().histogram("latency_seconds", "Latency", buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        latency.observe(value)
+    child = latency.labels()
+    assert child.percentile(50) == 0.1
+    assert child.percentile(75) == 1.0
+    assert child.percentile(100) == 10.0
+
+
+def test_percentile_is_nearest_rank():
+    samples = list(range(100, 0, -1))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile(samples, 100) == 100
+    assert percentile(samples, 0) == 1
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
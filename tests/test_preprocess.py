@@ -0,0 +1,50 @@
+from src.local_store import LocalStore
+from src.preprocess import UserDirectory, normalize, truncate
+
+
+def test_meaningful_emoji_are_kept_as_one_character():
+    assert normalize("Deploy done :white_check_mark: :tada::skin-tone-2:") == "Deploy done ✅ 🎉"
+    assert normalize("Tests ✅ lint ❌ ⚠️ careful 😀 :smile:") == "Tests ✅ lint ❌ ⚠ careful"
+    assert normalize(":+1:") == "👍"
+
+
+def test_decorative_emoji_are_dropped():
+    assert normalize("great work :sparkles: 😀🙌") == "great work"
+    assert normalize(":smile:") == ""
+
+
+def test_times_and_ratios_are_not_emoji_codes():
+    assert normalize("standup moved to 10:30:45") == "standup moved to 10:30:45"
+    assert normalize("ratio 1:2:3") == "ratio 1:2:3"
+
+
+def test_mentions_links_and_markup():
+    text = "<@U1> pinged <#C1|general> about *<https://example.com/a/b|the doc>* &amp; <!here>"
+    assert normalize(text, lookup={"U1": "alice"}.get) == "@alice pinged #general about the doc & @here"
+
+
+def test_code_is_kept_verbatim():
+    assert normalize("run ```:fire: *x*```") == "run ```:fire: *x*```"
+
+
+def test_long_code_blocks_keep_head_and_tail():
+    block = "```\n" + "\n".join(f"line {i}" for i in range(30)) + "\n```"
+    lines = truncate(block).splitlines()
+    assert lines[1] == "line 0" and lines[-2] == "line 29"
+    assert "lines omitted" in truncate(block)
+
+
+def test_failed_lookups_are_remembered_briefly():
+    directory = UserDirectory(miss_ttl=60, store=LocalStore(path=""))
+    assert not directory.missed("U1")
+    directory.put_miss("U1")
+    assert directory.missed("U1")
+    directory.put("U1", "Alice")
+    assert not directory.missed("U1")
+    assert directory.get("U1") == "Alice"
+
+
+def test_failed_lookups_expire():
+    directory = UserDirectory(miss_ttl=0, store=LocalStore(path=""))
+    directory.put_miss("U1")
+    assert not directory.missed("U1")
@@ -0,0 +1,56 @@
+from src.progressive import ProgressiveMessage, paginate_blocks, split_text
+
+
+def test_split_text_prefers_paragraph_then_line_breaks():
+    assert split_text("aaaa\n\nbbbb", limit=7) == ["aaaa", "bbbb"]
+    assert split_text("aaaa\nbbbb", limit=7) == ["aaaa", "bbbb"]
+    assert split_text("abcdefghij", limit=4) == ["abcd", "efgh", "ij"]
+    assert split_text("short", limit=10) == ["short"]
+
+
+def section(text):
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+
+def test_long_sections_are_split_and_pages_never_start_with_a_divider():
+    blocks = [section("x" * 10), section("y" * 25), {"type": "divider"}, section("z")]
+    pages = paginate_blocks(blocks, max_blocks=2, max_section_chars=10)
+    assert [[block.get("text", {}).get("text", "-") for block in page] for page in pages] == [
+        ["x" * 10, "y" * 10], ["y" * 10, "y" * 5], ["z"]
+    ]
+
+
+class RecordingSlack:
+    def __init__(self):
+        self.calls = []
+
+    def chat_postMessage(self, channel, blocks, text):
+        self.calls.append(("post", channel, len(blocks)))
+        return {"ok": True, "channel": "D1", "ts": str(len(self.calls))}
+
+    def chat_update(self, channel, ts, blocks, text):
+        self.calls.append(("update", channel, ts))
+        return {"ok": True}
+
+
+def render(parts):
+    return [section(f"{key}: {value}") for key, value in sorted(parts.items())]
+
+
+def test_updates_edit_only_changed_pages_in_the_opened_dm():
+    slack = RecordingSlack()
+    message = ProgressiveMessage(slack, "U1", render, "Pulse update", min_interval=60)
+    assert message.start({"a": "…", "b": "…"})
+    assert message.update("a", "done")
+    assert message.update("a", "done")
+    assert slack.calls == [("post", "U1", 2), ("update", "D1", "1")]
+
+
+def test_partial_updates_are_throttled_but_final_ones_are_sent():
+    slack = RecordingSlack()
+    message = ProgressiveMessage(slack, "U1", render, "Pulse update", min_interval=60)
+    message.start({"a": "…"})
+    message.update("a", "stream", final=False)
+    assert len(slack.calls) == 1
+    message.update("a", "final text")
+    assert slack.calls[-1] == ("update", "D1", "1")
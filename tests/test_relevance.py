@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+import numpy as np
+from src import token_budget
+from src.relevance import EmbeddingQueue, HashingEmbedder, OpenAIEmbedder, RelevanceEngine, top_k
+
+
+class RecordingFirestore:
+    """Just enough of the Firestore client for a batch of updates"""
+
+    def __init__(self):
+        self.updates = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: (name, doc_id))
+
+    def batch(self):
+        return SimpleNamespace(update=lambda ref, fields: self.updates.__setitem__(ref, fields), commit=lambda: None)
+
+
+def test_top_k_keeps_the_best_scores_above_the_minimum():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.05])
+    assert top_k(scores, k=3, min_score=0.2) == [1, 3, 2]
+    assert top_k(scores, k=10, min_score=0.6) == [1, 3]
+
+
+def test_rank_prefers_messages_about_the_users_topics():
+    engine = RelevanceEngine(HashingEmbedder())
+    profile = engine.profile_vector("U1", {"topics": ["battery thermal testing"]})
+    messages = [{"text": "lunch order for friday"}, {"text": "battery thermal testing results are in"},
+                {"text": "office wifi is down"}]
+    assert engine.rank(profile, messages, k=1, min_score=0.0) == [messages[1]]
+
+
+def test_rank_all_scores_every_user_at_once():
+    engine = RelevanceEngine(HashingEmbedder())
+    profiles = {user: engine.profile_vector(user, {"topics": [topic]})
+                for user, topic in (("U1", "motor controller firmware"), ("U2", "suspension geometry"))}
+    messages = [{"text": "suspension geometry review tomorrow"}, {"text": "motor controller firmware release"}]
+    ranked = engine.rank_all(profiles, messages, k=1, min_score=0.0)
+    assert ranked == {"U1": [messages[1]], "U2": [messages[0]]}
+
+
+def test_stored_vectors_from_the_current_model_are_reused():
+    embedder = HashingEmbedder()
+    stored = embedder.embed(["already embedded"])[0]
+    message = {"text": "different text entirely", "embedding": stored.tolist(), "embedding_model": embedder.model}
+    matrix = RelevanceEngine(embedder).message_matrix([message])
+    assert np.allclose(matrix[0], stored / np.linalg.norm(stored))
+
+
+def test_queue_writes_vectors_by_document_id():
+    db = RecordingFirestore()
+    queue = EmbeddingQueue(embedder=HashingEmbedder(), db=db)
+    queue.flush([("m1", "battery thermal testing"), ("m2", "lunch")])
+    assert set(db.updates) == {("messages", "m1"), ("messages", "m2")}
+    assert db.updates[("messages", "m1")]["embedding_model"] == "hashing-" + str(queue.embedder.dimensions)
+
+
+def test_openai_embeddings_are_charged_to_the_token_ledger(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(token_budget, "ledger", SimpleNamespace(record=lambda model, usage, **fields: recorded.append(
+        (model, usage, fields["purpose"]))))
+
+    def create(model, input):
+        data = [SimpleNamespace(index=i, embedding=[1.0, float(i)]) for i in range(len(input))]
+        return SimpleNamespace(data=data, usage={"prompt_tokens": 7, "total_tokens": 7})
+
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    vectors = OpenAIEmbedder(model="embed-small", client=client, batch_size=2).embed(["a", "b", "c"])
+    assert vectors.shape == (3, 2)
+    assert [(model, purpose) for model, _, purpose in recorded] == [("embed-small", "embedding")] * 2
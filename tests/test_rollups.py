@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+from src.rollups import ActivityRollups, detect_trends
+
+NOW = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def bucket(channel, hours_ago, messages, **fields):
+    return dict(fields, channel=channel, hour=NOW - timedelta(hours=hours_ago), messages=messages)
+
+
+def steady(channel, days, per_day):
+    """``per_day`` messages a day in ``channel`` for ``days`` days before the trend window"""
+    return [bucket(channel, 24 * day + 12, per_day) for day in range(1, days + 1)]
+
+
+def test_no_spikes_without_enough_history():
+    # Rollups started a day and a half ago: everything looks new
+    buckets = [bucket("C1", 30, 2), bucket("C1", 2, 40), bucket("C2", 3, 25)]
+    assert detect_trends(buckets, NOW, min_baseline_hours=72)["spikes"] == []
+
+
+def test_spikes_against_a_full_baseline():
+    buckets = steady("C1", 7, 10) + steady("C2", 7, 30) + [bucket("C1", 2, 40), bucket("C2", 2, 35)]
+    spikes = detect_trends(buckets, NOW, min_baseline_hours=72)["spikes"]
+    assert [spike["channel"] for spike in spikes] == ["C1"]
+    assert spikes[0]["baseline"] == 10.0
+    assert spikes[0]["ratio"] == 4.0
+
+
+def test_partial_history_averages_only_the_windows_seen():
+    # Three days of history at 10 a day: the usual day is 10 messages, not 30 / 7
+    buckets = steady("C1", 3, 10) + [bucket("C1", 2, 25)]
+    spikes = detect_trends(buckets, NOW, min_baseline_hours=48)["spikes"]
+    assert spikes and spikes[0]["baseline"] == 10.0
+
+
+def test_quiet_channels_need_the_minimum_message_count():
+    buckets = steady("C1", 7, 1) + [bucket("C1", 2, 10)]
+    assert detect_trends(buckets, NOW, spike_min_messages=20)["spikes"] == []
+
+
+def test_threads_prs_and_swarms():
+    users = ["U1", "U2", "U3", "U4", "U5"]
+    buckets = [bucket("C1", 1, 12, threads={"1.0": 9, "2.0": 2}, thread_users={"1.0": users, "2.0": users[:2]},
+                      prs={"acme/app#7": 3, "acme/app#9": 1})]
+    trends = detect_trends(buckets, NOW, swarm_min_users=5)
+    assert trends["active_threads"][0] == {"channel": "C1", "thread_ts": "1.0", "replies": 9, "participants": 5}
+    assert trends["top_prs"][0] == {"pr": "acme/app#7", "mentions": 3}
+    assert [swarm["thread_ts"] for swarm in trends["issue_swarms"]] == ["1.0"]
+
+
+def test_record_counts_channel_messages_but_not_dms():
+    rollups = ActivityRollups()
+    rollups._ensure_started = lambda: None
+    rollups.record({"channel": "C1", "ts": "1714564800.0", "user": "U1",
+                    "text": "see <@U2> https://github.com/acme/app/pull/7"})
+    rollups.record({"channel": "C1", "ts": "1714564801.0", "thread_ts": "1714564800.0", "user": "U2", "text": "ok"})
+    rollups.record({"channel": "D1", "channel_type": "im", "ts": "1714564802.0", "user": "U1", "text": "hi"})
+    (key, counts), = rollups._pending.items()
+    assert key == ("C1", 1714564800)
+    assert (counts["messages"], counts["replies"], counts["mentions"]) == (2, 1, 1)
+    assert counts["prs"] == {"acme/app#7": 1}
+    assert counts["users"] == {"U1", "U2"}
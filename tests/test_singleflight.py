@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import pytest
+from src.singleflight import AsyncSingleFlight, SingleFlight, fingerprint
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls or flight._calls["key"].waiters < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ["result"] * 5
+
+
+def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight("test")
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError()))
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_async_calls_share_one_coroutine():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fetch, i) for i in range(3)))
+
+    assert asyncio.run(main()) == [0, 0, 0]
+    assert calls == [0]
+    assert flight._calls == {}
+
+
+def test_fingerprint_is_stable_and_distinct():
+    assert fingerprint("a", 1) == fingerprint("a", 1)
+    assert fingerprint("a", 1) != fingerprint("a", 2)
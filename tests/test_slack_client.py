@@ -0,0 +1,129 @@
+"""SlackWebClient and AsyncSlackWebClient against the fake Slack API (``bench.fake_slack``)."""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import pytest
+from bench.fake_slack import FakeSlackServer
+from src.breakers import CircuitBreaker, CircuitOpenError
+from src.slack_client import AsyncSlackWebClient, SlackRateLimited, SlackWebClient, TIER_LIMITS
+
+
+@pytest.fixture
+def slack():
+    server = FakeSlackServer(rate_limit=True).start()
+    yield server
+    server.stop()
+
+
+def fill_window(server, method, age):
+    """Use up ``method``'s one-minute limit on the fake server with calls made ``age`` seconds ago"""
+    window = server._windows[(method,)]
+    window.extend([time.monotonic() - age] * TIER_LIMITS[4])
+
+
+def test_calls_return_the_decoded_response(slack):
+    client = SlackWebClient("xoxb-test", base_url=slack.url)
+    result = client.users_info(user="U0ALICE")
+    assert result["ok"]
+    assert result["user"]["real_name"] == "Alice Chen"
+    assert client.users_info(user="U0NOBODY")["error"] == "user_not_found"
+
+
+def test_bucket_paces_calls_within_the_tier_limit(slack):
+    client = SlackWebClient("xoxb-test", base_url=slack.url)
+    # users.info is tier 4 (100/minute): a burst of 16 calls, then one every 0.6s
+    start = time.monotonic()
+    for _ in range(18):
+        assert client.users_info(user="U0ALICE")["ok"]
+    assert time.monotonic() - start >= 0.6
+    assert slack.throttled["users.info"] == 0
+
+
+def test_rate_share_scales_the_bucket():
+    full = SlackWebClient("xoxb-test", rate_share=1.0)._bucket("conversations.history", {})
+    quarter = SlackWebClient("xoxb-test", rate_share=0.25)._bucket("conversations.history", {})
+    assert quarter.rate == pytest.approx(full.rate / 4)
+
+
+def test_post_message_is_limited_per_channel():
+    client = SlackWebClient("xoxb-test")
+    first = client._bucket("chat.postMessage", {"channel": "C1"})
+    assert client._bucket("chat.postMessage", {"channel": "C2"}) is not first
+    assert client._bucket("chat.postMessage", {"channel": "C1"}) is first
+
+
+def test_429_is_retried_after_retry_after(slack):
+    fill_window(slack, "users.info", age=59.5)
+    client = SlackWebClient("xoxb-test", base_url=slack.url)
+    start = time.monotonic()
+    assert client.users_info(user="U0BOB")["ok"]
+    assert time.monotonic() - start >= 1.0
+    assert slack.throttled["users.info"] == 1
+
+
+def test_429_gives_up_after_max_retries(slack):
+    fill_window(slack, "users.info", age=0)
+    client = SlackWebClient("xoxb-test", base_url=slack.url, max_retries=0)
+    with pytest.raises(SlackRateLimited):
+        client.users_info(user="U0BOB")
+
+
+def test_wait_longer_than_max_queue_seconds_raises(slack):
+    client = SlackWebClient("xoxb-test", base_url=slack.url, rate_share=0.01, max_queue_seconds=0.1)
+    assert client.conversations_list()["ok"]
+    with pytest.raises(SlackRateLimited) as raised:
+        client.conversations_list()
+    assert raised.value.retry_after > 0.1
+    assert slack.calls["conversations.list"] == 1
+
+
+def test_async_client_retries_429(slack):
+    fill_window(slack, "users.info", age=59.5)
+
+    async def call():
+        client = AsyncSlackWebClient("xoxb-test", base_url=slack.url)
+        try:
+            return await client.users_info(user="U0ALICE")
+        finally:
+            await client.close()
+
+    assert asyncio.run(call())["ok"]
+    assert slack.throttled["users.info"] == 1
+
+
+
+def test_429_is_neither_a_breaker_success_nor_a_failure(slack):
+    fill_window(slack, "users.info", age=0)
+    breaker = CircuitBreaker("slack", failure_threshold=1, timeouts=(1, 10))
+    client = SlackWebClient("xoxb-test", base_url=slack.url, max_retries=0, breaker=breaker)
+    with pytest.raises(SlackRateLimited):
+        client.users_info(user="U0BOB")
+    assert breaker.state == "closed"
+    assert not breaker._latencies
+
+
+def test_open_breaker_refunds_the_reserved_token(slack):
+    breaker = CircuitBreaker("slack", failure_threshold=1, open_seconds=60, timeouts=(1, 10))
+    breaker.failure()
+    client = SlackWebClient("xoxb-test", base_url=slack.url, breaker=breaker)
+    bucket = client._bucket("users.info", {})
+    tokens = bucket.tokens
+    with pytest.raises(CircuitOpenError):
+        client.users_info(user="U0ALICE")
+    assert bucket.tokens == pytest.approx(tokens, abs=0.01)
+    assert slack.calls["users.info"] == 0
+
+
+@pytest.mark.parametrize("workers, share", [(None, 1.0), ("4", 0.25)])
+def test_default_share_is_split_between_workers(workers, share):
+    env = {k: v for k, v in os.environ.items() if k not in ("WEB_CONCURRENCY", "SLACK_RATE_LIMIT_SHARE")}
+    if workers:
+        env["WEB_CONCURRENCY"] = workers
+    output = subprocess.run(
+        [sys.executable, "-c", "import config; print(config.SLACK_RATE_LIMIT_SHARE)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    assert float(output) == pytest.approx(share)
@@ -0,0 +1,35 @@
+"""Importing the bot needs no Firebase or OpenAI credentials and creates no clients."""
+import json
+import os
+import subprocess
+import sys
+import pytest
+from bench.fake_slack import FakeSlackServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CREDENTIALS = ("GOOGLE_APPLICATION_CREDENTIALS", "GOOGLE_CLOUD_PROJECT", "GCLOUD_PROJECT", "FIREBASE_CONFIG",
+               "FIRESTORE_EMULATOR_HOST", "OPENAI_API_KEY", "SLACK_APP_TOKEN")
+
+CHECK = """
+import json, sys
+import {module}
+from src import dependencies
+print(json.dumps({{"clients": sorted(dependencies._clients), "openai_imported": "openai" in sys.modules}}))
+"""
+
+
+@pytest.mark.parametrize("module", ["app", "app_async"])
+def test_import_without_credentials(module, tmp_path):
+    server = FakeSlackServer().start()
+    env = {key: value for key, value in os.environ.items() if key not in CREDENTIALS}
+    # Bolt insists on a token and signing secret, and app.py's App checks the token with auth.test
+    env.update(SLACK_API_URL=server.url, SLACK_BOT_TOKEN="xoxb-test", SLACK_SIGNING_SECRET="test",
+               LOG_LEVEL="WARNING", HOME=str(tmp_path))
+    try:
+        result = subprocess.run([sys.executable, "-c", CHECK.format(module=module)], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=120)
+    finally:
+        server.stop()
+    assert result.returncode == 0, result.stderr[-2000:]
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == {"clients": [], "openai_imported": False}
@@ -0,0 +1,53 @@
+import logging
+import pytest
+from src.metrics import SPAN_SECONDS
+from src.telemetry import JsonLinesFormatter, span
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def span_records():
+    logger = logging.getLogger("pulse.span")
+    handler = Capture()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_span_fields_may_use_any_name(span_records):
+    with span("test.span", name="n", event="e", level="l", status="s", span="x") as fields:
+        fields["duration_ms"] = 1
+    record, = span_records
+    assert record.event == "span"
+    assert record.fields["span"] == "test.span"
+    assert record.fields["status"] == "ok"
+    assert record.fields["fields"] == {"name": "n", "event": "e", "level": "l", "status": "s", "span": "x",
+                                       "duration_ms": 1}
+    line = JsonLinesFormatter().format(record)
+    assert '"event": "span"' in line and '"level": "DEBUG"' in line
+
+
+def test_span_without_fields_logs_no_fields_key(span_records):
+    with span("test.plain"):
+        pass
+    record, = span_records
+    assert "fields" not in record.fields
+
+
+def test_span_records_errors(span_records):
+    with pytest.raises(RuntimeError):
+        with span("test.failing", event="boom"):
+            raise RuntimeError
+    assert span_records[0].fields["status"] == "error"
+    assert SPAN_SECONDS.labels("test.failing").count == 1
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from src.thread_grouping import (
+    collapse_thread, fetch_missing_replies, format_thread_units, group_threads, threads_missing_replies
+)
+
+MESSAGES = [
+    {"ts": "1.0", "text": "root", "reply_count": 3},
+    {"ts": "2.0", "text": "standalone"},
+    {"ts": "4.0", "thread_ts": "1.0", "text": "second reply"},
+    {"ts": "3.0", "thread_ts": "1.0", "text": "first reply"},
+    {"ts": "5.0", "thread_ts": "0.5", "text": "reply to an older thread"}
+]
+
+
+def test_group_threads_orders_units_by_latest_activity():
+    units = group_threads(MESSAGES)
+    assert [unit["thread_ts"] for unit in units] == ["2.0", "1.0", "0.5"]
+    thread = units[1]
+    assert thread["head"]["text"] == "root"
+    assert [reply["text"] for reply in thread["replies"]] == ["first reply", "second reply"]
+    assert thread["reply_count"] == 3
+    assert units[2]["head"] is None
+
+
+def test_collapse_keeps_the_latest_replies_and_counts_the_rest():
+    thread = group_threads(MESSAGES)[1]
+    collapsed = collapse_thread(thread, max_replies=1)
+    assert [reply["text"] for reply in collapsed["replies"]] == ["second reply"]
+    assert collapsed["omitted"] == 2
+    orphan = collapse_thread(group_threads(MESSAGES)[2], max_replies=0)
+    assert len(orphan["replies"]) == 1
+
+
+def test_format_thread_units_indents_replies():
+    units = [collapse_thread(unit, max_replies=1) for unit in group_threads(MESSAGES)]
+    text = format_thread_units(units, lambda message: message["text"])
+    assert text.splitlines() == [
+        "standalone", "root", "  ↳ 3 replies, 2 earlier omitted", "  ↳ second reply",
+        "(reply to an earlier thread)", "  ↳ reply to an older thread"
+    ]
+
+
+def test_only_threads_missing_replies_are_fetched():
+    assert threads_missing_replies(MESSAGES) == ["1.0"]
+    calls = []
+
+    def conversations_replies(**params):
+        calls.append(params)
+        return {"ok": True, "messages": [{"ts": "1.0"}, {"ts": "3.0"}, {"ts": "4.0"}, {"ts": "6.0"}]}
+
+    client = SimpleNamespace(conversations_replies=conversations_replies)
+    replies = fetch_missing_replies(client, "C1", MESSAGES, oldest="0.1")
+    assert [reply["ts"] for reply in replies] == ["3.0", "4.0", "6.0"]
+    assert calls == [{"channel": "C1", "ts": "1.0", "limit": calls[0]["limit"], "oldest": "0.1"}]
+
+
+def test_failed_reply_fetches_are_skipped():
+    def conversations_replies(**params):
+        raise RuntimeError("rate limited")
+
+    client = SimpleNamespace(conversations_replies=conversations_replies)
+    assert fetch_missing_replies(client, "C1", MESSAGES) == []
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+import pytest
+from src.token_budget import AdmissionController, UsageLedger, estimate_tokens, request_prompt_tokens
+
+
+class RecordingFirestore:
+    """Just enough of the Firestore client for a batch of merged sets"""
+
+    def __init__(self):
+        self.sets = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: doc_id)
+
+    def batch(self):
+        return SimpleNamespace(set=lambda ref, fields, merge: self.sets.__setitem__(ref, fields), commit=lambda: None)
+
+
+def fake_ledger(minute=0, user=0, team=0):
+    return SimpleNamespace(minute_tokens=lambda: minute,
+                           used_today=lambda scope, key: {"user": user, "team": team}[scope])
+
+
+def controller(**usage):
+    return AdmissionController(fake_ledger(**usage), tokens_per_minute=1000, user_budget=100, team_budget=500,
+                               background_share=0.5, fallback_model="small")
+
+
+@pytest.mark.parametrize("usage, kwargs, action, reason", [
+    ({}, {}, "allow", "ok"),
+    ({"minute": 600}, {}, "allow", "ok"),
+    ({"minute": 600}, {"scheduled": True}, "defer", "rate"),
+    ({"minute": 600}, {"scheduled": True, "can_defer": False}, "allow", "ok"),
+    ({"minute": 1000}, {}, "downgrade", "rate"),
+    ({"user": 100}, {}, "downgrade", "user_budget"),
+    ({"user": 100}, {"has_cache": True}, "cache", "user_budget"),
+    ({"team": 500}, {"scheduled": True}, "defer", "team_budget"),
+])
+def test_admission_decisions(usage, kwargs, action, reason):
+    decision = controller(**usage).admit(user="U1", team="eng", **kwargs)
+    assert (decision.action, decision.reason) == (action, reason)
+    assert decision.model == ("small" if action == "downgrade" else None)
+
+
+def test_downgrade_caps_the_completion():
+    decision = controller(minute=1000).admit(user="U1")
+    request = decision.apply({"model": "large", "max_tokens": 100000, "messages": []})
+    assert request["model"] == "small"
+    assert request["max_tokens"] < 100000
+    allowed = controller().admit(user="U1")
+    assert allowed.apply({"model": "large"}) == {"model": "large"}
+
+
+def test_unreadable_usage_never_blocks():
+    def broken(scope, key):
+        raise RuntimeError("firestore down")
+    ledger = SimpleNamespace(minute_tokens=lambda: 0, used_today=broken)
+    assert AdmissionController(ledger).admit(user="U1", team="eng").action == "allow"
+
+
+def test_ledger_counts_every_scope_and_flushes_one_document_each():
+    db = RecordingFirestore()
+    ledger = UsageLedger(db=db, flush_seconds=3600)
+    ledger.record("gpt", {"prompt_tokens": 30, "completion_tokens": 10}, user="U1", team="eng", channel="C1")
+    ledger.record("gpt", prompt_tokens=5, completion_tokens=5, user="U1")
+    assert ledger.minute_tokens() == 50
+    assert ledger.flush() == 4
+    scopes = {fields["scope"]: fields for fields in db.sets.values()}
+    assert set(scopes) == {"org", "team", "user", "channel"}
+    assert scopes["user"]["total_tokens"].value == 50
+    assert scopes["user"]["calls"].value == 2
+    assert scopes["team"]["models"]["gpt"].value == 40
+    assert ledger.flush() == 0
+
+
+def test_token_estimates():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 40) == 10
+    assert request_prompt_tokens({"messages": [{"content": "x" * 40}, {"content": "y" * 8}]}) == 12
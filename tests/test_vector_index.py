@@ -0,0 +1,98 @@
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import numpy as np
+from src.pulse_content import channel_summary_request
+from src.relevance import HashingEmbedder
+from src.vector_index import (
+    MessageSearchIndex, VectorIndex, collapse_near_duplicates, near_duplicate_clusters, repeat_note
+)
+
+
+def test_search_returns_nearest_first_and_skips_known_keys():
+    index = VectorIndex(backend="brute_force")
+    index.add(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], items=["A", "B", "C"])
+    index.add(["a"], [[0, 1]])
+    assert len(index) == 3
+    results = index.search([1, 0.1], k=2, min_score=0.0)
+    assert [key for _, key, _ in results] == ["a", "c"]
+    assert results[0][2] == "A"
+
+
+def test_remove_where_drops_matching_items():
+    index = VectorIndex(backend="brute_force")
+    index.add(["a", "b"], [[1, 0], [0, 1]], items=[{"old": True}, {"old": False}])
+    assert index.remove_where(lambda item: item["old"]) == 1
+    assert [key for _, key, _ in index.search([1, 1], k=5, min_score=-1.0)] == ["b"]
+
+
+def test_hnsw_backend_without_hnswlib_falls_back_to_exact_search():
+    index = VectorIndex(backend="hnsw", hnsw_min_size=1)
+    vectors = np.eye(4)
+    index.add(list("abcd"), vectors)
+    assert index.search(vectors[2], k=1, min_score=0.0)[0][1] == "c"
+
+
+def test_near_duplicates_cluster_with_their_first_text():
+    texts = ["Build 1412 passed on main", "deploy window tonight at 9", "Build 1413 passed on main"]
+    assert near_duplicate_clusters(texts, threshold=0.9) == [[0, 2], [1]]
+
+
+def test_collapse_keeps_the_latest_copy_and_leaves_threads_alone():
+    messages = [
+        {"ts": "1", "text": "Standup moved to 10am", "channel": "C1"},
+        {"ts": "2", "text": "Standup moved to 10am", "channel": "C2", "reply_count": 2},
+        {"ts": "3", "text": "standup moved to 10am!", "channel": "C3"},
+        {"ts": "4", "text": "unrelated"}
+    ]
+    collapsed = collapse_near_duplicates(messages, channel_key="channel", threshold=0.9)
+    assert [message["ts"] for message in collapsed] == ["2", "3", "4"]
+    assert collapsed[1]["repeats"] == 2
+    assert repeat_note(collapsed[1]) == " (posted 2 times in 2 channels)"
+    assert repeat_note(collapsed[2]) == ""
+
+
+def test_summary_request_uses_the_callers_collapsed_messages():
+    messages = [{"ts": "1", "timestamp": "1", "user": "alice", "text": "Standup moved to 10am", "repeats": 2},
+                {"ts": "2", "timestamp": "2", "user": "bob", "text": "Standup moved to 10am"}]
+    prompt = channel_summary_request("general", messages)["messages"][1]["content"]
+    assert "alice: Standup moved to 10am (posted 2 times)" in prompt
+    assert "bob: Standup moved to 10am" in prompt
+
+
+class StoredMessages:
+    """Just enough of a Firestore collection for the search index's refresh query"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.reads = 0
+
+    def collection(self, name):
+        return self
+
+    def where(self, field, op, value):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def stream(self):
+        self.reads += 1
+        docs, self.messages = self.messages, []
+        return [SimpleNamespace(id=f"m{i}", to_dict=lambda m=message: m) for i, message in enumerate(docs)]
+
+
+def test_search_never_queries_firestore_and_waits_for_the_first_build():
+    now = datetime.now(timezone.utc)
+    db = StoredMessages([{"text": "battery thermal test results", "channel": "C1", "created_at": now},
+                         {"text": "lunch order", "channel": "C1", "created_at": now},
+                         {"text": "private", "channel_type": "im", "created_at": now}])
+    index = MessageSearchIndex(db=db, embedder=HashingEmbedder(), refresh_seconds=3600)
+    assert index.search("battery") is None  # Starts the build in the background
+    deadline = time.monotonic() + 5
+    while not index.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(index._index) == 2
+    results = index.search("battery thermal", min_score=0.1)
+    assert [message["text"] for _, message in results] == ["battery thermal test results"]
+    assert db.reads == 1
@@ -0,0 +1,13 @@
+"""WSGI entry point for HTTP mode.
+
+Run with gunicorn, which reads gunicorn.conf.py:
+
+    gunicorn wsgi:application
+"""
+from app import flask_app, start_background_services
+
+# Every worker imports this module after forking, so each starts its own
+# prober and scheduler; only one scheduler per host actually runs jobs.
+start_background_services()
+
+application = flask_app